@@ -2,13 +2,38 @@ import streamlit as st
 import sqlite3
 import pandas as pd
 from datetime import datetime
-from utils.pdf_generator import PDF
+from utils.database import DB_PATH, get_pool
+from utils import metrik
+from utils.search_index import ensure_search_index
+from utils.migrasi import jalankan_migrasi, fts_index_aktif
+from utils.backup import BackupEngine
+from utils.batch_export import DEFAULT_PAGES_PER_PART
+from utils.pdf_cache import get_pdf_cache, bersihkan_file_ekspor
+from utils.telegram_outbox import DEFAULT_API_URL, OutboxWorker, enqueue_message, outbox_stats
+from utils.laporan import susun_laporan_harian
+from utils.layanan import (
+    SlipError, antrekan_laporan, baca_laporan_harian, ekspor_pdf, hapus_slip_per_do, perbarui_slip,
+    pesan_impor, pesan_input_baru, simpan_slip, susun_laporan
+)
+from utils.ekspor_data import FORMAT_EKSPOR, MIME_EKSPOR, ekspor_data
+from utils.timbangan import DEFAULT_INDIKATOR, TIMBANGAN_DB_PATH, baca_timbangan, ensure_timbangan
+from utils.master_data import baku_series, get_indeks
+from utils.tiket import (
+    TiketError, buka_tiket, tutup_tiket, tutup_dengan_tara_tersimpan, batalkan_tiket,
+    daftar_tiket_terbuka, get_tara_tersimpan
+)
+from utils.impor import DEFAULT_CHUNK_SIZE as DEFAULT_IMPOR_CHUNK_SIZE, impor_berkas
+from utils.sinkron import KlienPusat, SinkronError, jumlah_tertunda, sinkronkan
+from utils.arsip import ARSIP_DIR, ArsipError, arsipkan, baca_arsip, batas_retensi, tahun_arsip, tahun_untuk_rentang
+from utils.pratinjau_slip import pratinjau_html
+from utils.riwayat import (
+    DEFAULT_PAGE_SIZE, PAGE_SIZE_OPTIONS,
+    fetch_history_page, fetch_history_all, fetch_slip_by_id, count_history, filter_slip_aktif
+)
 import os
-import shutil
-import base64
-import requests
-from pytz import timezone
-from apscheduler.schedulers.background import BackgroundScheduler
+import threading
+from functools import partial
+from pathlib import Path
 import time
 
 # Fungsi untuk format angka dengan pemisah ribuan
@@ -23,105 +48,188 @@ def format_angka(value):
 st.set_page_config(layout="wide", page_title="Aplikasi Surat Jalan & Slip Penimbangan")
 # --- END: Pengaturan Halaman Full Screen ---
 
+# Instrumentasi (opsional): harus aktif sebelum pool database dibuat agar query SQL ikut terukur
+if st.secrets.get("METRIK_AKTIF", False):
+    metrik.aktifkan()
+metrik.mulai_rerun()
+_mulai_rerun = time.perf_counter()
+
+@st.cache_resource
+def mulai_penulis_metrik(path, interval):
+    """Thread yang menulis file metrik (Prometheus / JSON) secara berkala, sekali per proses"""
+    penulis = metrik.PenulisMetrik(path, interval)
+    penulis.start()
+    return penulis
+
+if metrik.aktif() and st.secrets.get("METRIK_FILE"):
+    mulai_penulis_metrik(st.secrets["METRIK_FILE"], float(st.secrets.get("METRIK_INTERVAL_DETIK", 15)))
+
 # Konfigurasi direktori
 TEMP_PDF_DIR = "temp_pdf"
 BACKUP_DIR = "backup"
 os.makedirs(TEMP_PDF_DIR, exist_ok=True)
 os.makedirs(BACKUP_DIR, exist_ok=True)
 
-# Backup database dengan timestamp
-if os.path.exists("surat_jalan.db"):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = os.path.join(BACKUP_DIR, f"surat_jalan_backup_{timestamp}.db")
-    try:
-        shutil.copy("surat_jalan.db", backup_path)
-        st.sidebar.info(f"Backup berhasil sebagai '{backup_path}'")
-    except Exception as e:
-        st.sidebar.warning(f"Gagal backup database: {e}")
+# Cache render PDF slip (berbasis hash isi + versi template) di temp_pdf/cache
+pdf_cache = get_pdf_cache(
+    os.path.join(TEMP_PDF_DIR, "cache"),
+    max_bytes=int(st.secrets.get("PDF_CACHE_MAX_MB", 200)) * 1024 * 1024,
+    max_age_s=int(st.secrets.get("PDF_CACHE_MAX_HARI", 7)) * 24 * 3600,
+    memory_items=int(st.secrets.get("PDF_CACHE_MEMORI", 32)),
+)
+
+# Koneksi ke database dan migrasi skema: dijalankan sekali per proses, bukan setiap rerun
+@st.cache_resource(show_spinner="Menyiapkan database...")
+def inisialisasi_database(busy_timeout_ms):
+    """Membuat pool koneksi bersama (WAL + busy_timeout) dan menerapkan migrasi yang belum ada"""
+    pool = get_pool(DB_PATH, busy_timeout_ms=busy_timeout_ms)
+    diterapkan = jalankan_migrasi(pool)
+    with pool.read() as conn:
+        fts_aktif = fts_index_aktif(conn)
+    if not fts_aktif:
+        # SQLite mungkin sudah diperbarui sejak migrasi indeks pencarian pertama kali dijalankan
+        try:
+            with pool.write() as conn:
+                fts_aktif = ensure_search_index(conn)
+        except sqlite3.OperationalError:
+            fts_aktif = False
+    return pool, fts_aktif, diterapkan
 
-# Koneksi ke database
 try:
-    conn = sqlite3.connect('surat_jalan.db', check_same_thread=False)
-    c = conn.cursor()
+    db_pool, FTS_AKTIF, migrasi_diterapkan = inisialisasi_database(int(st.secrets.get("DB_BUSY_TIMEOUT_MS", 5000)))
 except Exception as e:
-    st.error(f"Gagal koneksi ke database: {e}")
+    st.error(f"Gagal menyiapkan database: {e}")
     st.stop()
 
-# Buat tabel jika belum ada
-try:
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS surat_jalan (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tanggal_masuk TEXT,
-            jam_masuk TEXT,
-            tanggal_keluar TEXT,
-            jam_keluar TEXT,
-            nomor_do TEXT,
-            nomor_polisi TEXT,
-            nama_sopir TEXT,
-            nama_barang TEXT,
-            po_do TEXT,
-            transport TEXT,
-            bruto REAL,
-            tara REAL,
-            netto REAL,
-            tanggal_input TEXT,
-            nama_ditimbang TEXT,
-            nama_diterima TEXT,
-            nama_diketahui TEXT
+# Indeks awalan master data (nopol, sopir, barang, PO/DO, transport) untuk autocomplete
+indeks_master = get_indeks(db_pool)
+BATAS_SARAN = int(st.secrets.get("AUTOCOMPLETE_SARAN", 8))
+
+def pilih_saran_master(key):
+    pilihan = st.session_state.get(f"{key}_saran")
+    if pilihan:
+        st.session_state[key] = pilihan
+    st.session_state[f"{key}_saran"] = None
+
+def kosongkan_master(*keys):
+    # Isian master berada di luar form sehingga tidak ikut clear_on_submit; dikosongkan di rerun berikutnya
+    st.session_state.setdefault("master_dikosongkan", set()).update(keys)
+
+def input_master(label, jenis, key, placeholder=""):
+    """Isian dengan saran dari master data: awalan yang diketik dicari di indeks, isian kosong
+    menampilkan nilai yang paling sering dipakai. Nilai baru tetap bisa diketik.
+
+    Harus berada di luar st.form: saran diperbarui setiap isian berubah.
+    """
+    if key in st.session_state.get("master_dikosongkan", ()):
+        st.session_state["master_dikosongkan"].discard(key)
+        st.session_state[key] = ""
+    nilai = st.text_input(label, placeholder=placeholder, key=key)
+    saran = indeks_master.saran(jenis, nilai, BATAS_SARAN)
+    if saran and nilai not in saran:
+        st.pills(
+            label, saran, key=f"{key}_saran", label_visibility="collapsed",
+            on_change=pilih_saran_master, args=(key,)
         )
-    ''')
-    conn.commit()
-except Exception as e:
-    st.error(f"Gagal membuat tabel: {e}")
-    st.stop()
+    return nilai
 
-# --- FUNGSI BARU: MIGRASI DATABASE ---
-def add_missing_columns(conn, c):
-    c.execute("PRAGMA table_info(surat_jalan)")
-    existing_columns = [col[1] for col in c.fetchall()]
+if migrasi_diterapkan and not st.session_state.get("migrasi_ditampilkan"):
+    st.session_state["migrasi_ditampilkan"] = True
+    st.sidebar.success(f"Migrasi database diterapkan: {', '.join(migrasi_diterapkan)}")
+if not FTS_AKTIF:
+    st.sidebar.warning("Indeks FTS5 tidak tersedia, pencarian riwayat memakai pemindaian tabel.")
 
-    new_columns = {
-        "nama_ditimbang": "TEXT",
-        "nama_diterima": "TEXT",
-        "nama_diketahui": "TEXT"
-    }
+# --- CACHE QUERY BACA ---
+# Hasil query di-cache per parameter + PRAGMA data_version: setiap commit (dari sesi mana pun,
+# scheduler, atau proses lain) mengubah versi sehingga cache lama otomatis tidak dipakai lagi.
+def versi_data():
+    return db_pool.data_version()
 
-    for col_name, col_type in new_columns.items():
-        if col_name not in existing_columns:
-            try:
-                c.execute(f"ALTER TABLE surat_jalan ADD COLUMN {col_name} {col_type} DEFAULT ''")
-                conn.commit()
-                st.sidebar.success(f"Kolom '{col_name}' berhasil ditambahkan ke database.")
-            except sqlite3.OperationalError as e:
-                st.sidebar.error(f"Gagal menambahkan kolom '{col_name}': {e}")
+# `arsip` adalah tuple tahun arsip yang ikut dicari; file arsip hanya di-ATTACH bila tidak kosong
+@st.cache_data(max_entries=64, show_spinner=False)
+def cache_history_page(search_nopol, search_do, page_size, cursor, use_fts, arsip, versi):
+    with baca_arsip(db_pool, arsip) as (conn, skema):
+        return fetch_history_page(conn, search_nopol, search_do, page_size=page_size, cursor=cursor, use_fts=use_fts, arsip=skema)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cache_count_history(search_nopol, search_do, use_fts, arsip, versi):
+    with baca_arsip(db_pool, arsip) as (conn, skema):
+        return count_history(conn, search_nopol, search_do, use_fts=use_fts, arsip=skema)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cache_slip(slip_id, arsip, versi):
+    with baca_arsip(db_pool, arsip) as (conn, skema):
+        return fetch_slip_by_id(conn, slip_id, arsip=skema)
 
-# Panggil fungsi migrasi
-add_missing_columns(conn, c)
+@st.cache_data(max_entries=16, show_spinner=False)
+def cache_laporan_harian(tanggal, versi):
+    # Rekap tersimpan di database utama; arsip hanya dibuka jika transaksi tanggal itu sudah diarsipkan
+    with baca_arsip(db_pool, tahun_untuk_rentang(db_pool, tanggal, tanggal)) as (conn, skema):
+        return baca_laporan_harian(conn, tanggal, arsip=skema)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def cache_tahun_arsip(versi):
+    with db_pool.read() as conn:
+        return dict(tahun_arsip(conn))
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def cache_tiket_terbuka(versi):
+    with db_pool.read() as conn:
+        return daftar_tiket_terbuka(conn)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def cache_outbox_stats(versi):
+    with db_pool.read() as conn:
+        return outbox_stats(conn)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def cache_sinkron_tertunda(versi):
+    with db_pool.read() as conn:
+        return jumlah_tertunda(conn)
 
 # --- KONFIGURASI TELEGRAM ---
 TELEGRAM_TOKEN = st.secrets.get("TELEGRAM_TOKEN", "")
 TELEGRAM_CHAT_ID = st.secrets.get("TELEGRAM_CHAT_ID", "")
 
+def antrekan_telegram(conn, message):
+    """Memasukkan pesan ke outbox Telegram di dalam transaksi `conn` yang sedang berjalan"""
+    if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
+        return False
+    enqueue_message(conn, TELEGRAM_CHAT_ID, message)
+    return True
+
+def bangunkan_outbox():
+    """Memberi tahu worker outbox bahwa ada pesan baru"""
+    if hasattr(st, 'outbox_worker'):
+        st.outbox_worker.wake()
+
 def send_telegram_message(message):
-    """Mengirim pesan ke Telegram"""
+    """Mengirim pesan ke Telegram lewat outbox (tidak memblokir, dikirim oleh worker di background)"""
     if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
-        st.error("Token atau Chat ID Telegram belum dikonfigurasi!")
         return False
-    
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": message,
-        "parse_mode": "HTML"
-    }
-    
-    try:
-        response = requests.post(url, json=payload)
-        return response.status_code == 200
-    except Exception as e:
-        st.error(f"Error mengirim pesan Telegram: {e}")
+    with db_pool.write() as conn:
+        antrekan_telegram(conn, message)
+    bangunkan_outbox()
+    return True
+
+def kirim_laporan_telegram(laporan):
+    """Memasukkan semua potongan laporan (dan lampiran CSV jika ada) ke outbox dalam satu transaksi"""
+    if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
         return False
+    with db_pool.write() as conn:
+        antrekan_laporan(conn, TELEGRAM_CHAT_ID, laporan)
+    bangunkan_outbox()
+    return True
+
+# Worker pengirim outbox, satu per proses
+if not hasattr(st, 'outbox_worker') and TELEGRAM_TOKEN and TELEGRAM_CHAT_ID:
+    st.outbox_worker = OutboxWorker(
+        db_pool, TELEGRAM_TOKEN,
+        api_url=st.secrets.get("TELEGRAM_API_URL", DEFAULT_API_URL),
+        timeout=float(st.secrets.get("TELEGRAM_TIMEOUT", 10)),
+        max_attempts=int(st.secrets.get("TELEGRAM_MAX_ATTEMPTS", 8)),
+    )
+    st.outbox_worker.start()
 
 # Fungsi utilitas cetak dan preview
 def get_ready_printer():
@@ -171,19 +279,9 @@ def print_pdf_to_ready_printer(pdf_path):
         st.warning("Fitur cetak lokal hanya tersedia di sistem operasi Windows.")
         return False
 
-def show_pdf_preview(pdf_path):
-    with open(pdf_path, "rb") as f:
-        base64_pdf = base64.b64encode(f.read()).decode("utf-8")
-        
-        width_inches = 11.0
-        height_inches = 9.5
-        
-        width_px = int(width_inches * 96)
-        height_px = int(height_inches * 96)
-        
-        pdf_display = f'<embed src="data:application/pdf;base64,{base64_pdf}" width="{width_px}px" height="{height_px}px" type="application/pdf">'
-        
-        st.markdown(pdf_display, unsafe_allow_html=True)
+def show_slip_preview(rows):
+    # HTML ringan dari cache; PDF baru dirender saat diunduh atau dicetak
+    st.html(pratinjau_html(rows))
 
 
 st.title("🚛 Aplikasi Surat Jalan dan Slip Penimbangan")
@@ -192,48 +290,198 @@ st.markdown("---")
 # --- SCHEDULER UNTUK LAPORAN HARIAN ---
 def send_daily_report():
     """Mengirim laporan harian otomatis ke Telegram"""
-    today = datetime.now().date()
-    query = "SELECT * FROM surat_jalan WHERE tanggal_input LIKE ?"
+    with db_pool.read() as conn:
+        laporan = susun_laporan(
+            conn, datetime.now().date(), f"Dikirim otomatis pada: {datetime.now().strftime('%H:%M:%S')}"
+        )
+    if laporan is not None:
+        kirim_laporan_telegram(laporan)
+
+# --- SINKRONISASI DELTA KE SERVER PUSAT (multi jembatan timbang) ---
+SINKRON_URL = st.secrets.get("SINKRON_URL", "")
+SINKRON_TOKEN = st.secrets.get("SINKRON_TOKEN", "")
+
+def sinkron_ke_pusat():
+    """Mengirim perubahan sejak ack terakhir ke pusat; hasil atau galat terakhir ditampilkan di sidebar"""
+    klien = KlienPusat(SINKRON_URL, SINKRON_TOKEN)
     try:
-        laporan_df = pd.read_sql_query(query, conn, params=[f"{today}%"])
-    except:
-        # Jika terjadi error, coba lagi dengan koneksi baru
-        conn = sqlite3.connect('surat_jalan.db', check_same_thread=False)
-        laporan_df = pd.read_sql_query(query, conn, params=[f"{today}%"])
-    
-    if not laporan_df.empty:
-        total_kendaraan = laporan_df['nomor_polisi'].nunique()
-        total_netto = laporan_df['netto'].sum()
-        
-        telegram_message = f"📊 <b>LAPORAN HARIAN {today.strftime('%d/%m/%Y')}</b>\n\n"
-        telegram_message += f"<b>Total Kendaraan:</b> {total_kendaraan}\n"
-        telegram_message += f"<b>Total Netto:</b> {format_angka(total_netto)} kg\n\n"
-        telegram_message += "<b>Detail Transaksi:</b>\n"
-        
-        # Tambahkan 5 transaksi terbaru
-        for _, row in laporan_df.head(5).iterrows():
-            telegram_message += f"• {row['nomor_do']} | {row['nomor_polisi']} | {row['nama_sopir']} | {format_angka(row['netto'])} kg\n"
-        
-        if len(laporan_df) > 5:
-            telegram_message += f"\n<i>+ {len(laporan_df) - 5} transaksi lainnya...</i>"
-        
-        telegram_message += f"\n\n<i>Dikirim otomatis pada: {datetime.now().strftime('%H:%M:%S')}</i>"
-        
-        send_telegram_message(telegram_message)
+        st.sinkron_terakhir = (datetime.now(), sinkronkan(db_pool, klien), None)
+    except SinkronError as e:
+        st.sinkron_terakhir = (datetime.now(), None, str(e))
+    finally:
+        klien.close()
 
-# Inisialisasi scheduler
-if not hasattr(st, 'scheduler') and TELEGRAM_TOKEN and TELEGRAM_CHAT_ID:
+# Inisialisasi scheduler (sekali per proses, bukan per rerun). apscheduler dan pytz dimuat
+# di thread terpisah agar tidak menahan render pertama setelah aplikasi di-restart.
+def mulai_scheduler(backup_interval_menit, pdf_ekspor_max_s, laporan_harian, sinkron_interval_menit, arsip_simpan_bulan):
     try:
-            jakarta = timezone("Asia/Jakarta")  # gunakan timezone dari pytz
-            st.scheduler = BackgroundScheduler(timezone=jakarta)
-            st.scheduler.add_job(send_daily_report, 'cron', hour=17, minute=0)
-            st.scheduler.start()
-            st.sidebar.success("Scheduler laporan harian diaktifkan (setiap jam 17:00 WIB)")
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from pytz import timezone
+
+        jakarta = timezone("Asia/Jakarta")
+        scheduler = BackgroundScheduler(timezone=jakarta)
+
+        # Backup online terjadwal di background, dengan retensi per jam/harian/mingguan
+        scheduler.add_job(
+            st.backup_engine.jalankan, 'interval',
+            minutes=backup_interval_menit,
+            next_run_time=datetime.now(jakarta),
+            id="backup_database", max_instances=1, coalesce=True
+        )
+
+        # Bersihkan cache PDF dan file ekspor lama setiap jam
+        def bersihkan_temp_pdf():
+            pdf_cache.evict()
+            bersihkan_file_ekspor(TEMP_PDF_DIR, max_age_s=pdf_ekspor_max_s)
+        scheduler.add_job(bersihkan_temp_pdf, 'interval', hours=1, id="bersihkan_temp_pdf", coalesce=True)
+
+        if laporan_harian:
+            scheduler.add_job(send_daily_report, 'cron', hour=17, minute=0)
+        if sinkron_interval_menit:
+            scheduler.add_job(
+                sinkron_ke_pusat, 'interval', minutes=sinkron_interval_menit,
+                next_run_time=datetime.now(jakarta),
+                id="sinkron_pusat", max_instances=1, coalesce=True
+            )
+        if arsip_simpan_bulan:
+            # Setiap awal bulan, bulan yang keluar dari masa retensi dipindah ke arsip tahunan
+            scheduler.add_job(
+                lambda: arsipkan(db_pool, ARSIP_DIR, batas_retensi(arsip_simpan_bulan)),
+                'cron', day=1, hour=1, minute=30, id="arsip_tahunan", max_instances=1, coalesce=True
+            )
+        scheduler.start()
+        st.scheduler = scheduler
     except Exception as e:
-            st.sidebar.error(f"Gagal memulai scheduler: {e}")
+        st.scheduler_error = str(e)
+
+if not hasattr(st, 'backup_engine'):
+    st.backup_engine = BackupEngine(
+        DB_PATH, BACKUP_DIR,
+        simpan_per_jam=int(st.secrets.get("BACKUP_SIMPAN_PER_JAM", 24)),
+        simpan_harian=int(st.secrets.get("BACKUP_SIMPAN_HARIAN", 7)),
+        simpan_mingguan=int(st.secrets.get("BACKUP_SIMPAN_MINGGUAN", 4)),
+        kompres=bool(st.secrets.get("BACKUP_KOMPRES", True)),
+        verifikasi=bool(st.secrets.get("BACKUP_VERIFIKASI", True)),
+    )
+    threading.Thread(
+        target=mulai_scheduler, name="mulai-scheduler", daemon=True,
+        args=(
+            int(st.secrets.get("BACKUP_INTERVAL_MENIT", 60)),
+            int(st.secrets.get("PDF_EKSPOR_MAX_JAM", 24)) * 3600,
+            bool(TELEGRAM_TOKEN and TELEGRAM_CHAT_ID),
+            int(st.secrets.get("SINKRON_INTERVAL_MENIT", 15)) if SINKRON_URL else 0,
+            int(st.secrets.get("ARSIP_SIMPAN_BULAN", 0)),
+        ),
+    ).start()
+    if TELEGRAM_TOKEN and TELEGRAM_CHAT_ID:
+        st.sidebar.success("Scheduler laporan harian diaktifkan (setiap jam 17:00 WIB)")
+if getattr(st, 'scheduler_error', None):
+    st.sidebar.error(f"Gagal memulai scheduler: {st.scheduler_error}")
+
+# Status backup di sidebar
+if hasattr(st, 'backup_engine'):
+    backup_terakhir = st.backup_engine.backup_terakhir()
+    if backup_terakhir:
+        st.sidebar.info(f"Backup terakhir: {backup_terakhir[0].strftime('%Y-%m-%d %H:%M:%S')}")
+    if st.backup_engine.error_terakhir:
+        st.sidebar.warning(f"Gagal backup database: {st.backup_engine.error_terakhir}")
+    if st.sidebar.button("💾 Backup Sekarang", key="backup_now_btn"):
+        if hasattr(st, 'scheduler'):
+            st.scheduler.add_job(st.backup_engine.jalankan, id="backup_manual", replace_existing=True)
+        else:
+            threading.Thread(target=st.backup_engine.jalankan, name="backup-manual", daemon=True).start()
+        st.sidebar.success("Backup dijalankan di background.")
+
+# Status antrean Telegram di sidebar
+if TELEGRAM_TOKEN and TELEGRAM_CHAT_ID:
+    status_outbox = cache_outbox_stats(versi_data())
+    if status_outbox['pending']:
+        st.sidebar.info(f"📨 {status_outbox['pending']} pesan Telegram menunggu dikirim")
+    if status_outbox['failed']:
+        st.sidebar.warning(f"⚠️ {status_outbox['failed']} pesan Telegram gagal dikirim")
+
+# Status sinkronisasi ke server pusat di sidebar
+if SINKRON_URL:
+    sinkron_terakhir = getattr(st, 'sinkron_terakhir', None)
+    if sinkron_terakhir and sinkron_terakhir[2]:
+        st.sidebar.warning(f"Sinkronisasi pusat gagal: {sinkron_terakhir[2]}")
+    elif sinkron_terakhir:
+        st.sidebar.info(f"🔄 Sinkron terakhir: {sinkron_terakhir[0].strftime('%Y-%m-%d %H:%M:%S')}")
+    sinkron_tertunda = cache_sinkron_tertunda(versi_data())
+    if sinkron_tertunda:
+        st.sidebar.caption(f"{sinkron_tertunda} perubahan menunggu dikirim ke pusat")
+    if st.sidebar.button("🔄 Sinkron Sekarang", key="sinkron_now_btn"):
+        if hasattr(st, 'scheduler'):
+            st.scheduler.add_job(sinkron_ke_pusat, id="sinkron_manual", replace_existing=True)
+        else:
+            threading.Thread(target=sinkron_ke_pusat, name="sinkron-manual", daemon=True).start()
+        st.sidebar.success("Sinkronisasi dijalankan di background.")
 
 # Bagian Input Data
 st.header("📝 Input Data Surat Jalan Baru")
+
+# Berat dari indikator timbangan (diisi oleh daemon `python -m utils.timbangan`)
+TIMBANGAN_INDIKATOR = st.secrets.get("TIMBANGAN_INDIKATOR", DEFAULT_INDIKATOR)
+TIMBANGAN_MAKS_UMUR_S = float(st.secrets.get("TIMBANGAN_MAKS_UMUR_DETIK", 120))
+
+# Pembacaan live ada di file SQLite sendiri: publish daemon tidak mengubah versi data database utama
+@st.cache_resource
+def inisialisasi_timbangan(path):
+    """Pool database pembacaan timbangan, dibuat sekali per proses"""
+    pool = get_pool(path)
+    with pool.write() as conn:
+        ensure_timbangan(conn)
+    return pool
+
+timbangan_pool = inisialisasi_timbangan(st.secrets.get("TIMBANGAN_DB", TIMBANGAN_DB_PATH))
+
+def ambil_berat_timbangan(key_tujuan):
+    """Callback tombol: membaca berat stabil terbaru saat diklik dan mengisinya ke field form"""
+    with timbangan_pool.read() as conn:
+        pembacaan = baca_timbangan(conn, TIMBANGAN_INDIKATOR)
+    if not pembacaan or pembacaan['berat_stabil'] is None:
+        st.session_state['timbangan_pesan'] = ("warning", "Belum ada berat stabil dari timbangan.")
+        return
+    umur = time.time() - pembacaan['waktu_stabil']
+    if umur > TIMBANGAN_MAKS_UMUR_S:
+        st.session_state['timbangan_pesan'] = ("warning", f"Berat stabil terakhir sudah {umur:.0f} detik yang lalu, timbang ulang.")
+        return
+    st.session_state[key_tujuan] = float(pembacaan['berat_stabil'])
+    st.session_state['timbangan_pesan'] = (
+        "success",
+        f"Berat {format_angka(pembacaan['berat_stabil'])} kg diambil "
+        f"(umur pembacaan {umur * 1000:.0f} ms)."
+    )
+
+with timbangan_pool.read() as conn:
+    pembacaan_timbangan = baca_timbangan(conn, TIMBANGAN_INDIKATOR)
+if pembacaan_timbangan:
+    col_berat, col_ambil_bruto, col_ambil_tara = st.columns([2, 1, 1])
+    with col_berat:
+        umur_frame = time.time() - (pembacaan_timbangan['waktu_frame'] or 0)
+        status_berat = "stabil" if pembacaan_timbangan['stabil'] else "belum stabil"
+        if umur_frame > 10:
+            status_berat = f"tidak ada data {umur_frame:.0f} detik"
+        st.metric("⚖️ Berat di Timbangan (kg)", format_angka(pembacaan_timbangan['berat']), status_berat, delta_color="off")
+    with col_ambil_bruto:
+        st.button("⬇️ Ambil sebagai Bruto", key="ambil_bruto_btn", on_click=ambil_berat_timbangan, args=("form_bruto",))
+    with col_ambil_tara:
+        st.button("⬇️ Ambil sebagai Tara", key="ambil_tara_btn", on_click=ambil_berat_timbangan, args=("form_tara",))
+    if 'timbangan_pesan' in st.session_state:
+        jenis, pesan = st.session_state.pop('timbangan_pesan')
+        getattr(st, jenis)(pesan)
+
+# Isian master data di luar form agar saran awalan diperbarui setiap isian berubah
+KEY_MASTER_FORM = ("form_nopol", "form_barang", "form_sopir", "form_po_do", "form_transport")
+col_master1, col_master2 = st.columns(2)
+with col_master1:
+    nomor_polisi = input_master("Nomor Polisi", "nopol", "form_nopol", placeholder="Contoh: B 1234 ABC")
+    nama_barang = input_master("Nama Barang", "barang", "form_barang", placeholder="Contoh: Pasir, Batu Split")
+with col_master2:
+    nama_sopir = input_master("Nama Sopir", "sopir", "form_sopir", placeholder="Contoh: Budi Santoso")
+    po_do = input_master("PO / DO", "po_do", "form_po_do", placeholder="Contoh: PO2023001")
+    transport = input_master("Transport", "transport", "form_transport", placeholder="Contoh: PT. Angkut Jaya")
+
 with st.form("form_surat_jalan", clear_on_submit=True):
     col1, col2 = st.columns(2)
     
@@ -241,21 +489,16 @@ with st.form("form_surat_jalan", clear_on_submit=True):
         tanggal_masuk = st.date_input("Tanggal Masuk", value=datetime.today().date())
         jam_masuk = st.time_input("Jam Masuk", value=datetime.now().time()).strftime("%H:%M")
         nomor_do = st.text_input("Nomor DO / Slip", value=f"{tanggal_masuk.strftime('%d%m%Y')}-{jam_masuk.replace(':', '')}", disabled=True)
-        nomor_polisi = st.text_input("Nomor Polisi", placeholder="Contoh: B 1234 ABC")
-        nama_barang = st.text_input("Nama Barang", placeholder="Contoh: Pasir, Batu Split")
     
     with col2:
         tanggal_keluar = st.date_input("Tanggal Keluar", value=datetime.today().date())
         jam_keluar = st.time_input("Jam Keluar", value=datetime.now().time()).strftime("%H:%M")
-        nama_sopir = st.text_input("Nama Sopir", placeholder="Contoh: Budi Santoso")
-        po_do = st.text_input("PO / DO", placeholder="Contoh: PO2023001")
-        transport = st.text_input("Transport", placeholder="Contoh: PT. Angkut Jaya")
     
     col_bruto, col_tara, col_netto = st.columns(3)
     with col_bruto:
-        bruto = st.number_input("Timbangan I / Bruto (kg)", min_value=0.0, step=1.0, format="%.0f")
+        bruto = st.number_input("Timbangan I / Bruto (kg)", min_value=0.0, step=1.0, format="%.0f", key="form_bruto")
     with col_tara:
-        tara = st.number_input("Timbangan II / Tara (kg)", min_value=0.0, step=1.0, format="%.0f")
+        tara = st.number_input("Timbangan II / Tara (kg)", min_value=0.0, step=1.0, format="%.0f", key="form_tara")
     with col_netto:
         netto = bruto - tara
         st.metric("NETTO (kg)", format_angka(netto))
@@ -273,49 +516,203 @@ with st.form("form_surat_jalan", clear_on_submit=True):
     st.markdown("---")
     submitted = st.form_submit_button("💾 Simpan Data Surat Jalan")
     if submitted:
-        if not nomor_polisi or not nama_sopir or not nama_barang:
-            st.error("🚨 Nomor Polisi, Nama Sopir, dan Nama Barang wajib diisi!")
-        elif bruto <= tara:
-            st.error("🚨 Bruto harus lebih besar dari Tara!")
+        try:
+            with db_pool.write() as conn:
+                slip = simpan_slip(conn, {
+                    "tanggal_masuk": tanggal_masuk, "jam_masuk": jam_masuk,
+                    "tanggal_keluar": tanggal_keluar, "jam_keluar": jam_keluar, "nomor_do": nomor_do,
+                    "nomor_polisi": nomor_polisi, "nama_sopir": nama_sopir, "nama_barang": nama_barang,
+                    "po_do": po_do, "transport": transport, "bruto": bruto, "tara": tara,
+                    "nama_ditimbang": nama_ditimbang, "nama_diterima": nama_diterima,
+                    "nama_diketahui": nama_diketahui,
+                })
+                # Notifikasi Telegram masuk outbox dalam transaksi yang sama dengan INSERT
+                telegram_diantrekan = antrekan_telegram(conn, pesan_input_baru(slip))
+            bangunkan_outbox()
+
+            if telegram_diantrekan:
+                st.success("✅ Data berhasil disimpan dan notifikasi masuk antrean Telegram.")
+            else:
+                st.success("✅ Data berhasil disimpan. (Token Telegram tidak dikonfigurasi)")
+
+            kosongkan_master(*KEY_MASTER_FORM)
+            st.rerun()
+        except SlipError as e:
+            st.error(f"🚨 {e}")
+        except Exception as e:
+            st.error(f"❌ Terjadi kesalahan saat menyimpan data: {e}")
+
+# Penimbangan dua tahap: timbang masuk membuka tiket, timbang keluar menutupnya menjadi slip
+def simpan_slip_tiket(slip):
+    """Notifikasi + pesan sukses untuk slip hasil penutupan tiket (dipanggil setelah commit)"""
+    bangunkan_outbox()
+    st.session_state['tiket_pesan'] = (
+        "success",
+        f"✅ Slip {slip['nomor_do']} untuk {slip['nomor_polisi']} disimpan "
+        f"(Bruto {format_angka(slip['bruto'])} kg, Tara {format_angka(slip['tara'])} kg, "
+        f"Netto {format_angka(slip['netto'])} kg)."
+    )
+
+with st.expander("🔁 Penimbangan Dua Tahap (Masuk / Keluar)"):
+    st.caption(
+        "Timbang masuk membuka tiket; timbang keluar mencari tiket terbuka berdasarkan nomor polisi "
+        "lalu menyimpannya sebagai slip. Kendaraan yang sudah pernah ditimbang dapat memakai tara tersimpan "
+        "sehingga tidak perlu timbang kedua."
+    )
+    if 'tiket_pesan' in st.session_state:
+        jenis, pesan = st.session_state.pop('tiket_pesan')
+        getattr(st, jenis)(pesan)
+
+    col_tiket_masuk, col_tiket_keluar = st.columns(2)
+
+    with col_tiket_masuk:
+        st.subheader("⬇️ Timbang Masuk")
+        if pembacaan_timbangan:
+            st.button("Ambil Berat Masuk dari Timbangan", key="ambil_berat_masuk_btn",
+                      on_click=ambil_berat_timbangan, args=("tiket_berat_masuk",))
+        KEY_MASTER_TIKET = ("tiket_nopol", "tiket_sopir", "tiket_barang", "tiket_po_do", "tiket_transport")
+        tiket_nopol = input_master("Nomor Polisi", "nopol", "tiket_nopol", placeholder="Contoh: B 1234 ABC")
+        tiket_sopir = input_master("Nama Sopir", "sopir", "tiket_sopir")
+        tiket_barang = input_master("Nama Barang", "barang", "tiket_barang")
+        tiket_po_do = input_master("PO / DO", "po_do", "tiket_po_do")
+        tiket_transport = input_master("Transport", "transport", "tiket_transport")
+        with st.form("form_tiket_masuk", clear_on_submit=True):
+            tiket_berat_masuk = st.number_input("Berat Masuk (kg)", min_value=0.0, step=1.0, format="%.0f", key="tiket_berat_masuk")
+            tiket_ditimbang = st.text_input("Nama Ditimbang", value="[Nama Operator Timbang]", key="tiket_ditimbang")
+            tiket_pakai_tara = st.checkbox(
+                "Pakai tara tersimpan (langsung jadi slip tanpa timbang keluar)", key="tiket_pakai_tara"
+            )
+            buka_submitted = st.form_submit_button("🎫 Buka Tiket")
+            if buka_submitted:
+                if not tiket_nopol or not tiket_sopir or not tiket_barang:
+                    st.error("🚨 Nomor Polisi, Nama Sopir, dan Nama Barang wajib diisi!")
+                else:
+                    try:
+                        slip = None
+                        with db_pool.write() as conn:
+                            buka_tiket(
+                                conn, tiket_nopol, tiket_berat_masuk, tiket_sopir, tiket_barang,
+                                tiket_po_do, tiket_transport, tiket_ditimbang
+                            )
+                            tara_tersimpan = get_tara_tersimpan(conn, tiket_nopol) if tiket_pakai_tara else None
+                            if tara_tersimpan:
+                                slip = tutup_tiket(conn, tiket_nopol, tara_tersimpan['tara'])
+                                antrekan_telegram(conn, pesan_input_baru(slip))
+                        if slip:
+                            simpan_slip_tiket(slip)
+                        elif tiket_pakai_tara:
+                            st.session_state['tiket_pesan'] = (
+                                "warning", f"Belum ada tara tersimpan untuk {tiket_nopol}; tiket dibuka, lakukan timbang keluar."
+                            )
+                        else:
+                            st.session_state['tiket_pesan'] = ("success", f"🎫 Tiket {tiket_nopol} dibuka.")
+                        kosongkan_master(*KEY_MASTER_TIKET)
+                        st.rerun()
+                    except TiketError as e:
+                        st.error(f"🚨 {e}")
+
+    with col_tiket_keluar:
+        st.subheader("⬆️ Timbang Keluar")
+        tiket_df = cache_tiket_terbuka(versi_data())
+        if tiket_df.empty:
+            st.info("Tidak ada tiket terbuka.")
         else:
-            tanggal_input = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            try:
-                c.execute('''
-                    INSERT INTO surat_jalan (
-                        tanggal_masuk, jam_masuk, tanggal_keluar, jam_keluar, nomor_do,
-                        nomor_polisi, nama_sopir, nama_barang, po_do, transport,
-                        bruto, tara, netto, tanggal_input,
-                        nama_ditimbang, nama_diterima, nama_diketahui
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    str(tanggal_masuk), jam_masuk, str(tanggal_keluar), jam_keluar, nomor_do,
-                    nomor_polisi, nama_sopir, nama_barang, po_do, transport,
-                    bruto, tara, netto, tanggal_input,
-                    nama_ditimbang, nama_diterima, nama_diketahui
-                ))
-                conn.commit()
-                
-                # Kirim notifikasi Telegram
-                telegram_message = f"📝 <b>INPUT DATA BARU</b>\n\n"
-                telegram_message += f"<b>Nomor DO:</b> {nomor_do}\n"
-                telegram_message += f"<b>Tanggal Masuk:</b> {tanggal_masuk} {jam_masuk}\n"
-                telegram_message += f"<b>Nomor Polisi:</b> {nomor_polisi}\n"
-                telegram_message += f"<b>Sopir:</b> {nama_sopir}\n"
-                telegram_message += f"<b>Barang:</b> {nama_barang}\n"
-                telegram_message += f"<b>Netto:</b> {format_angka(netto)} kg\n\n"
-                telegram_message += f"<i>Dikirim pada: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</i>"
-                
-                if TELEGRAM_TOKEN and TELEGRAM_CHAT_ID:
-                    if send_telegram_message(telegram_message):
-                        st.success("✅ Data berhasil disimpan dan notifikasi terkirim ke Telegram.")
+            nopol_keluar = st.selectbox("Tiket Terbuka (Nomor Polisi)", tiket_df['nomor_polisi'].tolist(), key="tiket_keluar_nopol")
+            tiket = tiket_df[tiket_df['nomor_polisi'] == nopol_keluar].iloc[0]
+            st.write(
+                f"**{tiket['nama_sopir']}** — {tiket['nama_barang']} | Masuk {tiket['tanggal_masuk']} {tiket['jam_masuk']} "
+                f"| Berat masuk **{format_angka(tiket['berat_masuk'])} kg**"
+            )
+            with db_pool.read() as conn:
+                tara_kendaraan = get_tara_tersimpan(conn, nopol_keluar)
+            if tara_kendaraan:
+                st.caption(
+                    f"Tara tersimpan: {format_angka(tara_kendaraan['tara'])} kg "
+                    f"({tara_kendaraan['jumlah_timbang']}x ditimbang, terakhir {tara_kendaraan['terakhir_pada']})"
+                )
+            if pembacaan_timbangan:
+                st.button("Ambil Berat Keluar dari Timbangan", key="ambil_berat_keluar_btn",
+                          on_click=ambil_berat_timbangan, args=("tiket_berat_keluar",))
+            berat_keluar = st.number_input("Berat Keluar (kg)", min_value=0.0, step=1.0, format="%.0f", key="tiket_berat_keluar")
+            tiket_diterima = st.text_input("Nama Diterima", key="tiket_diterima")
+
+            col_tutup, col_tara, col_batal = st.columns(3)
+            aksi_tiket = None
+            with col_tutup:
+                if st.button("✅ Tutup Tiket", key="tutup_tiket_btn"):
+                    aksi_tiket = "tutup"
+            with col_tara:
+                if st.button("📋 Pakai Tara Tersimpan", key="tutup_tara_btn", disabled=not tara_kendaraan):
+                    aksi_tiket = "tara"
+            with col_batal:
+                if st.button("🗑️ Batalkan Tiket", key="batal_tiket_btn"):
+                    aksi_tiket = "batal"
+
+            if aksi_tiket:
+                try:
+                    with db_pool.write() as conn:
+                        if aksi_tiket == "batal":
+                            batalkan_tiket(conn, nopol_keluar)
+                            slip = None
+                        else:
+                            if aksi_tiket == "tutup":
+                                slip = tutup_tiket(conn, nopol_keluar, berat_keluar, nama_diterima=tiket_diterima)
+                            else:
+                                slip = tutup_dengan_tara_tersimpan(conn, nopol_keluar, nama_diterima=tiket_diterima)
+                            antrekan_telegram(conn, pesan_input_baru(slip))
+                    if slip:
+                        simpan_slip_tiket(slip)
                     else:
-                        st.success("✅ Data berhasil disimpan, tetapi gagal mengirim notifikasi Telegram.")
-                else:
-                    st.success("✅ Data berhasil disimpan. (Token Telegram tidak dikonfigurasi)")
-                
-                st.rerun()
-            except Exception as e:
-                st.error(f"❌ Terjadi kesalahan saat menyimpan data: {e}")
+                        st.session_state['tiket_pesan'] = ("info", f"Tiket {nopol_keluar} dibatalkan.")
+                    st.session_state.pop('tiket_berat_keluar', None)
+                    st.rerun()
+                except TiketError as e:
+                    st.error(f"🚨 {e}")
+
+# Impor massal dari CSV/Excel (migrasi data lama / pemulihan setelah gangguan jaringan)
+with st.expander("📥 Impor Data Massal (CSV / Excel)"):
+    st.caption(
+        "Kolom wajib: nomor_polisi, nama_sopir, nama_barang, tanggal_masuk, bruto, tara. "
+        "Kolom lain (jam_masuk, tanggal_keluar, jam_keluar, nomor_do, po_do, transport, netto, "
+        "nama_ditimbang, nama_diterima) bersifat opsional."
+    )
+    berkas_impor = st.file_uploader("Pilih berkas", type=["csv", "txt", "xlsx", "xlsm"], key="berkas_impor")
+    lewati_duplikat = st.checkbox("Lewati data yang sudah ada (Nomor DO + Nomor Polisi + waktu input sama)", value=True)
+    if berkas_impor is not None and st.button("📥 Mulai Impor", key="mulai_impor_btn"):
+        progress_impor = st.progress(0.0, text="Membaca berkas...")
+        ukuran_berkas = max(berkas_impor.size, 1)
+
+        def update_progress_impor(dibaca, diterima, ditolak):
+            fraction = min(berkas_impor.tell() / ukuran_berkas, 1.0)
+            progress_impor.progress(fraction, text=f"{dibaca} baris dibaca · {diterima} diterima · {ditolak} ditolak")
+
+        path_ditolak = os.path.join(TEMP_PDF_DIR, f"impor_ditolak_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        try:
+            hasil_impor = impor_berkas(
+                db_pool, berkas_impor, berkas_impor.name, path_ditolak,
+                chunk_size=int(st.secrets.get("IMPOR_CHUNK_SIZE", DEFAULT_IMPOR_CHUNK_SIZE)),
+                lewati_duplikat=lewati_duplikat,
+                progress_callback=update_progress_impor
+            )
+        except (ValueError, ImportError) as e:
+            hasil_impor = None
+            st.error(f"❌ Gagal mengimpor berkas: {e}")
+
+        if hasil_impor:
+            progress_impor.progress(1.0, text="Impor selesai")
+            st.success(
+                f"✅ {hasil_impor['diterima']} dari {hasil_impor['dibaca']} baris berhasil diimpor "
+                f"({hasil_impor['ditolak']} ditolak, {hasil_impor['duplikat']} duplikat dilewati)."
+            )
+            if hasil_impor['path_ditolak']:
+                with open(hasil_impor['path_ditolak'], "rb") as f:
+                    st.download_button(
+                        "⬇️ Unduh Laporan Baris Ditolak", f,
+                        file_name=os.path.basename(hasil_impor['path_ditolak']), mime="text/csv"
+                    )
+            # Satu notifikasi ringkasan, bukan satu pesan per baris
+            if hasil_impor['diterima']:
+                send_telegram_message(pesan_impor(berkas_impor.name, hasil_impor))
 
 st.markdown("---")
 
@@ -323,106 +720,183 @@ st.markdown("---")
 st.header("📚 Riwayat Data Surat Jalan")
 col_search1, col_search2 = st.columns(2)
 with col_search1:
-    search_nopol = st.text_input("Cari berdasarkan Nomor Polisi", placeholder="Contoh: B 1234 ABC")
+    search_nopol = st.text_input("Cari berdasarkan Nomor Polisi", placeholder="Contoh: B 1234 ABC", key="cari_nopol")
+    # Saran dari indeks awalan: "b1234" juga menemukan "B 1234 ABC"
+    saran_nopol = indeks_master.saran("nopol", search_nopol, 5) if search_nopol else []
+    if saran_nopol and search_nopol not in saran_nopol:
+        def pilih_saran_nopol(nopol):
+            st.session_state["cari_nopol"] = nopol
+        kolom_saran = st.columns(len(saran_nopol))
+        for kolom, nopol in zip(kolom_saran, saran_nopol):
+            kolom.button(nopol, key=f"saran_nopol_{nopol}", on_click=pilih_saran_nopol, args=(nopol,))
 with col_search2:
     search_do = st.text_input("Cari berdasarkan Nomor DO", placeholder="Contoh: DO12345")
 
-query = "SELECT * FROM surat_jalan WHERE 1=1"
-params = []
-if search_nopol:
-    query += " AND nomor_polisi LIKE ?"
-    params.append(f"%{search_nopol}%")
-if search_do:
-    query += " AND nomor_do LIKE ?"
-    params.append(f"%{search_do}%")
+# Slip periode lama ada di arsip tahunan; hanya dicari jika tahunnya dipilih
+jumlah_arsip = cache_tahun_arsip(versi_data())
+arsip_dipilih = ()
+if jumlah_arsip:
+    arsip_dipilih = tuple(sorted(st.multiselect(
+        "Cari juga di arsip tahun", list(jumlah_arsip),
+        format_func=lambda tahun: f"{tahun} ({jumlah_arsip[tahun]} slip)", key="cari_arsip"
+    )))
+
+# Paginasi keyset: simpan cursor awal tiap halaman, reset jika filter berubah
+default_page_size = int(st.secrets.get("RIWAYAT_PAGE_SIZE", DEFAULT_PAGE_SIZE))
+page_size_options = sorted(set(PAGE_SIZE_OPTIONS + [default_page_size]))
+page_size = st.selectbox(
+    "Baris per halaman",
+    page_size_options,
+    index=page_size_options.index(default_page_size),
+    key="riwayat_page_size"
+)
+
+filter_key = (search_nopol, search_do, page_size, arsip_dipilih)
+if st.session_state.get("riwayat_filter_key") != filter_key:
+    st.session_state["riwayat_filter_key"] = filter_key
+    st.session_state["riwayat_cursors"] = [None]
+
+def halaman_berikutnya(cursor):
+    st.session_state["riwayat_cursors"].append(cursor)
+
+def halaman_sebelumnya():
+    if len(st.session_state["riwayat_cursors"]) > 1:
+        st.session_state["riwayat_cursors"].pop()
+
+def buka_pratinjau():
+    st.session_state["pratinjau_aktif"] = True
 
-query += " ORDER BY tanggal_input DESC"
+def tutup_pratinjau():
+    st.session_state["pratinjau_aktif"] = False
 
-result_df = pd.read_sql_query(query, conn, params=params).set_index('id')
+def slip_berikutnya(max_index, cursor, langkah):
+    # Di akhir halaman riwayat, lanjut ke slip pertama halaman berikutnya
+    index = st.session_state["select_row_for_export"]
+    if index + langkah <= max_index:
+        st.session_state["select_row_for_export"] = index + langkah
+    elif cursor is not None:
+        halaman_berikutnya(cursor)
+        st.session_state["select_row_for_export"] = 0
+
+def slip_sebelumnya(page_size, langkah):
+    # Halaman sebelumnya selalu penuh (keyset pagination), jadi mundur ke slip terakhirnya
+    index = st.session_state["select_row_for_export"]
+    if index > 0:
+        st.session_state["select_row_for_export"] = max(index - langkah, 0)
+    elif len(st.session_state["riwayat_cursors"]) > 1:
+        halaman_sebelumnya()
+        st.session_state["select_row_for_export"] = max(page_size - langkah, 0)
+
+page_number = len(st.session_state["riwayat_cursors"])
+try:
+    result_df, next_cursor = cache_history_page(
+        search_nopol, search_do, page_size,
+        st.session_state["riwayat_cursors"][-1], FTS_AKTIF, arsip_dipilih, versi_data()
+    )
+except ArsipError as e:
+    st.error(f"🚨 {e}")
+    arsip_dipilih = ()
+    result_df, next_cursor = cache_history_page(
+        search_nopol, search_do, page_size,
+        st.session_state["riwayat_cursors"][-1], FTS_AKTIF, arsip_dipilih, versi_data()
+    )
+
+col_prev, col_page, col_next = st.columns([1, 2, 1])
+with col_prev:
+    st.button("⬅️ Sebelumnya", key="riwayat_prev_btn", disabled=page_number == 1, on_click=halaman_sebelumnya)
+with col_page:
+    st.caption(f"Halaman {page_number} · {len(result_df)} baris")
+with col_next:
+    st.button("Berikutnya ➡️", key="riwayat_next_btn", disabled=next_cursor is None, on_click=halaman_berikutnya, args=(next_cursor,))
 
 if not result_df.empty:
     st.dataframe(result_df, use_container_width=True)
 
+    # Edit dan hapus hanya untuk slip di tabel utama; slip dari arsip hanya bisa dilihat dan dicetak
+    if arsip_dipilih:
+        with db_pool.read() as conn:
+            aktif_df = filter_slip_aktif(conn, result_df)
+        if len(aktif_df) < len(result_df):
+            st.caption(f"{len(result_df) - len(aktif_df)} slip di halaman ini berasal dari arsip dan tidak dapat diedit atau dihapus.")
+    else:
+        aktif_df = result_df
+
     # Fitur Edit Data dengan expander
     st.subheader("⚙️ Edit Data")
-    selected_id_edit = st.selectbox("Pilih ID untuk Edit:", result_df.index.tolist(), key="select_id_edit")
-    selected_row_edit = result_df.loc[selected_id_edit]
+    selected_id_edit = st.selectbox("Pilih ID untuk Edit:", aktif_df.index.tolist(), key="select_id_edit")
+    if selected_id_edit is None:
+        st.info("Tidak ada slip aktif untuk diedit di halaman ini.")
+    else:
+        selected_row_edit = cache_slip(selected_id_edit, (), versi_data())
     
-    with st.expander(f"Buka Form Edit Data ID: {selected_id_edit}"):
-        with st.form(f"edit_form_{selected_id_edit}"):
-            col_edit1, col_edit2 = st.columns(2)
-            with col_edit1:
-                edit_tanggal_masuk = st.date_input("Tanggal Masuk", value=datetime.strptime(selected_row_edit['tanggal_masuk'], "%Y-%m-%d").date(), key=f"edit_tgl_masuk_{selected_id_edit}")
-                jam_masuk_value = selected_row_edit['jam_masuk']
-                if len(jam_masuk_value) > 5:
-                    jam_masuk_value = jam_masuk_value[:5]
-                edit_jam_masuk = st.time_input("Jam Masuk", value=datetime.strptime(jam_masuk_value, "%H:%M").time()).strftime("%H:%M")
+        with st.expander(f"Buka Form Edit Data ID: {selected_id_edit}"):
+            with st.form(f"edit_form_{selected_id_edit}"):
+                col_edit1, col_edit2 = st.columns(2)
+                with col_edit1:
+                    edit_tanggal_masuk = st.date_input("Tanggal Masuk", value=datetime.strptime(selected_row_edit['tanggal_masuk'], "%Y-%m-%d").date(), key=f"edit_tgl_masuk_{selected_id_edit}")
+                    jam_masuk_value = selected_row_edit['jam_masuk']
+                    if len(jam_masuk_value) > 5:
+                        jam_masuk_value = jam_masuk_value[:5]
+                    edit_jam_masuk = st.time_input("Jam Masuk", value=datetime.strptime(jam_masuk_value, "%H:%M").time()).strftime("%H:%M")
                 
-                edit_nomor_do = st.text_input("Nomor DO / Slip", value=selected_row_edit['nomor_do'], key=f"edit_do_{selected_id_edit}")
-                edit_nomor_polisi = st.text_input("Nomor Polisi", value=selected_row_edit['nomor_polisi'], key=f"edit_nopol_{selected_id_edit}")
-                edit_nama_barang = st.text_input("Nama Barang", value=selected_row_edit['nama_barang'], key=f"edit_barang_{selected_id_edit}")
+                    edit_nomor_do = st.text_input("Nomor DO / Slip", value=selected_row_edit['nomor_do'], key=f"edit_do_{selected_id_edit}")
+                    edit_nomor_polisi = st.text_input("Nomor Polisi", value=selected_row_edit['nomor_polisi'], key=f"edit_nopol_{selected_id_edit}")
+                    edit_nama_barang = st.text_input("Nama Barang", value=selected_row_edit['nama_barang'], key=f"edit_barang_{selected_id_edit}")
             
-            with col_edit2:
-                edit_tanggal_keluar = st.date_input("Tanggal Keluar", value=datetime.strptime(selected_row_edit['tanggal_keluar'], "%Y-%m-%d").date(), key=f"edit_tgl_keluar_{selected_id_edit}")
-                jam_keluar_value = selected_row_edit['jam_keluar']
-                if len(jam_keluar_value) > 5:
-                    jam_keluar_value = jam_keluar_value[:5]
-                edit_jam_keluar = st.time_input("Jam Keluar", value=datetime.strptime(jam_keluar_value, "%H:%M").time()).strftime("%H:%M")
+                with col_edit2:
+                    edit_tanggal_keluar = st.date_input("Tanggal Keluar", value=datetime.strptime(selected_row_edit['tanggal_keluar'], "%Y-%m-%d").date(), key=f"edit_tgl_keluar_{selected_id_edit}")
+                    jam_keluar_value = selected_row_edit['jam_keluar']
+                    if len(jam_keluar_value) > 5:
+                        jam_keluar_value = jam_keluar_value[:5]
+                    edit_jam_keluar = st.time_input("Jam Keluar", value=datetime.strptime(jam_keluar_value, "%H:%M").time()).strftime("%H:%M")
                 
-                edit_nama_sopir = st.text_input("Nama Sopir", value=selected_row_edit['nama_sopir'], key=f"edit_sopir_{selected_id_edit}")
-                edit_po_do = st.text_input("PO / DO", value=selected_row_edit['po_do'], key=f"edit_podo_{selected_id_edit}")
-                edit_transport = st.text_input("Transport", value=selected_row_edit['transport'], key=f"edit_transport_{selected_id_edit}")
+                    edit_nama_sopir = st.text_input("Nama Sopir", value=selected_row_edit['nama_sopir'], key=f"edit_sopir_{selected_id_edit}")
+                    edit_po_do = st.text_input("PO / DO", value=selected_row_edit['po_do'], key=f"edit_podo_{selected_id_edit}")
+                    edit_transport = st.text_input("Transport", value=selected_row_edit['transport'], key=f"edit_transport_{selected_id_edit}")
             
-            col_edit_bruto, col_edit_tara, col_edit_netto = st.columns(3)
-            with col_edit_bruto:
-                edit_bruto = st.number_input("Timbangan I / Bruto (kg)", min_value=0.0, value=float(selected_row_edit['bruto']), step=1.0, format="%.0f", key=f"edit_bruto_{selected_id_edit}")
-            with col_edit_tara:
-                edit_tara = st.number_input("Timbangan II / Tara (kg)", min_value=0.0, value=float(selected_row_edit['tara']), step=1.0, format="%.0f", key=f"edit_tara_{selected_id_edit}")
-            with col_edit_netto:
-                edit_netto = edit_bruto - edit_tara
-                st.metric("NETTO (kg)", format_angka(edit_netto))
+                col_edit_bruto, col_edit_tara, col_edit_netto = st.columns(3)
+                with col_edit_bruto:
+                    edit_bruto = st.number_input("Timbangan I / Bruto (kg)", min_value=0.0, value=float(selected_row_edit['bruto']), step=1.0, format="%.0f", key=f"edit_bruto_{selected_id_edit}")
+                with col_edit_tara:
+                    edit_tara = st.number_input("Timbangan II / Tara (kg)", min_value=0.0, value=float(selected_row_edit['tara']), step=1.0, format="%.0f", key=f"edit_tara_{selected_id_edit}")
+                with col_edit_netto:
+                    edit_netto = edit_bruto - edit_tara
+                    st.metric("NETTO (kg)", format_angka(edit_netto))
             
-            # --- INPUT FORM TANDA TANGAN PADA SAAT EDIT ---
-            st.subheader("Informasi Tanda Tangan (Edit)")
-            col_edit_ttd1, col_edit_ttd2 = st.columns(2)
-            with col_edit_ttd1:
-                edit_nama_ditimbang = st.text_input("Nama Ditimbang", value=selected_row_edit.get('nama_ditimbang', ''), key=f"edit_nama_ditimbang_{selected_id_edit}")
-            with col_edit_ttd2:
-                edit_nama_diterima = st.text_input("Nama Diterima", value=selected_row_edit.get('nama_diterima', ''), key=f"edit_nama_diterima_{selected_id_edit}")
+                # --- INPUT FORM TANDA TANGAN PADA SAAT EDIT ---
+                st.subheader("Informasi Tanda Tangan (Edit)")
+                col_edit_ttd1, col_edit_ttd2 = st.columns(2)
+                with col_edit_ttd1:
+                    edit_nama_ditimbang = st.text_input("Nama Ditimbang", value=selected_row_edit.get('nama_ditimbang', ''), key=f"edit_nama_ditimbang_{selected_id_edit}")
+                with col_edit_ttd2:
+                    edit_nama_diterima = st.text_input("Nama Diterima", value=selected_row_edit.get('nama_diterima', ''), key=f"edit_nama_diterima_{selected_id_edit}")
             
-            edit_nama_diketahui = selected_row_edit.get('nama_diketahui', '')
+                edit_nama_diketahui = selected_row_edit.get('nama_diketahui', '')
 
-            updated = st.form_submit_button("🔄 Update Data")
-            if updated:
-                if not edit_nomor_polisi or not edit_nama_sopir or not edit_nama_barang:
-                    st.error("🚨 Nomor Polisi, Nama Sopir, dan Nama Barang wajib diisi!")
-                elif edit_bruto <= edit_tara:
-                    st.error("🚨 Bruto harus lebih besar dari Tara!")
-                else:
+                updated = st.form_submit_button("🔄 Update Data")
+                if updated:
                     try:
-                        c.execute('''
-                            UPDATE surat_jalan SET
-                                tanggal_masuk = ?, jam_masuk = ?, tanggal_keluar = ?, jam_keluar = ?,
-                                nomor_do = ?, nomor_polisi = ?, nama_sopir = ?, nama_barang = ?,
-                                po_do = ?, transport = ?, bruto = ?, tara = ?, netto = ?,
-                                nama_ditimbang = ?, nama_diterima = ?, nama_diketahui = ?
-                            WHERE id = ?
-                        ''', (
-                            str(edit_tanggal_masuk), edit_jam_masuk, str(edit_tanggal_keluar), edit_jam_keluar,
-                            edit_nomor_do, edit_nomor_polisi, edit_nama_sopir, edit_nama_barang,
-                            edit_po_do, edit_transport, edit_bruto, edit_tara, edit_netto,
-                            edit_nama_ditimbang, edit_nama_diterima, edit_nama_diketahui,
-                            selected_id_edit
-                        ))
-                        conn.commit()
+                        with db_pool.write() as conn:
+                            perbarui_slip(conn, selected_id_edit, {
+                                "tanggal_masuk": edit_tanggal_masuk, "jam_masuk": edit_jam_masuk,
+                                "tanggal_keluar": edit_tanggal_keluar, "jam_keluar": edit_jam_keluar,
+                                "nomor_do": edit_nomor_do, "nomor_polisi": edit_nomor_polisi,
+                                "nama_sopir": edit_nama_sopir, "nama_barang": edit_nama_barang,
+                                "po_do": edit_po_do, "transport": edit_transport,
+                                "bruto": edit_bruto, "tara": edit_tara,
+                                "nama_ditimbang": edit_nama_ditimbang, "nama_diterima": edit_nama_diterima,
+                                "nama_diketahui": edit_nama_diketahui,
+                            })
                         st.success("✅ Data berhasil diupdate!")
                         st.rerun()
+                    except SlipError as e:
+                        st.error(f"🚨 {e}")
                     except Exception as e:
                         st.error(f"❌ Terjadi kesalahan saat mengupdate data: {e}")
 
     # Fitur Hapus Data per Nomor DO
     st.subheader("🗑️ Hapus Data per Nomor DO")
-    do_list = result_df['nomor_do'].sort_values(ascending=False).unique().tolist()
+    do_list = aktif_df['nomor_do'].sort_values(ascending=False).unique().tolist()
     
     if do_list:
         selected_do_to_delete = st.selectbox(
@@ -434,10 +908,13 @@ if not result_df.empty:
         
         if st.button(f"🚨 Hapus Data untuk '{selected_do_to_delete}'", key="delete_do_btn"):
             try:
-                c.execute("DELETE FROM surat_jalan WHERE nomor_do = ?", (selected_do_to_delete,))
-                conn.commit()
-                st.success(f"✅ Data untuk Nomor DO '{selected_do_to_delete}' berhasil dihapus.")
-                st.rerun()
+                with db_pool.write() as conn:
+                    terhapus = hapus_slip_per_do(conn, selected_do_to_delete)
+                if terhapus:
+                    st.success(f"✅ {terhapus} slip untuk Nomor DO '{selected_do_to_delete}' berhasil dihapus.")
+                    st.rerun()
+                else:
+                    st.warning(f"⚠️ Tidak ada slip aktif dengan Nomor DO '{selected_do_to_delete}'; tidak ada yang dihapus.")
             except Exception as e:
                 st.error(f"❌ Terjadi kesalahan saat menghapus data: {e}")
     else:
@@ -454,7 +931,6 @@ if not result_df.empty:
             "Pilih nomor baris (dari tabel di atas) untuk ekspor dan cetak:", 
             min_value=0, 
             max_value=max_index, 
-            value=0,
             step=1, 
             key="select_row_for_export"
         )
@@ -463,37 +939,13 @@ if not result_df.empty:
 
             col_preview_pdf, col_print_local, col_download_single, col_download_batch, col_download_split = st.columns(5) 
 
-            # Fungsi untuk menyiapkan data untuk PDF (agar tidak duplikasi kode)
-            def prepare_pdf_data(row_data):
-                return {
-                    **row_data.to_dict(), 
-                    'nama_sopir_ttd': row_data['nama_sopir'],
-                    'nama_ditimbang_ttd': row_data.get('nama_ditimbang', ''),
-                    'nama_diterima_ttd': row_data.get('nama_diterima', ''),
-                    'nama_diketahui_ttd': row_data.get('nama_diketahui', '')
-                }
-
+            # Preview memakai HTML; Cetak dan Unduh memakai cache PDF yang sama (dirender sekali per versi isi slip)
             with col_preview_pdf:
-                if st.button("👁️ Preview PDF", key="preview_pdf_btn"): 
-                    pdf = PDF()
-                    pdf.add_page()
-                    pdf.add_data(prepare_pdf_data(selected_row))
-                    
-                    output_path = os.path.join(TEMP_PDF_DIR, f"surat_jalan_{selected_row.name}.pdf")
-                    pdf.output(output_path)
-                    
-                    st.subheader("Tampilan Preview PDF")
-                    show_pdf_preview(output_path)
-                    st.success("Tampilan PDF berhasil dibuat.")
+                st.button("👁️ Preview Slip", key="preview_pdf_btn", on_click=buka_pratinjau)
 
             with col_print_local:
                 if st.button("🖨️ Cetak", key=f"print_local_btn_{selected_row.name}"):
-                    output_path_print = os.path.join(TEMP_PDF_DIR, f"surat_jalan_{selected_row.name}.pdf")
-                    if not os.path.exists(output_path_print):
-                        pdf = PDF()
-                        pdf.add_page()
-                        pdf.add_data(prepare_pdf_data(selected_row))
-                        pdf.output(output_path_print)
+                    output_path_print = pdf_cache.get_path(selected_row)
 
                     if print_pdf_to_ready_printer(output_path_print):
                         st.success("Berhasil dikirim ke printer (dari server Streamlit, hanya untuk Windows Lokal)!")
@@ -501,39 +953,74 @@ if not result_df.empty:
                         st.error("Gagal mencetak. Pastikan aplikasi berjalan di Windows, PyWin32 terinstal, dan printer siap.")
 
             with col_download_single: 
-                output_path_download = os.path.join(TEMP_PDF_DIR, f"surat_jalan_{selected_row.name}.pdf")
-                if not os.path.exists(output_path_download):
-                    pdf = PDF()
-                    pdf.add_page()
-                    pdf.add_data(prepare_pdf_data(selected_row))
-                    pdf.output(output_path_download)
-
-                with open(output_path_download, "rb") as f:
-                    st.download_button(
-                        label="⬇️ Unduh PDF",
-                        data=f.read(),
-                        file_name=f"surat_jalan_{selected_row.name}.pdf",
-                        mime="application/pdf",
-                        key=f"download_single_pdf_{selected_row.name}"
-                    )
+                st.download_button(
+                    label="⬇️ Unduh PDF",
+                    # Dirender saat tombol diklik, bukan di setiap rerun
+                    data=partial(pdf_cache.get_bytes, selected_row),
+                    file_name=f"surat_jalan_{selected_row.name}.pdf",
+                    mime="application/pdf",
+                    key=f"download_single_pdf_{selected_row.name}"
+                )
 
             with col_download_batch: 
                 if st.button("⬇️Semua PDF", key="download_batch_pdf_btn"):
-                    pdf = PDF()
-                    output_path_batch = os.path.join(TEMP_PDF_DIR, "batch_surat_jalan.pdf")
                     with st.spinner("Membuat PDF Continuous..."):
-                        if pdf.generate_batch_pdf(result_df.reset_index(), output_path_batch): 
-                            with open(output_path_batch, "rb") as f:
-                                st.download_button("Klik untuk Unduh PDF Continuous", f, file_name="batch_surat_jalan.pdf", mime="application/pdf")
-                            st.success("✅ PDF Continuous berhasil dibuat dan siap diunduh.")
+                        progress_batch = st.progress(0.0, text="Membaca data dari database...")
+                        total_batch = cache_count_history(search_nopol, search_do, FTS_AKTIF, arsip_dipilih, versi_data())
+
+                        def update_progress_batch(pages, parts):
+                            fraction = min(pages / total_batch, 1.0) if total_batch else 0.0
+                            progress_batch.progress(fraction, text=f"{pages} halaman selesai ({parts} part)")
+
+                        try:
+                            part_paths_batch, jumlah_halaman = ekspor_pdf(
+                                db_pool, TEMP_PDF_DIR, search_nopol=search_nopol, search_do=search_do, use_fts=FTS_AKTIF,
+                                pages_per_part=int(st.secrets.get("PDF_HALAMAN_PER_PART", DEFAULT_PAGES_PER_PART)),
+                                progress_callback=update_progress_batch, arsip=arsip_dipilih, gabung_zip=False
+                            )
+                        except Exception as e:
+                            part_paths_batch = []
+                            st.error(f"❌ Gagal membuat PDF Continuous: {e}")
                         else:
-                            st.error("❌ Gagal membuat PDF Continuous.")
+                            if not part_paths_batch:
+                                st.warning("⚠️ Tidak ada slip untuk dibuat PDF Continuous.")
+                        # Satu tombol per part: isi file baru dibaca saat tombolnya diklik, sehingga
+                        # memori server paling banyak satu part (PDF_HALAMAN_PER_PART halaman), bukan
+                        # seluruh ekspor. Tanpa rerun agar tombol part lain tetap tersedia.
+                        for nomor_part, part_path in enumerate(part_paths_batch, start=1):
+                            st.download_button(
+                                "Klik untuk Unduh PDF Continuous"
+                                + (f" (part {nomor_part}/{len(part_paths_batch)})" if len(part_paths_batch) > 1 else ""),
+                                data=Path(part_path).read_bytes,
+                                file_name=os.path.basename(part_path),
+                                mime="application/pdf",
+                                on_click="ignore",
+                                key=f"download_batch_part_{nomor_part}"
+                            )
+                        if part_paths_batch:
+                            st.success(f"✅ PDF Continuous ({jumlah_halaman} halaman, {len(part_paths_batch)} part) berhasil dibuat dan siap diunduh.")
 
             with col_download_split: 
                 if st.button("⬇️Unduh/Nopol", key="download_split_pdf_btn"):
+                    from utils.pdf_generator import PDF
                     pdf = PDF()
                     with st.spinner("Membuat PDF terpisah..."):
-                        file_paths = pdf.generate_split_pdfs(result_df.reset_index(), by="nomor_polisi")
+                        with baca_arsip(db_pool, arsip_dipilih) as (conn, skema):
+                            all_df = fetch_history_all(conn, search_nopol, search_do, use_fts=FTS_AKTIF, arsip=skema)
+                            # Dikelompokkan per ejaan baku agar varian ejaan lama satu kendaraan masuk ke satu file
+                            all_df["nopol_baku"] = baku_series(conn, "nopol", all_df["nomor_polisi"])
+                        progress_split = st.progress(0.0, text="Menyiapkan PDF per nomor polisi...")
+
+                        def update_progress_split(done, total, group_name):
+                            progress_split.progress(done / total, text=f"{done} dari {total} file selesai ({group_name})")
+
+                        file_paths = pdf.generate_split_pdfs(
+                            all_df.reset_index(), by="nopol_baku",
+                            workers=int(st.secrets.get("PDF_WORKERS", os.cpu_count() or 1)),
+                            progress_callback=update_progress_split
+                        )
+                    for group_name, error in pdf.split_errors:
+                        st.error(f"❌ Gagal membuat PDF untuk '{group_name}': {error}")
                     if file_paths:
                         st.success("✅ PDF terpisah berhasil dibuat. Silakan unduh satu per satu di bawah:")
                         for path in file_paths:
@@ -541,60 +1028,150 @@ if not result_df.empty:
                                 st.download_button(f"Unduh: {os.path.basename(path)}", f, file_name=os.path.basename(path), mime="application/pdf", key=f"download_split_{os.path.basename(path)}")
                     else:
                         st.warning("⚠️ Tidak ada PDF terpisah yang dibuat.")
+
+            if st.session_state.get("pratinjau_aktif"):
+                st.subheader("Tampilan Preview Slip")
+                col_slip_prev, col_slip_info, col_slip_jumlah, col_slip_next, col_slip_tutup = st.columns([1, 2, 1, 1, 1])
+                with col_slip_jumlah:
+                    per_layar = st.selectbox("Slip per layar", [1, 2, 4], key="pratinjau_per_layar", label_visibility="collapsed")
+                slip_tampil = [row for _, row in result_df.iloc[int(selected_index):int(selected_index) + per_layar].iterrows()]
+                with col_slip_prev:
+                    st.button("◀️ Slip Sebelumnya", key="pratinjau_prev_btn", disabled=page_number == 1 and selected_index == 0,
+                              on_click=slip_sebelumnya, args=(page_size, per_layar))
+                with col_slip_info:
+                    nomor_awal = (page_number - 1) * page_size + int(selected_index) + 1
+                    st.caption(
+                        f"Slip {nomor_awal}–{nomor_awal + len(slip_tampil) - 1} (halaman riwayat {page_number}) · "
+                        f"ID {', '.join(str(row.name) for row in slip_tampil)}"
+                    )
+                with col_slip_next:
+                    st.button("Slip Berikutnya ▶️", key="pratinjau_next_btn",
+                              disabled=selected_index + per_layar > max_index and next_cursor is None,
+                              on_click=slip_berikutnya, args=(max_index, next_cursor, per_layar))
+                with col_slip_tutup:
+                    st.button("✖️ Tutup", key="pratinjau_tutup_btn", on_click=tutup_pratinjau)
+                show_slip_preview(slip_tampil)
         else:
             st.warning("Pilih baris yang valid dari tabel di atas untuk opsi ekspor/cetak.")
 
 else:
     st.info("Tidak ada data riwayat yang ditemukan. Silakan masukkan data baru.")
 
+# Ekspor data (CSV / Excel / Parquet) untuk akuntansi, ditulis bertahap dari database
+with st.expander("📤 Ekspor Data (CSV / Excel / Parquet)"):
+    col_format, col_cakupan = st.columns(2)
+    with col_format:
+        format_ekspor = st.selectbox("Format", list(FORMAT_EKSPOR), format_func=str.upper, key="format_ekspor")
+    with col_cakupan:
+        cakupan_ekspor = st.radio("Data", ["Filter pencarian saat ini", "Rentang tanggal"], horizontal=True, key="cakupan_ekspor")
+    if cakupan_ekspor == "Rentang tanggal":
+        col_dari, col_sampai = st.columns(2)
+        with col_dari:
+            ekspor_dari = st.date_input("Dari Tanggal", value=datetime.today().date().replace(day=1), key="ekspor_dari")
+        with col_sampai:
+            ekspor_sampai = st.date_input("Sampai Tanggal", value=datetime.today().date(), key="ekspor_sampai")
+        filter_nopol, filter_do = "", ""
+    else:
+        ekspor_dari, ekspor_sampai = None, None
+        filter_nopol, filter_do = search_nopol, search_do
+    # Rentang tanggal otomatis membuka arsip tahun yang dijangkau; filter pencarian memakai pilihan arsip riwayat
+    arsip_ekspor = None if cakupan_ekspor == "Rentang tanggal" else arsip_dipilih
+
+    if st.button("📤 Buat File Ekspor", key="buat_ekspor_btn"):
+        nama_ekspor = f"surat_jalan_{datetime.now().strftime('%Y%m%d_%H%M%S')}{FORMAT_EKSPOR[format_ekspor]}"
+        path_ekspor = os.path.join(TEMP_PDF_DIR, nama_ekspor)
+        status_ekspor = st.empty()
+        try:
+            with st.spinner("Mengekspor data..."):
+                jumlah_ekspor = ekspor_data(
+                    db_pool, path_ekspor, format_ekspor, filter_nopol, filter_do,
+                    ekspor_dari, ekspor_sampai, use_fts=FTS_AKTIF,
+                    progress_callback=lambda jumlah: status_ekspor.caption(f"{jumlah} baris ditulis..."),
+                    arsip=arsip_ekspor
+                )
+        except (ValueError, ImportError, ArsipError) as e:
+            jumlah_ekspor = None
+            st.error(f"❌ Gagal mengekspor data: {e}")
+        if jumlah_ekspor is not None:
+            status_ekspor.empty()
+            st.success(f"✅ {jumlah_ekspor} baris berhasil diekspor.")
+            with open(path_ekspor, "rb") as f:
+                st.download_button(
+                    f"⬇️ Unduh {nama_ekspor}", f, file_name=nama_ekspor,
+                    mime=MIME_EKSPOR[format_ekspor], key="unduh_ekspor_btn"
+                )
+
 st.markdown("---")
 
 # Laporan Harian
 st.header("📊 Laporan Harian")
 tanggal_laporan = st.date_input("Pilih Tanggal Laporan", value=datetime.today().date(), key="tanggal_laporan_input")
-laporan_df = pd.read_sql_query("SELECT * FROM surat_jalan WHERE tanggal_input LIKE ?", conn, params=[f"{tanggal_laporan}%"])
+ringkasan_laporan, laporan_df, rekap_barang_df, rekap_transport_df = cache_laporan_harian(tanggal_laporan, versi_data())
 
 # Tombol kirim manual
 if st.button("📤 Kirim Laporan ke Telegram", key="send_report_btn"):
     with st.spinner("Menyiapkan laporan..."):
         if not laporan_df.empty:
-            total_kendaraan = laporan_df['nomor_polisi'].nunique()
-            total_netto = laporan_df['netto'].sum()
-            
-            telegram_message = f"📊 <b>LAPORAN HARIAN {tanggal_laporan.strftime('%d/%m/%Y')}</b>\n\n"
-            telegram_message += f"<b>Total Kendaraan:</b> {total_kendaraan}\n"
-            telegram_message += f"<b>Total Netto:</b> {format_angka(total_netto)} kg\n\n"
-            telegram_message += "<b>Detail Transaksi:</b>\n"
-            
-            for _, row in laporan_df.iterrows():
-                telegram_message += f"• {row['nomor_do']} | {row['nomor_polisi']} | {row['nama_sopir']} | {format_angka(row['netto'])} kg\n"
-            
-            telegram_message += f"\n\n<i>Dikirim manual pada: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</i>"
+            laporan = susun_laporan_harian(
+                tanggal_laporan, ringkasan_laporan, laporan_df, rekap_barang_df, rekap_transport_df,
+                f"Dikirim manual pada: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            )
             
             if TELEGRAM_TOKEN and TELEGRAM_CHAT_ID:
-                if send_telegram_message(telegram_message):
-                    st.success("✅ Laporan harian berhasil dikirim ke Telegram!")
+                if kirim_laporan_telegram(laporan):
+                    lampiran = " beserta lampiran CSV" if laporan['dokumen'] else ""
+                    st.success(f"✅ Laporan harian ({len(laporan['pesan'])} pesan{lampiran}) masuk antrean dan akan segera dikirim ke Telegram!")
                 else:
-                    st.error("❌ Gagal mengirim laporan ke Telegram.")
+                    st.error("❌ Gagal memasukkan laporan ke antrean Telegram.")
             else:
                 st.error("❌ Token atau Chat ID Telegram belum dikonfigurasi!")
         else:
             st.warning("Tidak ada data untuk dikirim.")
 
 if not laporan_df.empty:
-    total_kendaraan = laporan_df['nomor_polisi'].nunique()
-    total_netto = laporan_df['netto'].sum()
-    
     st.subheader("Ringkasan Harian")
-    col_k, col_n = st.columns(2)
+    col_t, col_k, col_n = st.columns(3)
+    with col_t:
+        st.metric("Jumlah Transaksi", ringkasan_laporan['jumlah_transaksi'])
     with col_k:
-        st.metric("Total Kendaraan Unik", total_kendaraan)
+        st.metric("Total Kendaraan Unik", ringkasan_laporan['jumlah_kendaraan'])
     with col_n:
-        st.metric("Total Netto (kg)", format_angka(total_netto))
+        st.metric("Total Netto (kg)", format_angka(ringkasan_laporan['total_netto']))
+
+    col_barang, col_transport = st.columns(2)
+    with col_barang:
+        st.caption("Per Nama Barang")
+        st.dataframe(rekap_barang_df, use_container_width=True, hide_index=True)
+    with col_transport:
+        st.caption("Per Transport")
+        st.dataframe(rekap_transport_df, use_container_width=True, hide_index=True)
     
     st.dataframe(laporan_df.set_index('id'), use_container_width=True)
 else:
     st.info("Tidak ada data untuk laporan pada tanggal ini.")
 
 st.markdown("---")
-st.caption("Aplikasi Surat Jalan & Slip Penimbangan v1.0 | Dibuat Oleh Ridwan Melba")
\ No newline at end of file
+st.caption("Aplikasi Surat Jalan & Slip Penimbangan v1.0 | Dibuat Oleh Ridwan Melba")
+
+# Panel performa: total waktu per kategori pada rerun ini dan p50/p95 per span sejak proses dimulai
+if metrik.aktif():
+    metrik.registri.catat("rerun", "ONE_SISTEM", time.perf_counter() - _mulai_rerun)
+    total_rerun = metrik.selesai_rerun()
+    if st.secrets.get("METRIK_PANEL", True) and st.sidebar.checkbox("📈 Panel Performa", key="panel_performa"):
+        durasi_rerun = total_rerun.pop("rerun", (0, 0.0))[1]
+        st.sidebar.metric("Rerun terakhir", f"{durasi_rerun * 1000:.0f} ms")
+        if total_rerun:
+            st.sidebar.dataframe(
+                pd.DataFrame(
+                    [(k, n, round(d * 1000, 1)) for k, (n, d) in sorted(total_rerun.items())],
+                    columns=["kategori", "jumlah", "total_ms"],
+                ),
+                use_container_width=True, hide_index=True
+            )
+        ringkasan_span = metrik.ringkasan()
+        if ringkasan_span:
+            st.sidebar.caption("Per span sejak proses dimulai")
+            st.sidebar.dataframe(
+                pd.DataFrame(ringkasan_span)[["kategori", "nama", "jumlah", "p50_ms", "p95_ms", "total_ms"]],
+                use_container_width=True, hide_index=True
+            )
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""Menjalankan seluruh benchmark (database, laporan, PDF, start dingin) dan menulis hasilnya sebagai JSON.
+
+Contoh (dataset dibuat sekali lalu dipakai ulang dari --data-dir):
+
+    python -m benchmarks --rows 1000000 --output hasil/bench_1m.json
+    python -m benchmarks --rows 1000000 --output hasil/baru.json --bandingkan hasil/bench_1m.json
+
+Dengan --bandingkan, metrik waktu yang melambat lebih dari --ambang dicetak
+dan proses keluar dengan kode 1.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks import bench_db, bench_pdf, bench_startup
+from benchmarks.generator import DEFAULT_SEED, VERSI_GENERATOR, buat_dataset
+from utils.database import get_pool
+from utils.rekap import fetch_transaksi_harian
+
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), "surat_jalan_bench")
+DEFAULT_AMBANG = 0.10
+
+
+def info_mesin():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "waktu": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu": os.cpu_count(),
+    }
+
+
+def siapkan_dataset(data_dir, rows, seed):
+    """Path dataset untuk (rows, seed); dibuat jika belum ada"""
+    path = os.path.join(data_dir, f"surat_jalan_{rows}_s{seed}_v{VERSI_GENERATOR}.db")
+    info_path = path + ".json"
+    if os.path.exists(path) and os.path.exists(info_path):
+        with open(info_path, encoding="utf-8") as f:
+            return path, json.load(f)
+
+    def progress(selesai, total):
+        print(f"\rMembuat dataset: {selesai}/{total} baris", end="", file=sys.stderr)
+
+    info = buat_dataset(path, rows, seed, progress_callback=progress)
+    print(file=sys.stderr)
+    with open(info_path, "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+    return path, info
+
+
+def bench_pdf_dataset(db_path, tanggal, maks_baris, single):
+    """Benchmark PDF memakai transaksi hari tersibuk dari dataset (split per nomor polisi)"""
+    with get_pool(db_path).read() as conn:
+        df = fetch_transaksi_harian(conn, datetime.strptime(tanggal, "%Y-%m-%d").date(), limit=maks_baris)
+    return bench_pdf.ukur_pdf(df, single)
+
+
+def ratakan(hasil, awalan=""):
+    """{'a': {'b_ms': 1}} -> {'a.b_ms': 1}"""
+    datar = {}
+    for kunci, nilai in hasil.items():
+        if isinstance(nilai, dict):
+            datar.update(ratakan(nilai, f"{awalan}{kunci}."))
+        else:
+            datar[f"{awalan}{kunci}"] = nilai
+    return datar
+
+
+def bandingkan(lama, baru, ambang=DEFAULT_AMBANG):
+    """Daftar (metrik, nilai_lama, nilai_baru, rasio) yang melambat lebih dari `ambang`"""
+    lama, baru = ratakan(lama["hasil"]), ratakan(baru["hasil"])
+    regresi = []
+    for kunci, nilai in baru.items():
+        sebelum = lama.get(kunci)
+        if not isinstance(nilai, (int, float)) or not isinstance(sebelum, (int, float)) or sebelum <= 0:
+            continue
+        # min/p95 terlalu berisik untuk dibandingkan; median dan total sudah mewakili
+        if kunci.endswith(("median_ms", "_ms_total", "_ms_per_dokumen", "_ms_per_slip")):
+            rasio = nilai / sebelum
+        elif kunci.endswith("_per_detik") and nilai > 0:
+            rasio = sebelum / nilai
+        else:
+            continue
+        if rasio > 1 + ambang:
+            regresi.append((kunci, sebelum, nilai, round(rasio, 2)))
+    return regresi
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="ukuran dataset (10 ribu s.d. 5 juta)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="lokasi cache dataset")
+    parser.add_argument("--output", help="file JSON hasil (default: stdout)")
+    parser.add_argument("--ulang", type=int, default=bench_db.DEFAULT_ULANG, help="pengulangan per pengukuran")
+    parser.add_argument("--pdf-baris", type=int, default=200, help="maksimum halaman batch/split PDF")
+    parser.add_argument("--pdf-single", type=int, default=20, help="jumlah render PDF tunggal")
+    parser.add_argument("--tanpa-pdf", action="store_true")
+    parser.add_argument("--tanpa-insert", action="store_true")
+    parser.add_argument("--tanpa-startup", action="store_true", help="lewati pengukuran waktu impor ONE_SISTEM.py")
+    parser.add_argument("--bandingkan", help="file JSON hasil sebelumnya sebagai pembanding")
+    parser.add_argument("--ambang", type=float, default=DEFAULT_AMBANG, help="batas perlambatan (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    db_path, dataset = siapkan_dataset(args.data_dir, args.rows, args.seed)
+    hasil = bench_db.jalankan(db_path, args.ulang, insert=not args.tanpa_insert)
+    if not args.tanpa_pdf:
+        hasil["pdf"] = bench_pdf_dataset(db_path, hasil["sampel"]["tanggal_sibuk"], args.pdf_baris, args.pdf_single)
+    if not args.tanpa_startup:
+        hasil["startup"] = bench_startup.ukur_startup()
+
+    laporan = {"mesin": info_mesin(), "dataset": dataset, "hasil": hasil}
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(laporan, f, indent=2)
+        print(f"Hasil benchmark ditulis ke {args.output}", file=sys.stderr)
+    else:
+        json.dump(laporan, sys.stdout, indent=2)
+        print()
+
+    if args.bandingkan:
+        with open(args.bandingkan, encoding="utf-8") as f:
+            lama = json.load(f)
+        if lama.get("dataset", {}).get("rows") != dataset["rows"]:
+            print("Peringatan: ukuran dataset pembanding berbeda", file=sys.stderr)
+        regresi = bandingkan(lama, laporan, args.ambang)
+        for kunci, sebelum, sesudah, rasio in regresi:
+            print(f"REGRESI {kunci}: {sebelum} -> {sesudah} ({rasio}x)", file=sys.stderr)
+        if regresi:
+            sys.exit(1)
+        print("Tidak ada regresi di atas ambang.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
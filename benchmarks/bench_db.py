@@ -0,0 +1,177 @@
+"""Benchmark query riwayat, agregasi laporan harian dan throughput insert.
+
+Jalankan dari root repo terhadap database hasil benchmarks.generator:
+
+    python -m benchmarks.bench_db --db /tmp/surat_jalan_1m.db
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from utils.database import get_pool
+from utils.impor import KOLOM_INSERT
+from utils.laporan import susun_laporan_harian
+from utils.master_data import catat_master, kanonikkan
+from utils.migrasi import fts_index_aktif
+from utils.rekap import fetch_transaksi_harian, get_rekap_barang, get_rekap_transport, get_ringkasan_harian
+from utils.riwayat import count_history, fetch_history_page
+
+DEFAULT_ULANG = 7
+
+
+def ukur(fungsi, ulang=DEFAULT_ULANG, pemanasan=1):
+    """Menjalankan `fungsi` berulang kali; statistik waktu dalam milidetik"""
+    for _ in range(pemanasan):
+        fungsi()
+    waktu = []
+    for _ in range(ulang):
+        mulai = time.perf_counter()
+        fungsi()
+        waktu.append((time.perf_counter() - mulai) * 1000)
+    waktu.sort()
+    return {
+        "median_ms": round(statistics.median(waktu), 3),
+        "p95_ms": round(waktu[min(len(waktu) - 1, int(len(waktu) * 0.95))], 3),
+        "min_ms": round(waktu[0], 3),
+        "n": ulang,
+    }
+
+
+def sampel_data(pool):
+    """Nilai contoh yang stabil dari dataset: nopol terbanyak, nopol jarang, DO dan hari tersibuk"""
+    with pool.read() as conn:
+        nopol_umum, nopol_jarang = (
+            conn.execute(f"SELECT nomor_polisi FROM rekap_kendaraan_harian GROUP BY nomor_polisi "
+                         f"ORDER BY SUM(jumlah_transaksi) {urutan}, nomor_polisi LIMIT 1").fetchone()[0]
+            for urutan in ("DESC", "ASC")
+        )
+        tanggal_sibuk = conn.execute(
+            "SELECT tanggal FROM rekap_harian ORDER BY jumlah_transaksi DESC, tanggal LIMIT 1"
+        ).fetchone()[0]
+        nomor_do = conn.execute(
+            "SELECT nomor_do FROM surat_jalan WHERE id = (SELECT MAX(id) / 2 FROM surat_jalan)"
+        ).fetchone()[0]
+        use_fts = fts_index_aktif(conn)
+    return {"nopol_umum": nopol_umum, "nopol_jarang": nopol_jarang, "tanggal_sibuk": tanggal_sibuk,
+            "nomor_do": nomor_do, "use_fts": use_fts}
+
+
+def bench_riwayat(pool, sampel, ulang=DEFAULT_ULANG):
+    use_fts = sampel["use_fts"]
+
+    def halaman(search_nopol="", search_do="", lompat=0):
+        def jalankan():
+            with pool.read() as conn:
+                cursor = None
+                for _ in range(lompat + 1):
+                    _, cursor = fetch_history_page(conn, search_nopol, search_do, cursor=cursor, use_fts=use_fts)
+        return jalankan
+
+    def hitung(search_nopol="", search_do=""):
+        def jalankan():
+            with pool.read() as conn:
+                count_history(conn, search_nopol, search_do, use_fts=use_fts)
+        return jalankan
+
+    # Awalan 4 huruf nopol, seperti yang diketik operator
+    awalan_umum = sampel["nopol_umum"][:4]
+    return {
+        "halaman_pertama": ukur(halaman(), ulang),
+        "halaman_ke_20": ukur(halaman(lompat=19), ulang),
+        "cari_nopol_umum": ukur(halaman(sampel["nopol_umum"]), ulang),
+        "cari_nopol_jarang": ukur(halaman(sampel["nopol_jarang"]), ulang),
+        "cari_awalan_nopol": ukur(halaman(awalan_umum), ulang),
+        "cari_nomor_do": ukur(halaman(search_do=sampel["nomor_do"]), ulang),
+        "hitung_nopol_umum": ukur(hitung(sampel["nopol_umum"]), ulang),
+        "hitung_semua": ukur(hitung(), ulang),
+    }
+
+
+def bench_laporan(pool, sampel, ulang=DEFAULT_ULANG):
+    tanggal = datetime.strptime(sampel["tanggal_sibuk"], "%Y-%m-%d").date()
+
+    def baca():
+        with pool.read() as conn:
+            return (
+                get_ringkasan_harian(conn, tanggal),
+                fetch_transaksi_harian(conn, tanggal),
+                get_rekap_barang(conn, tanggal),
+                get_rekap_transport(conn, tanggal),
+            )
+
+    data = baca()
+    return {
+        "tanggal": str(tanggal),
+        "transaksi": len(data[1]),
+        "agregasi_rekap": ukur(baca, ulang),
+        "susun_pesan": ukur(lambda: susun_laporan_harian(tanggal, *data, "Laporan benchmark"), ulang),
+        "total": ukur(lambda: susun_laporan_harian(tanggal, *baca(), "Laporan benchmark"), ulang),
+    }
+
+
+def bench_insert(pool, jumlah=200, jumlah_batch=5000):
+    """Throughput insert: satu transaksi per slip seperti form input, dan executemany seperti impor.
+
+    Baris benchmark dihapus lagi setelahnya agar dataset bisa dipakai ulang.
+    """
+    with pool.read() as conn:
+        contoh = dict(zip(KOLOM_INSERT, conn.execute(
+            f"SELECT {', '.join(KOLOM_INSERT)} FROM surat_jalan ORDER BY id DESC LIMIT 1"
+        ).fetchone()))
+        id_awal = conn.execute("SELECT COALESCE(MAX(id), 0) FROM surat_jalan").fetchone()[0]
+    contoh["nomor_do"] = "BENCH"
+    insert_sql = f"INSERT INTO surat_jalan ({', '.join(KOLOM_INSERT)}) VALUES ({', '.join('?' for _ in KOLOM_INSERT)})"
+
+    try:
+        mulai = time.perf_counter()
+        for _ in range(jumlah):
+            with pool.write() as conn:
+                baris = kanonikkan(conn, contoh)
+                conn.execute(insert_sql, [baris[k] for k in KOLOM_INSERT])
+                catat_master(conn, baris, baris["tanggal_input"])
+        detik_form = time.perf_counter() - mulai
+
+        mulai = time.perf_counter()
+        with pool.write() as conn:
+            conn.executemany(insert_sql, ([contoh[k] for k in KOLOM_INSERT] for _ in range(jumlah_batch)))
+        detik_batch = time.perf_counter() - mulai
+    finally:
+        with pool.write() as conn:
+            conn.execute("DELETE FROM surat_jalan WHERE id > ? AND nomor_do = 'BENCH'", (id_awal,))
+
+    return {
+        "form_baris_per_detik": round(jumlah / detik_form, 1),
+        "form_ms_per_slip": round(detik_form / jumlah * 1000, 3),
+        "batch_baris_per_detik": round(jumlah_batch / detik_batch, 1),
+    }
+
+
+def jalankan(db_path, ulang=DEFAULT_ULANG, insert=True):
+    pool = get_pool(db_path)
+    sampel = sampel_data(pool)
+    hasil = {
+        "sampel": sampel,
+        "riwayat": bench_riwayat(pool, sampel, ulang),
+        "laporan": bench_laporan(pool, sampel, ulang),
+    }
+    if insert:
+        hasil["insert"] = bench_insert(pool)
+    return hasil
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True, help="database hasil benchmarks.generator")
+    parser.add_argument("--ulang", type=int, default=DEFAULT_ULANG, help="pengulangan per pengukuran")
+    parser.add_argument("--tanpa-insert", action="store_true", help="lewati benchmark insert (database tidak ditulis)")
+    args = parser.parse_args(argv)
+
+    json.dump(jalankan(args.db, args.ulang, not args.tanpa_insert), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark biaya render PDF per dokumen, dengan dan tanpa cache font.
+
+Jalankan dari root repo:
+
+    python -m benchmarks.bench_pdf --rows 200 --groups 50
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from utils.pdf_generator import PDF, clear_font_cache
+
+
+def contoh_baris(i):
+    return {
+        'id': i + 1,
+        'tanggal_masuk': '2025-05-30', 'jam_masuk': '08:00',
+        'tanggal_keluar': '2025-05-30', 'jam_keluar': '09:15',
+        'nomor_do': f'30052025-{i:04d}',
+        'nomor_polisi': f'B {1000 + i % 97} ABC',
+        'nama_sopir': f'Sopir {i % 23}',
+        'nama_barang': ['Pasir', 'Batu Split', 'Tanah Urug'][i % 3],
+        'po_do': f'PO{2025000 + i}',
+        'transport': ['PT. Angkut Jaya', 'CV. Maju'][i % 2],
+        'bruto': 25000 + i, 'tara': 9000, 'netto': 16000 + i,
+        'nama_ditimbang': 'Operator', 'nama_diterima': 'Gudang', 'nama_diketahui': '',
+    }
+
+
+def bench_single(n, output_dir):
+    start = time.perf_counter()
+    for i in range(n):
+        row = contoh_baris(i)
+        pdf = PDF()
+        pdf.add_page()
+        pdf.add_data({**row, 'nama_sopir_ttd': row['nama_sopir']})
+        pdf.output(os.path.join(output_dir, f"single_{i}.pdf"))
+    return (time.perf_counter() - start) / n
+
+
+def bench_batch(df, output_dir):
+    start = time.perf_counter()
+    PDF().generate_batch_pdf(df, os.path.join(output_dir, "batch.pdf"))
+    return time.perf_counter() - start
+
+
+def bench_split(df, output_dir):
+    cwd = os.getcwd()
+    os.chdir(output_dir)
+    os.makedirs("temp_pdf", exist_ok=True)
+    try:
+        start = time.perf_counter()
+        paths = PDF().generate_split_pdfs(df, by="nomor_polisi")
+        elapsed = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+    return elapsed / max(len(paths), 1), len(paths)
+
+
+def ukur_pdf(df, single=20):
+    """Render tunggal, batch dan split untuk DataFrame `df` dengan konfigurasi cache font saat ini"""
+    fonts_dir = os.path.abspath("fonts")
+    with tempfile.TemporaryDirectory() as tmp:
+        # generate_split_pdfs memakai path relatif; sediakan folder fonts di direktori kerja
+        os.symlink(fonts_dir, os.path.join(tmp, "fonts"))
+        single_s = bench_single(single, tmp)
+        batch_s = bench_batch(df, tmp)
+        split_per_doc_s, split_docs = bench_split(df, tmp)
+    return {
+        "single_ms_per_dokumen": round(single_s * 1000, 2),
+        "batch_ms_total": round(batch_s * 1000, 2),
+        "batch_halaman": len(df),
+        "split_ms_per_dokumen": round(split_per_doc_s * 1000, 2),
+        "split_dokumen": split_docs,
+    }
+
+
+def jalankan(rows=200, groups=50, single=20):
+    df = pd.DataFrame([contoh_baris(i) for i in range(rows)])
+    df['nomor_polisi'] = [f'B {1000 + i % groups} ABC' for i in range(rows)]
+    hasil = {}
+    for label, enabled in (("tanpa_cache", False), ("dengan_cache", True)):
+        PDF.font_cache_enabled = enabled
+        clear_font_cache()
+        hasil[label] = ukur_pdf(df, single)
+    PDF.font_cache_enabled = True
+    return hasil
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200, help="jumlah baris untuk batch/split")
+    parser.add_argument("--groups", type=int, default=50, help="jumlah nomor polisi berbeda untuk split")
+    parser.add_argument("--single", type=int, default=20, help="jumlah dokumen tunggal")
+    parser.add_argument("--json", action="store_true", help="cetak hasil sebagai JSON")
+    args = parser.parse_args(argv)
+
+    hasil = jalankan(args.rows, args.groups, args.single)
+    if args.json:
+        json.dump(hasil, sys.stdout, indent=2)
+        print()
+        return
+    for label, metrik in hasil.items():
+        print(f"[{label}]")
+        for key, value in metrik.items():
+            print(f"  {key:<24} {value}")
+
+
+if __name__ == "__main__":
+    main()
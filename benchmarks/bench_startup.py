@@ -0,0 +1,94 @@
+"""Benchmark start dingin: waktu impor modul yang dimuat ONE_SISTEM.py saat start.
+
+Blok import tingkat atas ONE_SISTEM.py diambil apa adanya lalu dijalankan di
+proses Python baru dengan `-X importtime`, sehingga modul yang sudah dimuat
+proses benchmark tidak ikut terhitung. Jalankan dari root repo:
+
+    python -m benchmarks.bench_startup --ulang 5
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SKRIP = os.path.join(ROOT, "ONE_SISTEM.py")
+DEFAULT_ULANG = 5
+# Modul mahal yang seharusnya baru dimuat saat dipakai (render PDF, kirim Telegram, scheduler, impor Excel)
+MODUL_BERAT = ("fpdf", "apscheduler", "requests", "openpyxl", "serial")
+PENANDA = "--impor-skrip--\n"
+
+
+def blok_impor(path=SKRIP):
+    """Kode sumber semua statement import tingkat atas di `path`"""
+    with open(path, encoding="utf-8") as f:
+        sumber = f.read()
+    pohon = ast.parse(sumber)
+    return "\n".join(
+        ast.get_source_segment(sumber, node) for node in pohon.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+
+def importtime(kode, cwd=ROOT):
+    """Menjalankan `kode` dengan -X importtime; daftar (nama, kedalaman, self_us, kumulatif_us)"""
+    # Penanda memisahkan impor bawaan interpreter (site, encodings) dari impor skrip
+    proses = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys; sys.stderr.write({PENANDA!r})\n{kode}"],
+        cwd=cwd, capture_output=True, text=True, check=True,
+    )
+    hasil = []
+    for baris in proses.stderr.split(PENANDA, 1)[-1].splitlines():
+        if not baris.startswith("import time:"):
+            continue
+        self_us, kumulatif_us, nama = baris[len("import time:"):].split("|")
+        # Satu spasi untuk impor langsung, tambah dua spasi per tingkat impor bersarang
+        kedalaman = (len(nama) - len(nama.lstrip()) - 1) // 2
+        hasil.append((nama.strip(), kedalaman, int(self_us), int(kumulatif_us)))
+    return hasil
+
+
+def ukur_startup(path=SKRIP, ulang=DEFAULT_ULANG, teratas=15):
+    """Statistik waktu impor tingkat atas skrip dan modul termahal (milidetik)"""
+    kode = blok_impor(path)
+    total, per_modul = [], []
+    for _ in range(ulang):
+        data = importtime(kode, cwd=os.path.dirname(os.path.abspath(path)))
+        atas = {nama: kum for nama, kedalaman, _, kum in data if kedalaman == 0}
+        total.append(sum(atas.values()) / 1000)
+        per_modul.append((total[-1], atas, {nama for nama, *_ in data}))
+
+    total_urut = sorted(total)
+    # Rincian diambil dari pengulangan yang totalnya median, agar angka per modul konsisten
+    _, atas, semua = sorted(per_modul, key=lambda p: p[0])[len(per_modul) // 2]
+    termahal = sorted(atas.items(), key=lambda item: item[1], reverse=True)[:teratas]
+    return {
+        "impor_total": {
+            "median_ms": round(statistics.median(total_urut), 3),
+            "min_ms": round(total_urut[0], 3),
+            "n": ulang,
+        },
+        "modul_berat_dimuat": sorted(m for m in MODUL_BERAT if m in semua),
+        "modul_termahal": {nama: round(kum / 1000, 1) for nama, kum in termahal},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skrip", default=SKRIP, help="skrip Streamlit yang diukur")
+    parser.add_argument("--ulang", type=int, default=DEFAULT_ULANG)
+    parser.add_argument("--teratas", type=int, default=15, help="jumlah modul termahal yang ditampilkan")
+    args = parser.parse_args(argv)
+
+    hasil = ukur_startup(args.skrip, args.ulang, args.teratas)
+    json.dump(hasil, sys.stdout, indent=2)
+    print()
+    if hasil["modul_berat_dimuat"]:
+        print(f"Peringatan: modul berat dimuat saat start: {', '.join(hasil['modul_berat_dimuat'])}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Generator dataset surat_jalan sintetis untuk benchmark.
+
+Distribusi dibuat miring seperti data asli: sebagian kecil kendaraan, sopir
+dan barang mendominasi transaksi. Jalankan dari root repo:
+
+    python -m benchmarks.generator --rows 1000000 --output /tmp/surat_jalan_1m.db
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.database import get_pool
+from utils.impor import KOLOM_INSERT
+from utils.migrasi import jalankan_migrasi
+
+# Dinaikkan jika bentuk data berubah, agar dataset lama di cache tidak dipakai ulang
+VERSI_GENERATOR = 1
+
+DEFAULT_SEED = 42
+DEFAULT_CHUNK_SIZE = 100_000
+# Timbangan sibuk: sekitar 400 transaksi per hari
+TRANSAKSI_PER_HARI = 400
+
+KODE_WILAYAH = ["B", "D", "F", "A", "E", "T", "Z", "H", "L", "N", "AB", "AD", "BK", "DK", "KT"]
+NAMA_DEPAN = ["Budi", "Agus", "Slamet", "Joko", "Dedi", "Andi", "Rudi", "Hendra", "Asep", "Wahyu",
+              "Eko", "Bambang", "Yusuf", "Rahmat", "Iwan", "Dodi", "Hadi", "Sugeng", "Teguh", "Ujang"]
+NAMA_BELAKANG = ["Santoso", "Saputra", "Hidayat", "Wijaya", "Setiawan", "Kurniawan", "Pratama",
+                 "Nugroho", "Gunawan", "Susanto", "Hermawan", "Firmansyah", "Siregar", "Sinaga"]
+# (nama barang, rata-rata netto kg)
+BARANG = [
+    ("Pasir", 18000), ("Batu Split", 22000), ("Tanah Urug", 16000), ("Batu Kali", 20000),
+    ("Sirtu", 19000), ("Abu Batu", 17000), ("Semen Curah", 28000), ("Kerikil", 21000),
+    ("Besi Beton", 12000), ("Batu Bara", 25000), ("Kayu Log", 14000), ("Batu Bata", 9000),
+    ("Pasir Silika", 23000), ("Limestone", 26000), ("Aspal Curah", 24000),
+]
+TRANSPORT = ["PT. Angkut Jaya", "CV. Maju", "PT. Sinar Logistik", "CV. Berkah Abadi", "PT. Trans Nusantara",
+             "CV. Sumber Rejeki", "PT. Mitra Armada", "UD. Sejahtera", "PT. Lintas Cargo", "CV. Karya Mandiri"]
+
+
+def bobot_zipf(n, s=1.1):
+    """Peluang berpangkat (rank^-s): beberapa nilai teratas sangat sering muncul"""
+    bobot = 1.0 / np.arange(1, n + 1) ** s
+    return bobot / bobot.sum()
+
+
+def buat_armada(rng, jumlah_kendaraan):
+    """Kendaraan dengan sopir tetap, transport tetap dan tara sendiri"""
+    nopol = np.array([
+        f"{rng.choice(KODE_WILAYAH)} {rng.integers(1, 9999)} {''.join(rng.choice(list('ABCDEFGHJKLMNPRSTUVWXYZ'), rng.integers(1, 4)))}"
+        for _ in range(jumlah_kendaraan)
+    ], dtype=object)
+    jumlah_sopir = max(10, int(jumlah_kendaraan * 0.8))
+    sopir = np.array([
+        f"{NAMA_DEPAN[i % len(NAMA_DEPAN)]} {NAMA_BELAKANG[(i // len(NAMA_DEPAN)) % len(NAMA_BELAKANG)]}"
+        + (f" {i // (len(NAMA_DEPAN) * len(NAMA_BELAKANG)) + 1}" if i >= len(NAMA_DEPAN) * len(NAMA_BELAKANG) else "")
+        for i in rng.permutation(jumlah_sopir)
+    ], dtype=object)
+    return {
+        "nopol": nopol,
+        "sopir": sopir,
+        "sopir_tetap": rng.integers(0, jumlah_sopir, jumlah_kendaraan),
+        "transport_tetap": rng.choice(len(TRANSPORT), jumlah_kendaraan, p=bobot_zipf(len(TRANSPORT), 0.8)),
+        "tara": np.round(rng.normal(9500, 2000, jumlah_kendaraan).clip(4000, 16000), -1),
+        "bobot_kendaraan": bobot_zipf(jumlah_kendaraan, 0.8),
+        "bobot_sopir": bobot_zipf(jumlah_sopir, 0.8),
+    }
+
+
+def buat_chunk(rng, armada, mulai, jumlah, total, tanggal_awal, hari):
+    """Satu potongan baris surat_jalan sebagai DataFrame berkolom KOLOM_INSERT, urut waktu"""
+    urutan = np.arange(mulai, mulai + jumlah)
+    hari_ke = (urutan * hari) // total
+    menit = rng.integers(6 * 60, 20 * 60, jumlah)
+    menit = menit[np.lexsort((menit, hari_ke))]
+    masuk = (
+        np.datetime64(tanggal_awal, "m") + hari_ke.astype("timedelta64[D]")
+        + menit.astype("timedelta64[m]")
+    )
+    # Lama di lokasi: log-normal, median sekitar 40 menit
+    durasi = rng.lognormal(math.log(40), 0.5, jumlah).clip(5, 600).astype("int64")
+    keluar = masuk + durasi.astype("timedelta64[m]")
+    teks_masuk = pd.Series(np.datetime_as_string(masuk, unit="m"))
+    teks_keluar = pd.Series(np.datetime_as_string(keluar, unit="m"))
+
+    kendaraan = rng.choice(len(armada["nopol"]), jumlah, p=armada["bobot_kendaraan"])
+    # Umumnya sopir tetap kendaraan, sesekali sopir pengganti
+    sopir = np.where(
+        rng.random(jumlah) < 0.85,
+        armada["sopir_tetap"][kendaraan],
+        rng.choice(len(armada["sopir"]), jumlah, p=armada["bobot_sopir"]),
+    )
+    barang = rng.choice(len(BARANG), jumlah, p=bobot_zipf(len(BARANG), 1.3))
+    rata_netto = np.array([b[1] for b in BARANG])[barang]
+    netto = np.round(rng.normal(rata_netto, rata_netto * 0.15).clip(500, 45000), -1)
+    tara = armada["tara"][kendaraan] + np.round(rng.normal(0, 40, jumlah), -1)
+    detik = pd.Series(rng.integers(0, 60, jumlah)).map("{:02d}".format)
+
+    df = pd.DataFrame({
+        "tanggal_masuk": teks_masuk.str.slice(0, 10),
+        "jam_masuk": teks_masuk.str.slice(11, 16),
+        "tanggal_keluar": teks_keluar.str.slice(0, 10),
+        "jam_keluar": teks_keluar.str.slice(11, 16),
+        "nomor_do": (
+            teks_masuk.str.slice(8, 10) + teks_masuk.str.slice(5, 7) + teks_masuk.str.slice(0, 4)
+            + "-" + teks_masuk.str.slice(11, 13) + teks_masuk.str.slice(14, 16)
+        ),
+        "nomor_polisi": armada["nopol"][kendaraan],
+        "nama_sopir": armada["sopir"][sopir],
+        "nama_barang": np.array([b[0] for b in BARANG], dtype=object)[barang],
+        "po_do": pd.Series(rng.integers(1, 5000, jumlah)).map("PO{:06d}".format),
+        "transport": np.array(TRANSPORT, dtype=object)[armada["transport_tetap"][kendaraan]],
+        "bruto": tara + netto,
+        "tara": tara,
+        "netto": netto,
+        "tanggal_input": teks_keluar.str.replace("T", " ", regex=False) + ":" + detik,
+        "nama_ditimbang": "Operator Timbang",
+        "nama_diterima": "",
+        "nama_diketahui": "",
+    })
+    return df[KOLOM_INSERT]
+
+
+def buat_dataset(path, rows, seed=DEFAULT_SEED, hari=None, tanggal_awal="2020-01-01",
+                 chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None):
+    """Membuat database benchmark berisi `rows` slip.
+
+    Baris mentah dimasukkan lebih dulu, lalu migrasi sisanya membangun indeks
+    FTS, rekap, registri tara dan master data sekaligus (jauh lebih cepat
+    daripada lewat trigger per baris). Mengembalikan dict info dataset.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    hari = hari or max(30, math.ceil(rows / TRANSAKSI_PER_HARI))
+    armada = buat_armada(rng, int(min(max(rows // 150, 50), 50_000)))
+
+    mulai_waktu = time.perf_counter()
+    pool = get_pool(path)
+    jalankan_migrasi(pool, sampai_versi=2)
+    insert_sql = f"INSERT INTO surat_jalan ({', '.join(KOLOM_INSERT)}) VALUES ({', '.join('?' for _ in KOLOM_INSERT)})"
+    for mulai in range(0, rows, chunk_size):
+        chunk = buat_chunk(rng, armada, mulai, min(chunk_size, rows - mulai), rows, tanggal_awal, hari)
+        with pool.write() as conn:
+            conn.executemany(insert_sql, chunk.itertuples(index=False, name=None))
+        if progress_callback:
+            progress_callback(mulai + len(chunk), rows)
+    detik_insert = time.perf_counter() - mulai_waktu
+    jalankan_migrasi(pool)
+    with pool.write() as conn:
+        conn.execute("ANALYZE")
+
+    return {
+        "rows": rows,
+        "seed": seed,
+        "hari": hari,
+        "kendaraan": len(armada["nopol"]),
+        "sopir": len(armada["sopir"]),
+        "versi_generator": VERSI_GENERATOR,
+        "detik_insert": round(detik_insert, 2),
+        "detik_total": round(time.perf_counter() - mulai_waktu, 2),
+        "ukuran_mb": round(os.path.getsize(path) / 1e6, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="jumlah slip (10 ribu s.d. 5 juta)")
+    parser.add_argument("--output", required=True, help="path database SQLite yang dibuat")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--hari", type=int, help=f"rentang hari (default rows/{TRANSAKSI_PER_HARI})")
+    parser.add_argument("--dari", default="2020-01-01", help="tanggal awal data (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    def progress(selesai, total):
+        print(f"\r{selesai}/{total} baris", end="", file=sys.stderr)
+
+    info = buat_dataset(args.output, args.rows, args.seed, args.hari, args.dari, progress_callback=progress)
+    print(file=sys.stderr)
+    print(f"{info['rows']} baris, {info['kendaraan']} kendaraan, {info['hari']} hari -> {args.output} "
+          f"({info['ukuran_mb']} MB, {info['detik_total']} detik)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
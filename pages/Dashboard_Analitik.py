@@ -0,0 +1,114 @@
+import streamlit as st
+from datetime import datetime, timedelta
+from utils.database import DB_PATH, get_pool
+from utils.migrasi import jalankan_migrasi
+from utils.analitik import (
+    PERIODE, ringkasan_rentang, tren_periode, tonase_per_barang, trip_per_kendaraan, trip_per_transport, turnaround
+)
+
+st.set_page_config(layout="wide", page_title="Dashboard Analitik Surat Jalan")
+
+# Halaman ini bisa dibuka langsung, jadi pastikan pool dan skema siap (sekali per proses)
+@st.cache_resource(show_spinner="Menyiapkan database...")
+def siapkan_pool(busy_timeout_ms):
+    pool = get_pool(DB_PATH, busy_timeout_ms=busy_timeout_ms)
+    jalankan_migrasi(pool)
+    return pool
+
+db_pool = siapkan_pool(int(st.secrets.get("DB_BUSY_TIMEOUT_MS", 5000)))
+
+# Semua agregasi dijalankan sebagai GROUP BY di SQLite atas tabel rekap harian;
+# hanya baris hasil agregasi yang dibawa ke pandas. Cache ikut PRAGMA data_version.
+@st.cache_data(max_entries=32, show_spinner="Menghitung analitik...")
+def muat_dashboard(awal, akhir, periode, jumlah_kendaraan, versi):
+    with db_pool.read() as conn:
+        return {
+            "ringkasan": ringkasan_rentang(conn, awal, akhir),
+            "tren": tren_periode(conn, awal, akhir, periode),
+            "barang": tonase_per_barang(conn, awal, akhir),
+            "barang_periode": tonase_per_barang(conn, awal, akhir, periode),
+            "kendaraan": trip_per_kendaraan(conn, awal, akhir, limit=jumlah_kendaraan),
+            "transport": trip_per_transport(conn, awal, akhir),
+            "turnaround": turnaround(conn, awal, akhir, periode),
+            "turnaround_transport": turnaround(conn, awal, akhir, by="transport"),
+        }
+
+def format_angka(value):
+    """Format angka dengan titik sebagai pemisah ribuan, tanpa desimal"""
+    try:
+        return f"{int(value):,}".replace(",", ".")
+    except (ValueError, TypeError):
+        return str(value)
+
+st.title("📈 Dashboard Analitik")
+
+hari_ini = datetime.today().date()
+col_awal, col_akhir, col_periode, col_top = st.columns(4)
+with col_awal:
+    tanggal_awal = st.date_input("Dari Tanggal", value=hari_ini - timedelta(days=89), key="dashboard_awal")
+with col_akhir:
+    tanggal_akhir = st.date_input("Sampai Tanggal", value=hari_ini, key="dashboard_akhir")
+with col_periode:
+    periode = st.selectbox("Periode", list(PERIODE), index=1, key="dashboard_periode")
+with col_top:
+    jumlah_kendaraan = st.number_input("Jumlah kendaraan teratas", min_value=5, max_value=500, value=20, step=5)
+
+if tanggal_awal > tanggal_akhir:
+    st.error("🚨 Tanggal awal harus sebelum tanggal akhir.")
+    st.stop()
+
+data = muat_dashboard(tanggal_awal, tanggal_akhir, periode, int(jumlah_kendaraan), db_pool.data_version())
+tren_df = data["tren"]
+
+if tren_df.empty:
+    st.info("Tidak ada transaksi pada rentang tanggal ini.")
+    st.stop()
+
+ringkasan = data["ringkasan"]
+col_t, col_n, col_k, col_d = st.columns(4)
+with col_t:
+    st.metric("Jumlah Transaksi", format_angka(ringkasan["jumlah_transaksi"]))
+with col_n:
+    st.metric("Total Netto (ton)", format_angka(ringkasan["total_netto"] / 1000))
+with col_k:
+    st.metric("Kendaraan Unik", format_angka(ringkasan["jumlah_kendaraan"]))
+with col_d:
+    rata_turnaround = ringkasan["rata_turnaround"]
+    st.metric("Rata-rata Turnaround", f"{rata_turnaround:.0f} menit" if rata_turnaround is not None else "-")
+
+st.subheader(f"Tren {periode}")
+tren_chart = tren_df.set_index("periode")
+col_tren1, col_tren2 = st.columns(2)
+with col_tren1:
+    st.caption("Tonase (ton)")
+    st.bar_chart(tren_chart["total_netto"] / 1000)
+with col_tren2:
+    st.caption("Jumlah transaksi dan kendaraan unik")
+    st.line_chart(tren_chart[["jumlah_transaksi", "jumlah_kendaraan"]])
+
+st.subheader("Tonase per Nama Barang")
+col_barang1, col_barang2 = st.columns([2, 1])
+with col_barang1:
+    barang_pivot = data["barang_periode"].pivot_table(
+        index="periode", columns="nama_barang", values="total_netto", aggfunc="sum", fill_value=0
+    ) / 1000
+    st.bar_chart(barang_pivot)
+with col_barang2:
+    st.dataframe(data["barang"], use_container_width=True, hide_index=True)
+
+col_kendaraan, col_transport = st.columns(2)
+with col_kendaraan:
+    st.subheader("Trip per Nomor Polisi")
+    st.dataframe(data["kendaraan"], use_container_width=True, hide_index=True)
+with col_transport:
+    st.subheader("Trip per Transport")
+    st.dataframe(data["transport"], use_container_width=True, hide_index=True)
+
+st.subheader("Turnaround (Jam Masuk → Jam Keluar)")
+col_ta1, col_ta2 = st.columns(2)
+with col_ta1:
+    st.caption(f"Rata-rata menit per periode ({periode.lower()})")
+    st.line_chart(data["turnaround"].set_index("periode")["rata_menit"])
+with col_ta2:
+    st.caption("Rata-rata menit per transport")
+    st.dataframe(data["turnaround_transport"], use_container_width=True, hide_index=True)
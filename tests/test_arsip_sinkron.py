@@ -0,0 +1,69 @@
+"""Arsip lalu sinkronisasi: slip yang diarsipkan sebelum terkirim tidak boleh terhapus di pusat"""
+import sqlite3
+
+import pytest
+
+from utils.arsip import arsipkan
+from utils.database import get_pool
+from utils.layanan import hapus_slip_per_do, simpan_slip
+from utils.migrasi import jalankan_migrasi
+from utils.sinkron import SinkronError, susun_batch
+from utils.sinkron_pusat import ensure_pusat, terapkan_batch
+
+
+def _slip(nomor_do, tanggal_input):
+    return {
+        "tanggal_masuk": tanggal_input[:10], "jam_masuk": "08:00", "tanggal_keluar": tanggal_input[:10],
+        "jam_keluar": "08:30", "nomor_do": nomor_do, "nomor_polisi": "B 1234 ABC", "nama_sopir": "Budi",
+        "nama_barang": "Batu Split", "po_do": "PO-1", "transport": "CV Maju", "bruto": 30000, "tara": 10000,
+        "tanggal_input": tanggal_input,
+    }
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    # Path arsip di arsip_tahun relatif terhadap direktori kerja, seperti di aplikasi
+    monkeypatch.chdir(tmp_path)
+    pool = get_pool(str(tmp_path / "surat_jalan.db"))
+    jalankan_migrasi(pool)
+    with pool.write() as conn:
+        simpan_slip(conn, _slip("DO-2023", "2023-06-01 08:30:00"))
+        simpan_slip(conn, _slip("DO-2025", "2025-03-01 08:30:00"))
+    yield pool
+    pool.close_all()
+
+
+def test_slip_terarsip_belum_terkirim_dikirim_sebagai_upsert(pool):
+    assert arsipkan(pool, "arsip", "2025-01-01") == {2023: 1}
+
+    with pool.read() as conn:
+        batch = susun_batch(conn, 0)
+    assert [baris[0] for baris in batch["upsert"]] == [1, 2]
+    assert batch["hapus"] == []
+    nomor_do = batch["kolom"].index("nomor_do")
+    assert [baris[nomor_do] for baris in batch["upsert"]] == ["DO-2023", "DO-2025"]
+
+    pusat = sqlite3.connect(":memory:")
+    ensure_pusat(pusat)
+    terapkan_batch(pusat, batch)
+    assert pusat.execute("SELECT nomor_do FROM slip_pusat ORDER BY slip_id").fetchall() == [("DO-2023",), ("DO-2025",)]
+
+
+def test_slip_dihapus_tetap_dikirim_sebagai_hapus(pool):
+    arsipkan(pool, "arsip", "2025-01-01")
+    with pool.write() as conn:
+        hapus_slip_per_do(conn, "DO-2025")
+
+    with pool.read() as conn:
+        batch = susun_batch(conn, 0)
+    assert [baris[0] for baris in batch["upsert"]] == [1]
+    assert batch["hapus"] == [2]
+
+
+def test_arsip_hilang_tidak_dikirim_sebagai_hapus(pool):
+    arsipkan(pool, "arsip", "2025-01-01")
+    with pool.write() as conn:
+        conn.execute("DELETE FROM arsip_tahun")
+
+    with pool.read() as conn, pytest.raises(SinkronError):
+        susun_batch(conn, 0)
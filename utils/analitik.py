@@ -0,0 +1,147 @@
+import pandas as pd
+
+from utils.master_data import JENIS_MASTER, daftarkan_fungsi, kelompok_sql
+
+# Ekspresi pengelompokan periode atas kolom tanggal ('YYYY-MM-DD').
+# Mingguan memakai tanggal hari Senin sebagai label minggu.
+PERIODE = {
+    "Harian": "{kolom}",
+    "Mingguan": "date({kolom}, 'weekday 0', '-6 days')",
+    "Bulanan": "substr({kolom}, 1, 7)",
+}
+
+
+def _periode_sql(periode, kolom="tanggal"):
+    if periode not in PERIODE:
+        raise ValueError(f"Periode tidak dikenal: {periode}")
+    return PERIODE[periode].format(kolom=kolom)
+
+
+# Kolom rekap -> jenis master data; pengelompokan memakai kunci master agar varian ejaan tidak terpecah
+_JENIS_KOLOM = {kolom: jenis for jenis, kolom in JENIS_MASTER.items()}
+
+
+def _kelompok(conn, kolom):
+    daftarkan_fungsi(conn)
+    return kelompok_sql(_JENIS_KOLOM[kolom], kolom)
+
+
+def _rentang(awal, akhir):
+    """Batas inklusif tanggal untuk tabel rekap ('YYYY-MM-DD')"""
+    return str(awal), str(akhir)
+
+
+def ringkasan_rentang(conn, awal, akhir):
+    """Total transaksi, kendaraan unik, tonase dan rata-rata turnaround untuk seluruh rentang"""
+    kunci, _ = _kelompok(conn, "nomor_polisi")
+    row = conn.execute(f'''
+        SELECT COALESCE(SUM(jumlah_transaksi), 0), COALESCE(SUM(total_netto), 0),
+               SUM(total_durasi) / NULLIF(SUM(jumlah_durasi), 0),
+               (SELECT COUNT(DISTINCT {kunci}) FROM rekap_kendaraan_harian WHERE tanggal BETWEEN ? AND ?)
+        FROM rekap_harian WHERE tanggal BETWEEN ? AND ?
+    ''', (*_rentang(awal, akhir), *_rentang(awal, akhir))).fetchone()
+    return {
+        "jumlah_transaksi": row[0],
+        "total_netto": row[1],
+        "rata_turnaround": row[2],
+        "jumlah_kendaraan": row[3],
+    }
+
+
+def tren_periode(conn, awal, akhir, periode="Harian"):
+    """Jumlah transaksi, kendaraan unik dan tonase per periode dari tabel rekap"""
+    grup = _periode_sql(periode)
+    kunci, _ = _kelompok(conn, "nomor_polisi")
+    return pd.read_sql_query(f'''
+        SELECT r.periode, r.jumlah_transaksi, k.jumlah_kendaraan, r.total_netto
+        FROM (
+            SELECT {grup} AS periode, SUM(jumlah_transaksi) AS jumlah_transaksi,
+                   SUM(total_netto) AS total_netto
+            FROM rekap_harian WHERE tanggal BETWEEN ? AND ?
+            GROUP BY periode
+        ) r
+        JOIN (
+            SELECT {grup} AS periode, COUNT(DISTINCT {kunci}) AS jumlah_kendaraan
+            FROM rekap_kendaraan_harian WHERE tanggal BETWEEN ? AND ?
+            GROUP BY periode
+        ) k ON k.periode = r.periode
+        ORDER BY r.periode
+    ''', conn, params=[*_rentang(awal, akhir), *_rentang(awal, akhir)])
+
+
+def tonase_per_barang(conn, awal, akhir, periode=None):
+    """Tonase per nama barang; jika `periode` diisi, dipecah per periode (format panjang)"""
+    kunci, label = _kelompok(conn, "nama_barang")
+    if periode:
+        grup = _periode_sql(periode)
+        return pd.read_sql_query(f'''
+            SELECT {grup} AS periode, {label} AS nama_barang, SUM(jumlah_transaksi) AS jumlah_transaksi,
+                   SUM(total_netto) AS total_netto
+            FROM rekap_barang_harian WHERE tanggal BETWEEN ? AND ?
+            GROUP BY periode, {kunci}
+            ORDER BY periode, nama_barang
+        ''', conn, params=list(_rentang(awal, akhir)))
+    return pd.read_sql_query(f'''
+        SELECT {label} AS nama_barang, SUM(jumlah_transaksi) AS jumlah_transaksi, SUM(total_netto) AS total_netto
+        FROM rekap_barang_harian WHERE tanggal BETWEEN ? AND ?
+        GROUP BY {kunci}
+        ORDER BY total_netto DESC
+    ''', conn, params=list(_rentang(awal, akhir)))
+
+
+def trip_per_kendaraan(conn, awal, akhir, limit=50):
+    """Jumlah trip dan tonase per nomor polisi, terbanyak dulu"""
+    kunci, label = _kelompok(conn, "nomor_polisi")
+    return pd.read_sql_query(f'''
+        SELECT {label} AS nomor_polisi, SUM(jumlah_transaksi) AS jumlah_trip, SUM(total_netto) AS total_netto,
+               COUNT(DISTINCT tanggal) AS hari_aktif
+        FROM rekap_kendaraan_harian WHERE tanggal BETWEEN ? AND ?
+        GROUP BY {kunci}
+        ORDER BY jumlah_trip DESC, total_netto DESC
+        LIMIT ?
+    ''', conn, params=[*_rentang(awal, akhir), int(limit)])
+
+
+def trip_per_transport(conn, awal, akhir):
+    """Jumlah trip dan tonase per transport"""
+    kunci, label = _kelompok(conn, "transport")
+    return pd.read_sql_query(f'''
+        SELECT {label} AS transport, SUM(jumlah_transaksi) AS jumlah_trip, SUM(total_netto) AS total_netto
+        FROM rekap_transport_harian WHERE tanggal BETWEEN ? AND ?
+        GROUP BY {kunci}
+        ORDER BY jumlah_trip DESC, total_netto DESC
+    ''', conn, params=list(_rentang(awal, akhir)))
+
+
+# Tabel rekap harian untuk setiap kolom pengelompokan turnaround
+_TABEL_TURNAROUND = {
+    None: "rekap_harian",
+    "transport": "rekap_transport_harian",
+    "nama_barang": "rekap_barang_harian",
+    "nomor_polisi": "rekap_kendaraan_harian",
+}
+
+
+def turnaround(conn, awal, akhir, periode="Harian", by=None):
+    """Rata-rata turnaround (menit, jam masuk sampai jam keluar) per periode, atau per `by`.
+
+    `by` dapat berupa 'transport', 'nama_barang' atau 'nomor_polisi'. Total durasi
+    sudah dijumlahkan trigger rekap, sehingga tidak perlu memindai surat_jalan.
+    Baris dengan jam tidak valid atau jam keluar sebelum jam masuk tidak dihitung.
+    """
+    if by not in _TABEL_TURNAROUND:
+        raise ValueError(f"Kolom pengelompokan tidak didukung: {by}")
+    if by:
+        grup, nilai = _kelompok(conn, by)
+        label = by
+    else:
+        grup = nilai = _periode_sql(periode)
+        label = "periode"
+    return pd.read_sql_query(f'''
+        SELECT {nilai} AS {label}, SUM(jumlah_durasi) AS jumlah_trip,
+               SUM(total_durasi) / SUM(jumlah_durasi) AS rata_menit
+        FROM {_TABEL_TURNAROUND[by]} WHERE tanggal BETWEEN ? AND ?
+        GROUP BY {grup}
+        HAVING SUM(jumlah_durasi) > 0
+        ORDER BY {"rata_menit DESC" if by else label}
+    ''', conn, params=list(_rentang(awal, akhir)))
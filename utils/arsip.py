@@ -0,0 +1,272 @@
+"""Arsip tahunan: slip periode tertutup dipindah dari surat_jalan ke file database per tahun.
+
+Database utama hanya menyimpan `simpan_bulan` bulan terakhir (retensi), sehingga
+riwayat, backup dan VACUUM tetap cepat. Slip yang lebih lama dipindah ke
+arsip/surat_jalan_<tahun>.db dan baru di-ATTACH saat pencarian atau laporan
+memang menjangkau tahun tersebut (lihat baca_arsip / gabung_arsip).
+
+Tabel rekap dan jurnal sinkronisasi tidak ikut berkurang saat pemindahan:
+trigger hapusnya dilewati selama arsip_berjalan berisi baris, yang hanya
+terlihat di dalam transaksi pengarsipan. Ringkasan harian/bulanan periode
+lama tetap tersedia tanpa membuka arsip, dan pusat tidak menganggap slip
+terarsip sebagai terhapus: slip yang diarsipkan sebelum sempat terkirim
+dibaca susun_batch dari arsipnya (lihat slip_di_arsip) dan dikirim sebagai upsert.
+
+    python -m utils.cli archive --simpan-bulan 12 --dir arsip
+"""
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from utils.database import connect
+from utils.impor import KOLOM_INSERT
+from utils.search_index import FTS_TABLE
+
+ARSIP_DIR = "arsip"
+DEFAULT_SIMPAN_BULAN = 12
+KOLOM_ARSIP = ["id"] + KOLOM_INSERT
+_KOLOM_SQL = ", ".join(KOLOM_ARSIP)
+_KOLOM_ANGKA = ("bruto", "tara", "netto")
+
+# Trigger hapus yang tidak boleh berjalan saat slip dipindah ke arsip
+TRIGGER_DIJAGA = ("surat_jalan_rekap_ad", "surat_jalan_jurnal_ad")
+_JAGA_SQL = "WHEN NOT EXISTS (SELECT 1 FROM arsip_berjalan)"
+_AFTER_DELETE_RE = re.compile(r"AFTER\s+DELETE\s+ON\s+surat_jalan\s+BEGIN", re.IGNORECASE)
+
+
+class ArsipError(Exception):
+    """Berkas arsip hilang, rentang terlalu banyak tahun, atau pengarsipan tidak bisa dijalankan"""
+
+
+def ensure_arsip(conn):
+    """Registri arsip tahunan, penanda pengarsipan, dan penjaga trigger hapus rekap / jurnal"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS arsip_tahun (
+            tahun INTEGER PRIMARY KEY,
+            path TEXT NOT NULL,
+            jumlah INTEGER NOT NULL DEFAULT 0,
+            tanggal_awal TEXT,
+            tanggal_akhir TEXT,
+            diperbarui_pada TEXT NOT NULL
+        )
+    ''')
+    conn.execute("CREATE TABLE IF NOT EXISTS arsip_berjalan (id INTEGER PRIMARY KEY)")
+
+    for nama in TRIGGER_DIJAGA:
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (nama,)).fetchone()
+        if row is None or "arsip_berjalan" in row[0]:
+            continue
+        sql, jumlah = _AFTER_DELETE_RE.subn(f"AFTER DELETE ON surat_jalan {_JAGA_SQL} BEGIN", row[0], count=1)
+        if not jumlah:
+            raise ArsipError(f"Definisi trigger {nama} tidak dikenali.")
+        conn.execute(f"DROP TRIGGER {nama}")
+        conn.execute(sql)
+
+
+def batas_retensi(simpan_bulan=DEFAULT_SIMPAN_BULAN, hari_ini=None):
+    """Awal bulan tertua yang tetap di database utama; slip sebelum tanggal ini boleh diarsipkan"""
+    hari_ini = hari_ini or date.today()
+    bulan = hari_ini.year * 12 + hari_ini.month - 1 - simpan_bulan
+    return date(bulan // 12, bulan % 12 + 1, 1)
+
+
+def path_arsip(arsip_dir, tahun):
+    return os.path.join(arsip_dir, f"surat_jalan_{tahun}.db")
+
+
+def _buat_tabel_arsip(conn, skema):
+    kolom = ", ".join(f"{k} {'REAL' if k in _KOLOM_ANGKA else 'TEXT'}" for k in KOLOM_INSERT)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {skema}.surat_jalan (id INTEGER PRIMARY KEY, {kolom})")
+    for kolom in ("tanggal_input", "nomor_polisi", "nomor_do"):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {skema}.idx_arsip_{kolom} ON surat_jalan ({kolom})")
+
+
+def arsipkan(pool, arsip_dir=ARSIP_DIR, batas=None, vacuum=False, progress_callback=None):
+    """Memindah slip dengan tanggal_input < `batas` ke arsip per tahun. Mengembalikan {tahun: jumlah_dipindah}.
+
+    Per tahun ada dua transaksi: salin ke arsip (idempoten, INSERT OR REPLACE per id),
+    lalu hapus dari database utama hanya untuk id yang sudah ada di arsip. Jika proses
+    terhenti di antaranya, slip sementara ada di kedua tempat dan pengarsipan berikutnya
+    menyelesaikannya; slip tidak pernah hilang.
+    """
+    batas = str(batas or batas_retensi())
+    os.makedirs(arsip_dir, exist_ok=True)
+    conn = connect(pool.path, pool.busy_timeout_ms)
+    hasil = {}
+    try:
+        tahun_list = [int(row[0]) for row in conn.execute(
+            "SELECT DISTINCT substr(tanggal_input, 1, 4) FROM surat_jalan "
+            "WHERE tanggal_input < ? AND substr(tanggal_input, 1, 4) GLOB '[0-9][0-9][0-9][0-9]' ORDER BY 1",
+            (batas,)
+        )]
+        for tahun in tahun_list:
+            path = path_arsip(arsip_dir, tahun)
+            awal, akhir = f"{tahun:04d}-01-01", min(batas, f"{tahun + 1:04d}-01-01")
+            conn.execute("ATTACH DATABASE ? AS arsip_baru", (path,))
+            try:
+                _buat_tabel_arsip(conn, "arsip_baru")
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(f'''
+                        INSERT OR REPLACE INTO arsip_baru.surat_jalan ({_KOLOM_SQL})
+                        SELECT {_KOLOM_SQL} FROM main.surat_jalan WHERE tanggal_input >= ? AND tanggal_input < ?
+                    ''', (awal, akhir))
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute("INSERT INTO arsip_berjalan (id) VALUES (1)")
+                    dipindah = conn.execute('''
+                        DELETE FROM main.surat_jalan
+                        WHERE tanggal_input >= ? AND tanggal_input < ?
+                          AND id IN (SELECT id FROM arsip_baru.surat_jalan)
+                    ''', (awal, akhir)).rowcount
+                    conn.execute("DELETE FROM arsip_berjalan")
+                    jumlah, tanggal_awal, tanggal_akhir = conn.execute(
+                        "SELECT COUNT(*), MIN(tanggal_input), MAX(tanggal_input) FROM arsip_baru.surat_jalan"
+                    ).fetchone()
+                    conn.execute('''
+                        INSERT INTO arsip_tahun (tahun, path, jumlah, tanggal_awal, tanggal_akhir, diperbarui_pada)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (tahun) DO UPDATE SET
+                            path = excluded.path, jumlah = excluded.jumlah, tanggal_awal = excluded.tanggal_awal,
+                            tanggal_akhir = excluded.tanggal_akhir, diperbarui_pada = excluded.diperbarui_pada
+                    ''', (tahun, path, jumlah, tanggal_awal, tanggal_akhir, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.execute("DETACH DATABASE arsip_baru")
+            hasil[tahun] = dipindah
+            if progress_callback:
+                progress_callback(tahun, dipindah)
+        if any(hasil.values()):
+            # Penghapusan FTS5 hanya menandai entri; optimize menggabungkan segmen agar indeks ikut mengecil
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)).fetchone():
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+                conn.execute("COMMIT")
+            if vacuum:
+                conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return hasil
+
+
+def tahun_arsip(conn):
+    """Daftar (tahun, jumlah) arsip yang terdaftar, terbaru dulu"""
+    return conn.execute("SELECT tahun, jumlah FROM arsip_tahun ORDER BY tahun DESC").fetchall()
+
+
+def tahun_beririsan(conn, tanggal_awal=None, tanggal_akhir=None):
+    """Tahun arsip yang isinya beririsan dengan rentang tanggal inklusif (batas None = terbuka)"""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'arsip_tahun'").fetchone():
+        return []
+    sampai = str(tanggal_akhir + timedelta(days=1)) if tanggal_akhir is not None else None
+    dari = str(tanggal_awal) if tanggal_awal is not None else None
+    return [row[0] for row in conn.execute('''
+        SELECT tahun FROM arsip_tahun
+        WHERE (? IS NULL OR tanggal_akhir >= ?) AND (? IS NULL OR tanggal_awal < ?)
+        ORDER BY tahun
+    ''', (dari, dari, sampai, sampai))]
+
+
+def tahun_untuk_rentang(pool, tanggal_awal=None, tanggal_akhir=None):
+    """Tahun arsip yang perlu di-ATTACH untuk ekspor / laporan rentang tanggal; kosong tanpa rentang"""
+    if tanggal_awal is None and tanggal_akhir is None:
+        return []
+    with pool.read() as conn:
+        return tahun_beririsan(conn, tanggal_awal, tanggal_akhir)
+
+
+@contextmanager
+def baca_arsip(pool, tahun=()):
+    """Transaksi baca seperti pool.read(), dengan arsip `tahun` di-ATTACH. Menghasilkan (conn, skema_arsip).
+
+    Tanpa tahun, koneksi pool dipakai apa adanya. Dengan tahun, dibuka koneksi
+    tersendiri (ATTACH tidak bisa di dalam transaksi dan tidak boleh tertinggal
+    di koneksi pool) yang ditutup di akhir blok.
+    """
+    if not tahun:
+        with pool.read() as conn:
+            yield conn, []
+        return
+
+    conn = connect(pool.path, pool.busy_timeout_ms)
+    try:
+        terdaftar = dict(conn.execute(
+            f"SELECT tahun, path FROM arsip_tahun WHERE tahun IN ({', '.join('?' for _ in tahun)}) ORDER BY tahun DESC",
+            [int(t) for t in tahun]
+        ).fetchall())
+        if len(terdaftar) > conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED):
+            raise ArsipError(f"Terlalu banyak tahun arsip sekaligus ({len(terdaftar)}); persempit rentang tanggal.")
+        skema = []
+        for t, path in terdaftar.items():
+            # ATTACH membuat file kosong jika tidak ada; arsip yang hilang harus terlihat sebagai error
+            if not os.path.exists(path):
+                raise ArsipError(f"Berkas arsip tahun {t} tidak ditemukan: {path}")
+            conn.execute(f"ATTACH DATABASE ? AS arsip_{t}", (path,))
+            skema.append(f"arsip_{t}")
+        conn.execute("BEGIN")
+        yield conn, skema
+    finally:
+        conn.close()
+
+
+def slip_di_arsip(conn, slip_ids):
+    """Isi slip terarsip untuk `slip_ids` sebagai {id: [nilai KOLOM_INSERT]}; id yang tidak ada dilewati.
+
+    Berkas arsip dibuka dengan koneksi terpisah (read-only), sehingga `conn`
+    boleh berada di tengah transaksi baca.
+    """
+    if not slip_ids or not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'arsip_tahun'"
+    ).fetchone():
+        return {}
+    ids = [int(i) for i in slip_ids]
+    hasil = {}
+    for tahun, path in conn.execute("SELECT tahun, path FROM arsip_tahun ORDER BY tahun"):
+        if not os.path.exists(path):
+            raise ArsipError(f"Berkas arsip tahun {tahun} tidak ditemukan: {path}")
+        arsip = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            for i in range(0, len(ids), 500):
+                bagian = ids[i:i + 500]
+                for row in arsip.execute(
+                    f"SELECT {_KOLOM_SQL} FROM surat_jalan WHERE id IN ({', '.join('?' for _ in bagian)})", bagian
+                ):
+                    hasil[row[0]] = list(row[1:])
+        finally:
+            arsip.close()
+        ids = [i for i in ids if i not in hasil]
+        if not ids:
+            break
+    return hasil
+
+
+def gabung_arsip(skema, template, where, params, where_arsip=None, params_arsip=None):
+    """Query `template` atas surat_jalan utama, digabung UNION ALL dengan tabel arsip terpasang.
+
+    `template` memakai placeholder {kolom}, {tabel} dan {where}. Tanpa arsip
+    hasilnya persis query lama (SELECT * FROM surat_jalan), sehingga rencana query
+    tabel utama tidak berubah. Dengan arsip, setiap cabang dibungkus subquery agar
+    ORDER BY / LIMIT per cabang memakai indeks masing-masing; pengurutan akhir
+    ditambahkan pemanggil. `where_arsip` dipakai untuk cabang arsip (mis. tanpa FTS).
+    """
+    if not skema:
+        return template.format(kolom="*", tabel="surat_jalan", where=where), list(params)
+    if where_arsip is None:
+        where_arsip, params_arsip = where, params
+    bagian = [f"SELECT * FROM ({template.format(kolom=_KOLOM_SQL, tabel='main.surat_jalan', where=where)})"]
+    semua = list(params)
+    for s in skema:
+        bagian.append(f"SELECT * FROM ({template.format(kolom=_KOLOM_SQL, tabel=f'{s}.surat_jalan', where=where_arsip)})")
+        semua.extend(params_arsip)
+    return " UNION ALL ".join(bagian), semua
@@ -0,0 +1,146 @@
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from datetime import datetime
+
+from utils.metrik import span
+
+BACKUP_PREFIX = "surat_jalan_backup_"
+BACKUP_PATTERN = re.compile(r"^surat_jalan_backup_(\d{8}_\d{6})\.db(\.gz)?$")
+
+
+class BackupError(Exception):
+    pass
+
+
+class BackupEngine:
+    """Backup database SQLite memakai online backup API, dengan retensi per jam/harian/mingguan.
+
+    Salinan dibuat bertahap (beberapa halaman per langkah) sehingga penulis lain
+    tetap bisa menulis selama backup berjalan, lalu diverifikasi dengan
+    PRAGMA integrity_check sebelum (opsional) dikompres gzip.
+    """
+
+    def __init__(self, db_path, backup_dir, simpan_per_jam=24, simpan_harian=7, simpan_mingguan=4,
+                 kompres=True, verifikasi=True, pages_per_step=1024):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.simpan_per_jam = simpan_per_jam
+        self.simpan_harian = simpan_harian
+        self.simpan_mingguan = simpan_mingguan
+        self.kompres = kompres
+        self.verifikasi = verifikasi
+        self.pages_per_step = pages_per_step
+        self.terakhir = None
+        self.error_terakhir = None
+        self._lock = threading.Lock()
+        os.makedirs(backup_dir, exist_ok=True)
+
+    def jalankan(self):
+        """Membuat satu generasi backup lalu menerapkan retensi. Mengembalikan path file backup."""
+        if not os.path.exists(self.db_path):
+            return None
+        # Hindari dua backup berjalan bersamaan (mis. job terjadwal dan tombol manual)
+        with self._lock:
+            try:
+                path = self._buat_backup()
+                self.terapkan_retensi()
+                self.terakhir = path
+                self.error_terakhir = None
+                return path
+            except Exception as e:
+                self.error_terakhir = str(e)
+                raise
+
+    def _buat_backup(self):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        db_path = os.path.join(self.backup_dir, f"{BACKUP_PREFIX}{timestamp}.db")
+        tmp_path = db_path + ".tmp"
+
+        src = sqlite3.connect(self.db_path, timeout=30)
+        dst = sqlite3.connect(tmp_path)
+        try:
+            with span("file", "backup_salin"):
+                src.backup(dst, pages=self.pages_per_step, sleep=0.01)
+        finally:
+            dst.close()
+            src.close()
+
+        if self.verifikasi:
+            self._cek_integritas(tmp_path)
+
+        if not self.kompres:
+            os.replace(tmp_path, db_path)
+            return db_path
+
+        gz_path = db_path + ".gz"
+        gz_tmp = gz_path + ".tmp"
+        with span("file", "backup_kompres"), open(tmp_path, "rb") as f_in, \
+                gzip.open(gz_tmp, "wb", compresslevel=6) as f_out:
+            shutil.copyfileobj(f_in, f_out, length=1024 * 1024)
+        os.remove(tmp_path)
+        if self.verifikasi:
+            # Membaca ulang seluruh isi memastikan CRC gzip valid
+            with gzip.open(gz_tmp, "rb") as f:
+                while f.read(1024 * 1024):
+                    pass
+        os.replace(gz_tmp, gz_path)
+        return gz_path
+
+    def _cek_integritas(self, path):
+        check = sqlite3.connect(path)
+        try:
+            hasil = check.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            check.close()
+        if hasil != "ok":
+            os.remove(path)
+            raise BackupError(f"Backup gagal verifikasi integritas: {hasil}")
+
+    def daftar_backup(self):
+        """Daftar (waktu, path) backup yang ada, terbaru dulu"""
+        hasil = []
+        for name in os.listdir(self.backup_dir):
+            match = BACKUP_PATTERN.match(name)
+            if match:
+                waktu = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+                hasil.append((waktu, os.path.join(self.backup_dir, name)))
+        return sorted(hasil, reverse=True)
+
+    def terapkan_retensi(self):
+        """Menyimpan backup terbaru per jam, per hari dan per minggu; sisanya dihapus"""
+        backups = self.daftar_backup()
+        simpan = set()
+        generasi = [
+            (self.simpan_per_jam, lambda w: w.strftime("%Y%m%d%H")),
+            (self.simpan_harian, lambda w: w.strftime("%Y%m%d")),
+            (self.simpan_mingguan, lambda w: "%d-%02d" % w.isocalendar()[:2]),
+        ]
+        for jumlah, bucket_of in generasi:
+            buckets = set()
+            for waktu, path in backups:
+                bucket = bucket_of(waktu)
+                if bucket in buckets:
+                    continue
+                if len(buckets) >= jumlah:
+                    break
+                buckets.add(bucket)
+                simpan.add(path)
+
+        dihapus = []
+        for _, path in backups:
+            if path not in simpan:
+                try:
+                    os.remove(path)
+                    dihapus.append(path)
+                except OSError:
+                    pass
+        return dihapus
+
+    def backup_terakhir(self):
+        """(waktu, path) backup terbaru di disk, atau None"""
+        backups = self.daftar_backup()
+        return backups[0] if backups else None
@@ -0,0 +1,107 @@
+import os
+import zipfile
+
+from utils.arsip import baca_arsip, gabung_arsip, tahun_untuk_rentang
+from utils.ekspor_data import filter_ekspor
+from utils.format_slip import prepare_pdf_data
+
+DEFAULT_PAGES_PER_PART = 500
+DEFAULT_CHUNK_SIZE = 500
+
+
+def iter_slip_rows(conn, where_clause="1=1", params=(), chunk_size=DEFAULT_CHUNK_SIZE, arsip=(), filter_arsip=None):
+    """Membaca baris surat_jalan (dan arsip terpasang) per potongan (fetchmany) sebagai dict, tanpa memuat semuanya"""
+    query, params = gabung_arsip(arsip, "SELECT {kolom} FROM {tabel} WHERE {where}", where_clause, params, *(filter_arsip or ()))
+    cursor = conn.execute(f"{query} ORDER BY tanggal_input DESC, id DESC", params)
+    columns = [col[0] for col in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for row in rows:
+            yield dict(zip(columns, row))
+
+
+def generate_batch_pdf_stream(rows, output_dir, base_name="batch_surat_jalan",
+                              pages_per_part=DEFAULT_PAGES_PER_PART, progress_callback=None, gabung_zip=True):
+    """Membuat PDF batch dari iterator baris dengan memori terbatas.
+
+    Setiap `pages_per_part` halaman ditulis ke file part tersendiri, sehingga
+    dokumen FPDF di memori tidak pernah lebih besar dari satu part. Jika hanya
+    ada satu part, hasilnya satu file PDF; jika lebih, semua part dikemas ke
+    satu file ZIP yang ditulis bertahap. Mengembalikan (path, jumlah_halaman)
+    atau (None, 0) jika tidak ada baris.
+
+    Dengan `gabung_zip=False` part tidak dikemas dan yang dikembalikan adalah
+    (daftar_path_part, jumlah_halaman), atau ([], 0) jika tidak ada baris;
+    dipakai UI agar setiap part diunduh terpisah dengan ukuran terbatas.
+    """
+    from utils.pdf_generator import PDF
+
+    os.makedirs(output_dir, exist_ok=True)
+    part_paths = []
+    pdf = None
+    pages_in_part = 0
+    total_pages = 0
+
+    def tutup_part():
+        part_path = os.path.join(output_dir, f"{base_name}_part{len(part_paths) + 1:03d}.pdf")
+        pdf.output(part_path)
+        part_paths.append(part_path)
+
+    for row in rows:
+        if pdf is None:
+            pdf = PDF()
+            pages_in_part = 0
+        pdf.add_page()
+        pdf.add_data(prepare_pdf_data(row))
+        pages_in_part += 1
+        total_pages += 1
+        if pages_in_part >= pages_per_part:
+            tutup_part()
+            pdf = None
+            if progress_callback:
+                progress_callback(total_pages, len(part_paths))
+    if pdf is not None:
+        tutup_part()
+        if progress_callback:
+            progress_callback(total_pages, len(part_paths))
+
+    if not part_paths:
+        return (None, 0) if gabung_zip else ([], 0)
+
+    if len(part_paths) == 1:
+        final_path = os.path.join(output_dir, f"{base_name}.pdf")
+        os.replace(part_paths[0], final_path)
+        return (final_path if gabung_zip else [final_path]), total_pages
+    if not gabung_zip:
+        return part_paths, total_pages
+
+    # PDF sudah terkompresi, jadi ZIP cukup menyimpan (ZIP_STORED) tanpa kompres ulang
+    zip_path = os.path.join(output_dir, f"{base_name}.zip")
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for part_path in part_paths:
+            archive.write(part_path, arcname=os.path.basename(part_path))
+            os.remove(part_path)
+    return zip_path, total_pages
+
+
+def export_history_batch(pool, output_dir, search_nopol="", search_do="", use_fts=True,
+                         pages_per_part=DEFAULT_PAGES_PER_PART, chunk_size=DEFAULT_CHUNK_SIZE,
+                         progress_callback=None, tanggal_awal=None, tanggal_akhir=None,
+                         base_name="batch_surat_jalan", arsip=None, gabung_zip=True):
+    """Ekspor batch untuk filter riwayat (dan rentang tanggal opsional), dibaca dari SQLite per potongan.
+
+    `arsip` seperti pada ekspor_data: None berarti tahun arsip yang beririsan dengan rentang tanggal.
+    """
+    where_clause, params = filter_ekspor(search_nopol, search_do, tanggal_awal, tanggal_akhir, use_fts)
+    filter_arsip = filter_ekspor(search_nopol, search_do, tanggal_awal, tanggal_akhir, use_fts=False)
+    if arsip is None:
+        arsip = tahun_untuk_rentang(pool, tanggal_awal, tanggal_akhir)
+    with baca_arsip(pool, arsip) as (conn, skema):
+        rows = iter_slip_rows(conn, where_clause, params, chunk_size=chunk_size, arsip=skema, filter_arsip=filter_arsip)
+        return generate_batch_pdf_stream(
+            rows, output_dir, base_name=base_name,
+            pages_per_part=pages_per_part,
+            progress_callback=progress_callback, gabung_zip=gabung_zip
+        )
@@ -0,0 +1,293 @@
+"""Command line untuk job batch tanpa Streamlit (cron / Task Scheduler).
+
+Contoh:
+
+    python -m utils.cli export-pdf --date-range 2024-01-01 2024-01-31 --output-dir cetak/
+    python -m utils.cli send-report --date 2024-05-17
+    python -m utils.cli backup --dir backup
+    python -m utils.cli import data_lama.xlsx
+    python -m utils.cli sync --url http://pusat:8765
+    python -m utils.cli archive --simpan-bulan 12
+
+Token dan chat ID Telegram dibaca dari environment (TELEGRAM_TOKEN,
+TELEGRAM_CHAT_ID) atau dari .streamlit/secrets.toml yang sama dengan aplikasi,
+begitu pula alamat server pusat untuk sinkronisasi (SINKRON_URL, SINKRON_TOKEN).
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from utils.arsip import ARSIP_DIR, DEFAULT_SIMPAN_BULAN, arsipkan, baca_arsip, batas_retensi, tahun_untuk_rentang
+from utils.backup import BackupEngine
+from utils.batch_export import DEFAULT_PAGES_PER_PART
+from utils.database import DB_PATH, get_pool
+from utils.impor import DEFAULT_CHUNK_SIZE as DEFAULT_IMPOR_CHUNK_SIZE, impor_berkas
+from utils.layanan import antrekan_laporan, ekspor_pdf, pesan_impor, susun_laporan
+from utils.migrasi import fts_index_aktif, jalankan_migrasi
+from utils.sinkron import DEFAULT_MAKS_PERUBAHAN, KlienPusat, SinkronError, atur_site_id, site_id, sinkronkan
+from utils.telegram_outbox import DEFAULT_API_URL, STATUS_PENDING, OutboxWorker, enqueue_message, outbox_stats
+
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+
+def baca_secrets(path=SECRETS_PATH):
+    """Isi secrets.toml Streamlit sebagai dict; kosong jika file tidak ada"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ImportError("Membaca secrets.toml membutuhkan Python 3.11+ atau modul 'tomli'.")
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def konfigurasi(args):
+    """Nilai konfigurasi: argumen command line > environment > secrets.toml"""
+    secrets = baca_secrets(args.secrets)
+
+    def ambil(nama, default=""):
+        return os.environ.get(nama) or secrets.get(nama, default)
+
+    return {
+        "token": getattr(args, "token", None) or ambil("TELEGRAM_TOKEN"),
+        "chat_id": getattr(args, "chat_id", None) or ambil("TELEGRAM_CHAT_ID"),
+        "api_url": ambil("TELEGRAM_API_URL", DEFAULT_API_URL),
+        "timeout": float(ambil("TELEGRAM_TIMEOUT", 10)),
+        "sinkron_url": getattr(args, "url", None) or ambil("SINKRON_URL"),
+        "sinkron_token": getattr(args, "sinkron_token", None) or ambil("SINKRON_TOKEN"),
+    }
+
+
+def _tanggal(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def siapkan_pool(db_path):
+    pool = get_pool(db_path)
+    jalankan_migrasi(pool)
+    return pool
+
+
+def kirim_outbox(pool, config):
+    """Mengirim isi outbox sekarang juga (tanpa worker background). Mengembalikan jumlah pesan tertunda."""
+    if not config["token"]:
+        print("Token Telegram tidak dikonfigurasi; pesan tetap di outbox.", file=sys.stderr)
+    else:
+        worker = OutboxWorker(pool, config["token"], api_url=config["api_url"], timeout=config["timeout"])
+        worker.drain()
+    with pool.read() as conn:
+        tertunda = outbox_stats(conn)[STATUS_PENDING]
+    if tertunda:
+        print(f"{tertunda} pesan masih tertunda di outbox (dicoba ulang oleh aplikasi).", file=sys.stderr)
+    return tertunda
+
+
+def cmd_export_pdf(args):
+    pool = siapkan_pool(args.db)
+    with pool.read() as conn:
+        use_fts = fts_index_aktif(conn)
+    dari, sampai = args.date_range or (None, None)
+
+    def progress(halaman, part):
+        print(f"\r{halaman} halaman ({part} part)", end="", file=sys.stderr)
+
+    path, jumlah = ekspor_pdf(
+        pool, args.output_dir, dari, sampai, args.nopol, args.do, use_fts=use_fts,
+        pages_per_part=args.halaman_per_part, progress_callback=progress
+    )
+    print(file=sys.stderr)
+    if path is None:
+        print("Tidak ada slip untuk diekspor.", file=sys.stderr)
+        return 1
+    print(f"{jumlah} slip diekspor ke {path}", file=sys.stderr)
+    print(path)
+    return 0
+
+
+def cmd_send_report(args):
+    config = konfigurasi(args)
+    if not config["chat_id"]:
+        print("TELEGRAM_CHAT_ID belum dikonfigurasi.", file=sys.stderr)
+        return 2
+    pool = siapkan_pool(args.db)
+    tanggal = args.date or datetime.now().date()
+    with baca_arsip(pool, tahun_untuk_rentang(pool, tanggal, tanggal)) as (conn, skema):
+        laporan = susun_laporan(
+            conn, tanggal, f"Dikirim terjadwal pada: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", arsip=skema
+        )
+    if laporan is not None:
+        with pool.write() as conn:
+            antrekan_laporan(conn, config["chat_id"], laporan)
+    if laporan is None:
+        print(f"Tidak ada transaksi pada {tanggal}; laporan tidak dikirim.", file=sys.stderr)
+        return 0
+    lampiran = " + lampiran CSV" if laporan["dokumen"] else ""
+    print(f"Laporan {tanggal}: {len(laporan['pesan'])} pesan{lampiran} masuk antrean.", file=sys.stderr)
+    if not args.antrekan_saja:
+        kirim_outbox(pool, config)
+    return 0
+
+
+def cmd_backup(args):
+    engine = BackupEngine(
+        args.db, args.dir,
+        simpan_per_jam=args.simpan_per_jam, simpan_harian=args.simpan_harian,
+        simpan_mingguan=args.simpan_mingguan,
+        kompres=not args.tanpa_kompres, verifikasi=not args.tanpa_verifikasi,
+    )
+    path = engine.jalankan()
+    if path is None:
+        print(f"Database {args.db} tidak ditemukan.", file=sys.stderr)
+        return 1
+    print(path)
+    return 0
+
+
+def cmd_import(args):
+    pool = siapkan_pool(args.db)
+    nama_file = os.path.basename(args.berkas)
+    path_ditolak = args.ditolak or f"{os.path.splitext(args.berkas)[0]}_ditolak_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+
+    def progress(dibaca, diterima, ditolak):
+        print(f"\r{dibaca} baris dibaca · {diterima} diterima · {ditolak} ditolak", end="", file=sys.stderr)
+
+    try:
+        hasil = impor_berkas(
+            pool, args.berkas, nama_file, path_ditolak, chunk_size=args.chunk_size,
+            lewati_duplikat=not args.sertakan_duplikat, progress_callback=progress
+        )
+    except (ValueError, ImportError) as e:
+        print(f"\nGagal mengimpor berkas: {e}", file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+    print(f"{hasil['diterima']} dari {hasil['dibaca']} baris diimpor "
+          f"({hasil['ditolak']} ditolak, {hasil['duplikat']} duplikat dilewati).", file=sys.stderr)
+    if hasil["path_ditolak"]:
+        print(f"Baris ditolak: {hasil['path_ditolak']}", file=sys.stderr)
+
+    config = konfigurasi(args)
+    if hasil["diterima"] and config["chat_id"] and not args.tanpa_notifikasi:
+        with pool.write() as conn:
+            enqueue_message(conn, config["chat_id"], pesan_impor(nama_file, hasil))
+        kirim_outbox(pool, config)
+    return 1 if hasil["ditolak"] and args.gagal_jika_ditolak else 0
+
+
+def cmd_archive(args):
+    pool = siapkan_pool(args.db)
+    batas = args.sebelum or batas_retensi(args.simpan_bulan)
+
+    def progress(tahun, jumlah):
+        print(f"{tahun}: {jumlah} slip dipindah ke arsip", file=sys.stderr)
+
+    hasil = arsipkan(pool, args.dir, batas, vacuum=args.vacuum, progress_callback=progress)
+    if not hasil:
+        print(f"Tidak ada slip sebelum {batas} untuk diarsipkan.", file=sys.stderr)
+    else:
+        print(f"{sum(hasil.values())} slip sebelum {batas} dipindah ke {args.dir}.", file=sys.stderr)
+    return 0
+
+
+def cmd_sync(args):
+    config = konfigurasi(args)
+    pool = siapkan_pool(args.db)
+    try:
+        if args.site_id:
+            with pool.write() as conn:
+                atur_site_id(conn, args.site_id)
+        if not config["sinkron_url"]:
+            print("SINKRON_URL belum dikonfigurasi.", file=sys.stderr)
+            return 2
+        with pool.read() as conn:
+            site = site_id(conn)
+
+        def progress(hasil):
+            print(f"\r{hasil['batch']} batch · {hasil['slip']} slip · {hasil['hapus']} hapus · "
+                  f"{hasil['byte'] / 1024:.0f} KB", end="", file=sys.stderr)
+
+        klien = KlienPusat(config["sinkron_url"], config["sinkron_token"])
+        try:
+            hasil = sinkronkan(pool, klien, args.maks_perubahan, progress_callback=progress)
+        finally:
+            klien.close()
+    except SinkronError as e:
+        print(f"\nSinkronisasi gagal: {e}", file=sys.stderr)
+        return 1
+    if hasil["batch"]:
+        print(file=sys.stderr)
+    print(f"Site {site}: {hasil['slip']} slip dan {hasil['hapus']} penghapusan dikirim "
+          f"dalam {hasil['batch']} batch; pusat sudah menerima sampai seq {hasil['ack_seq']}.", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DB_PATH, help="path database SQLite")
+    parser.add_argument("--secrets", default=SECRETS_PATH, help="secrets.toml untuk konfigurasi Telegram")
+    sub = parser.add_subparsers(dest="perintah", required=True)
+
+    p = sub.add_parser("export-pdf", help="PDF continuous untuk rentang tanggal / filter (cetak ulang)")
+    p.add_argument("--date-range", nargs=2, type=_tanggal, metavar=("DARI", "SAMPAI"),
+                   help="rentang tanggal input (YYYY-MM-DD, inklusif)")
+    p.add_argument("--nopol", default="", help="filter nomor polisi")
+    p.add_argument("--do", default="", help="filter nomor DO")
+    p.add_argument("--output-dir", default="temp_pdf")
+    p.add_argument("--halaman-per-part", type=int, default=DEFAULT_PAGES_PER_PART,
+                   help="lebih dari ini, hasil dipecah menjadi beberapa PDF dalam satu ZIP")
+    p.set_defaults(fungsi=cmd_export_pdf)
+
+    p = sub.add_parser("send-report", help="kirim laporan harian ke Telegram")
+    p.add_argument("--date", type=_tanggal, help="tanggal laporan (YYYY-MM-DD, default hari ini)")
+    p.add_argument("--token")
+    p.add_argument("--chat-id")
+    p.add_argument("--antrekan-saja", action="store_true", help="hanya masuk outbox, dikirim oleh aplikasi")
+    p.set_defaults(fungsi=cmd_send_report)
+
+    p = sub.add_parser("backup", help="backup online database (dengan retensi yang sama seperti aplikasi)")
+    p.add_argument("--dir", default="backup")
+    p.add_argument("--simpan-per-jam", type=int, default=24)
+    p.add_argument("--simpan-harian", type=int, default=7)
+    p.add_argument("--simpan-mingguan", type=int, default=4)
+    p.add_argument("--tanpa-kompres", action="store_true")
+    p.add_argument("--tanpa-verifikasi", action="store_true")
+    p.set_defaults(fungsi=cmd_backup)
+
+    p = sub.add_parser("import", help="impor massal CSV / Excel")
+    p.add_argument("berkas")
+    p.add_argument("--ditolak", help="CSV baris ditolak (default di samping berkas)")
+    p.add_argument("--chunk-size", type=int, default=DEFAULT_IMPOR_CHUNK_SIZE)
+    p.add_argument("--sertakan-duplikat", action="store_true", help="jangan lewati data yang sudah ada")
+    p.add_argument("--tanpa-notifikasi", action="store_true")
+    p.add_argument("--gagal-jika-ditolak", action="store_true", help="kode keluar 1 jika ada baris ditolak")
+    p.set_defaults(fungsi=cmd_import)
+
+    p = sub.add_parser("archive", help="pindahkan slip di luar masa retensi ke arsip per tahun")
+    p.add_argument("--dir", default=ARSIP_DIR)
+    p.add_argument("--simpan-bulan", type=int, default=DEFAULT_SIMPAN_BULAN,
+                   help="jumlah bulan penuh terakhir yang tetap di database utama")
+    p.add_argument("--sebelum", type=_tanggal, help="batas eksplisit (YYYY-MM-DD), menggantikan --simpan-bulan")
+    p.add_argument("--vacuum", action="store_true", help="VACUUM database utama setelah pengarsipan")
+    p.set_defaults(fungsi=cmd_archive)
+
+    p = sub.add_parser("sync", help="kirim perubahan sejak sinkronisasi terakhir ke server pusat")
+    p.add_argument("--url", help="alamat server pusat (default SINKRON_URL)")
+    p.add_argument("--sinkron-token", help="token server pusat (default SINKRON_TOKEN)")
+    p.add_argument("--site-id", help="nama site, hanya bisa diatur sebelum sinkronisasi pertama")
+    p.add_argument("--maks-perubahan", type=int, default=DEFAULT_MAKS_PERUBAHAN, help="entri jurnal per batch")
+    p.set_defaults(fungsi=cmd_sync)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.fungsi(args)
+    finally:
+        if args.perintah != "backup":
+            get_pool(args.db).close_all()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from utils import metrik
+
+DB_PATH = "surat_jalan.db"
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+DEFAULT_POOL_SIZE = 8
+
+
+def connect(path=DB_PATH, busy_timeout_ms=DEFAULT_BUSY_TIMEOUT_MS):
+    """Membuka koneksi SQLite dengan mode WAL dan busy_timeout.
+
+    Koneksi dibuka dalam mode autocommit (isolation_level=None); transaksi
+    dikelola secara eksplisit lewat ConnectionPool.read() / write().
+    Saat instrumentasi aktif, koneksi memakai metrik.KoneksiTerukur agar
+    setiap query tercatat; saat nonaktif dipakai koneksi biasa tanpa overhead.
+    """
+    conn = sqlite3.connect(
+        path,
+        timeout=busy_timeout_ms / 1000,
+        isolation_level=None,
+        check_same_thread=False,
+        factory=metrik.KoneksiTerukur if metrik.aktif() else sqlite3.Connection,
+    )
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+class ConnectionPool:
+    """Pool koneksi SQLite yang aman dipakai bersama oleh sesi Streamlit dan thread scheduler.
+
+    Setiap koneksi hanya dipinjam oleh satu thread pada satu waktu, sehingga
+    koneksi maupun cursor tidak pernah dipakai bersamaan lintas thread.
+    """
+
+    def __init__(self, path=DB_PATH, max_size=DEFAULT_POOL_SIZE, busy_timeout_ms=DEFAULT_BUSY_TIMEOUT_MS):
+        self.path = path
+        self.max_size = max_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._pengamat = None
+        self._pengamat_lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return connect(self.path, self.busy_timeout_ms)
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if not self._closed and self._idle.qsize() < self.max_size:
+                self._idle.put(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Meminjam satu koneksi (mode autocommit) selama blok with"""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def read(self):
+        """Transaksi baca singkat dengan snapshot konsisten; di mode WAL tidak memblokir penulis"""
+        with self.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.execute("COMMIT")
+
+    @contextmanager
+    def write(self):
+        """Transaksi tulis (BEGIN IMMEDIATE); commit jika sukses, rollback jika terjadi error"""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            else:
+                if conn.in_transaction:
+                    conn.execute("COMMIT")
+
+    def data_version(self):
+        """Nilai PRAGMA data_version dari koneksi pengamat khusus.
+
+        Koneksi pengamat tidak pernah menulis, sehingga nilainya berubah setiap kali
+        koneksi lain (pool ini, thread scheduler, atau proses lain) melakukan commit.
+        Dipakai sebagai kunci cache untuk hasil query baca.
+        """
+        with self._pengamat_lock:
+            if self._pengamat is None:
+                self._pengamat = connect(self.path, self.busy_timeout_ms)
+            return self._pengamat.execute("PRAGMA data_version").fetchone()[0]
+
+    def close_all(self):
+        with self._pengamat_lock:
+            if self._pengamat is not None:
+                self._pengamat.close()
+                self._pengamat = None
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=DB_PATH, max_size=DEFAULT_POOL_SIZE, busy_timeout_ms=DEFAULT_BUSY_TIMEOUT_MS):
+    """Pool koneksi bersama (satu per file database per proses)"""
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = ConnectionPool(path, max_size=max_size, busy_timeout_ms=busy_timeout_ms)
+            _pools[path] = pool
+        return pool
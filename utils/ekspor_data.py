@@ -0,0 +1,207 @@
+"""Ekspor data surat_jalan ke CSV / Excel / Parquet secara streaming.
+
+Contoh pemakaian dari command line (mis. untuk job malam):
+
+    python -m utils.ekspor_data --format parquet --dari 2024-01-01 --sampai 2024-12-31 \\
+        --output ekspor/surat_jalan_2024.parquet
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from utils.arsip import baca_arsip, gabung_arsip, tahun_untuk_rentang
+from utils.database import DB_PATH, get_pool
+from utils.metrik import span
+from utils.migrasi import fts_index_aktif
+from utils.search_index import build_search_filter
+
+DEFAULT_CHUNK_SIZE = 20000
+FORMAT_EKSPOR = {"csv": ".csv", "xlsx": ".xlsx", "parquet": ".parquet"}
+MIME_EKSPOR = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/octet-stream",
+}
+
+# Tipe kolom tetap agar setiap potongan punya skema yang sama (penting untuk Parquet)
+KOLOM_ANGKA = {"id": "int64", "bruto": "float64", "tara": "float64", "netto": "float64"}
+
+# Batas baris per sheet Excel (1.048.576 termasuk header)
+MAKS_BARIS_SHEET = 1_048_575
+
+
+def filter_ekspor(search_nopol="", search_do="", tanggal_awal=None, tanggal_akhir=None, use_fts=True):
+    """Klausa WHERE untuk filter riwayat dan/atau rentang tanggal (inklusif) atas tanggal_input"""
+    where_clause, params = build_search_filter(search_nopol, search_do, use_fts=use_fts)
+    if tanggal_awal is not None:
+        where_clause += " AND tanggal_input >= ?"
+        params.append(str(tanggal_awal))
+    if tanggal_akhir is not None:
+        where_clause += " AND tanggal_input < ?"
+        params.append(str(tanggal_akhir + timedelta(days=1)))
+    return where_clause, params
+
+
+def iter_chunks(conn, where_clause="1=1", params=(), chunk_size=DEFAULT_CHUNK_SIZE, arsip=(), filter_arsip=None):
+    """DataFrame per potongan `chunk_size` baris, urut tanggal_input lalu id.
+
+    `arsip` adalah skema arsip terpasang yang ikut dibaca, dengan klausa
+    `filter_arsip` = (where, params) bila berbeda dari tabel utama.
+    """
+    query, params = gabung_arsip(arsip, "SELECT {kolom} FROM {tabel} WHERE {where}", where_clause, params, *(filter_arsip or ()))
+    query += " ORDER BY tanggal_input, id"
+    for chunk in pd.read_sql_query(query, conn, params=params, chunksize=chunk_size):
+        for kolom, tipe in KOLOM_ANGKA.items():
+            if kolom in chunk.columns:
+                chunk[kolom] = pd.to_numeric(chunk[kolom], errors="coerce").astype(tipe)
+        for kolom in chunk.columns.difference(list(KOLOM_ANGKA)):
+            chunk[kolom] = chunk[kolom].astype("string")
+        yield chunk
+
+
+class _PenulisCsv:
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8-sig", newline="")
+        self.header = True
+
+    def tulis(self, chunk):
+        chunk.to_csv(self.file, index=False, header=self.header)
+        self.header = False
+
+    def tutup(self):
+        self.file.close()
+
+
+class _PenulisXlsx:
+    # openpyxl mode write_only menulis baris langsung ke file sementara, tidak disimpan di memori
+    def __init__(self, path):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise ImportError("Ekspor Excel membutuhkan modul 'openpyxl'. Instal dengan `pip install openpyxl`.")
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.baris_sheet = 0
+
+    def _sheet_baru(self, kolom):
+        self.sheet = self.workbook.create_sheet(f"surat_jalan_{len(self.workbook.worksheets) + 1}")
+        self.sheet.append(list(kolom))
+        self.baris_sheet = 0
+
+    def tulis(self, chunk):
+        data = chunk.astype(object).where(chunk.notna(), None)
+        for row in data.itertuples(index=False, name=None):
+            if self.sheet is None or self.baris_sheet >= MAKS_BARIS_SHEET:
+                self._sheet_baru(chunk.columns)
+            self.sheet.append(row)
+            self.baris_sheet += 1
+
+    def tutup(self):
+        if self.sheet is None:
+            self.workbook.create_sheet("surat_jalan")
+        self.workbook.save(self.path)
+
+
+class _PenulisParquet:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Ekspor Parquet membutuhkan modul 'pyarrow'. Instal dengan `pip install pyarrow`.")
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        self.writer = None
+
+    def tulis(self, chunk):
+        table = self.pa.Table.from_pandas(chunk, preserve_index=False)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema, compression="snappy")
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def tutup(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+PENULIS = {"csv": _PenulisCsv, "xlsx": _PenulisXlsx, "parquet": _PenulisParquet}
+
+
+def ekspor_data(pool, output_path, format="csv", search_nopol="", search_do="",
+                tanggal_awal=None, tanggal_akhir=None, use_fts=True,
+                chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None, arsip=None):
+    """Menulis hasil filter ke `output_path` per potongan; memori tetap datar untuk ekspor bertahun-tahun.
+
+    File ditulis ke nama sementara lalu di-rename, sehingga tidak pernah ada file
+    setengah jadi. `progress_callback(jumlah_baris)` dipanggil setiap potongan.
+    `arsip` adalah daftar tahun arsip yang ikut diekspor; None berarti tahun yang
+    beririsan dengan rentang tanggal. Mengembalikan jumlah baris yang diekspor.
+    """
+    if format not in PENULIS:
+        raise ValueError(f"Format ekspor tidak dikenal: {format}")
+    where_clause, params = filter_ekspor(search_nopol, search_do, tanggal_awal, tanggal_akhir, use_fts)
+    filter_arsip = filter_ekspor(search_nopol, search_do, tanggal_awal, tanggal_akhir, use_fts=False)
+    if arsip is None:
+        arsip = tahun_untuk_rentang(pool, tanggal_awal, tanggal_akhir)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    penulis = PENULIS[format](tmp_path)
+    jumlah = 0
+    try:
+        # Satu transaksi baca: snapshot konsisten tanpa memblokir penulis (WAL)
+        with baca_arsip(pool, arsip) as (conn, skema):
+            for chunk in iter_chunks(conn, where_clause, params, chunk_size, skema, filter_arsip):
+                with span("file", f"ekspor_{format}"):
+                    penulis.tulis(chunk)
+                jumlah += len(chunk)
+                if progress_callback:
+                    progress_callback(jumlah)
+        with span("file", f"ekspor_{format}"):
+            penulis.tutup()
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            penulis.tutup()
+        except Exception:
+            pass
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return jumlah
+
+
+def _tanggal(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--format", choices=list(PENULIS), default="csv")
+    parser.add_argument("--output", required=True, help="path file hasil ekspor")
+    parser.add_argument("--db", default=DB_PATH, help="path database SQLite")
+    parser.add_argument("--dari", type=_tanggal, help="tanggal awal (YYYY-MM-DD, inklusif)")
+    parser.add_argument("--sampai", type=_tanggal, help="tanggal akhir (YYYY-MM-DD, inklusif)")
+    parser.add_argument("--nopol", default="", help="filter nomor polisi (mengandung)")
+    parser.add_argument("--do", default="", help="filter nomor DO (mengandung)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    pool = get_pool(args.db)
+    with pool.read() as conn:
+        use_fts = fts_index_aktif(conn)
+    jumlah = ekspor_data(
+        pool, args.output, args.format, args.nopol, args.do, args.dari, args.sampai,
+        use_fts=use_fts, chunk_size=args.chunk_size
+    )
+    print(f"{jumlah} baris diekspor ke {args.output}", file=sys.stderr)
+    pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Data slip tanpa dependensi fpdf: versi template, format angka dan field tanda tangan.
+
+Dipisah dari utils.pdf_generator agar kunci cache PDF, notifikasi dan
+layanan bisa dipakai tanpa memuat fpdf (mahal saat start dingin).
+"""
+
+# Naikkan setiap kali tata letak slip di PDF.add_data/header berubah (dipakai sebagai kunci cache PDF
+# dan pratinjau HTML; utils.pratinjau_slip harus ikut disesuaikan)
+TEMPLATE_VERSION = "1"
+
+
+def format_angka(value):
+    """Format angka dengan titik sebagai pemisah ribuan"""
+    return f"{int(value):,}".replace(",", ".")
+
+
+def prepare_pdf_data(row):
+    """Melengkapi dict baris surat jalan dengan nama-nama tanda tangan untuk add_data"""
+    return {
+        **row,
+        'nama_sopir_ttd': row['nama_sopir'],
+        'nama_ditimbang_ttd': row.get('nama_ditimbang', ''),
+        'nama_diterima_ttd': row.get('nama_diterima', ''),
+        'nama_diketahui_ttd': row.get('nama_diketahui', '')
+    }
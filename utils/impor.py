@@ -0,0 +1,265 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.master_data import catat_master_df, kanonikkan_df
+from utils.metrik import span
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Kolom surat_jalan yang diisi oleh impor (urutan sama dengan INSERT)
+KOLOM_INSERT = [
+    "tanggal_masuk", "jam_masuk", "tanggal_keluar", "jam_keluar", "nomor_do",
+    "nomor_polisi", "nama_sopir", "nama_barang", "po_do", "transport",
+    "bruto", "tara", "netto", "tanggal_input",
+    "nama_ditimbang", "nama_diterima", "nama_diketahui",
+]
+
+# Nama kolom alternatif yang sering dipakai software timbangan lama
+ALIAS_KOLOM = {
+    "nopol": "nomor_polisi",
+    "no_polisi": "nomor_polisi",
+    "plat_nomor": "nomor_polisi",
+    "sopir": "nama_sopir",
+    "driver": "nama_sopir",
+    "barang": "nama_barang",
+    "material": "nama_barang",
+    "no_do": "nomor_do",
+    "nomor_slip": "nomor_do",
+    "tgl_masuk": "tanggal_masuk",
+    "tgl_keluar": "tanggal_keluar",
+    "timbangan_i": "bruto",
+    "timbangan_ii": "tara",
+}
+
+KOLOM_WAJIB = ["nomor_polisi", "nama_sopir", "nama_barang", "bruto", "tara", "tanggal_masuk"]
+
+# Toleransi selisih netto di berkas terhadap bruto - tara (kg)
+TOLERANSI_NETTO = 0.5
+
+_INSERT_SQL = (
+    f"INSERT INTO surat_jalan ({', '.join(KOLOM_INSERT)}) "
+    f"VALUES ({', '.join('?' for _ in KOLOM_INSERT)})"
+)
+
+
+def normalisasi_kolom(df):
+    """Menyeragamkan nama kolom: huruf kecil, spasi/garis menjadi '_', alias diterjemahkan"""
+    kolom = (
+        pd.Index(df.columns).astype(str).str.strip().str.lower()
+        .str.replace(r"[\s/\-\.]+", "_", regex=True).str.strip("_")
+    )
+    df = df.copy()
+    df.columns = [ALIAS_KOLOM.get(k, k) for k in kolom]
+    return df.loc[:, ~df.columns.duplicated()]
+
+
+def baca_berkas(sumber, nama_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Membaca CSV / Excel per potongan `chunk_size` baris (semua nilai sebagai teks)"""
+    ext = os.path.splitext(nama_file)[1].lower()
+    if ext in (".csv", ".txt"):
+        for chunk in pd.read_csv(sumber, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                                 sep=None, engine="python", encoding="utf-8-sig"):
+            yield normalisasi_kolom(chunk)
+    elif ext in (".xlsx", ".xlsm"):
+        yield from _baca_excel(sumber, chunk_size)
+    else:
+        raise ValueError(f"Format berkas tidak didukung: {ext or nama_file}")
+
+
+def _baca_excel(sumber, chunk_size):
+    # openpyxl mode read_only membaca baris secara streaming, tidak memuat seluruh sheet
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("Impor Excel membutuhkan modul 'openpyxl'. Instal dengan `pip install openpyxl`.")
+
+    workbook = load_workbook(sumber, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(h) if h is not None else f"kolom_{i}" for i, h in enumerate(header)]
+        batch = []
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                yield normalisasi_kolom(pd.DataFrame(batch, columns=header))
+                batch = []
+        if batch:
+            yield normalisasi_kolom(pd.DataFrame(batch, columns=header))
+    finally:
+        workbook.close()
+
+
+def _teks(df, kolom):
+    if kolom not in df.columns:
+        return pd.Series("", index=df.index)
+    return df[kolom].fillna("").astype(str).str.strip().replace({"nan": "", "None": "", "NaT": ""})
+
+
+def _angka(df, kolom):
+    if kolom not in df.columns:
+        return pd.Series(np.nan, index=df.index)
+    nilai = df[kolom]
+    if not pd.api.types.is_numeric_dtype(nilai):
+        # "12.345" / "12.345,5" (format Indonesia) maupun "12345.5"
+        teks = nilai.fillna("").astype(str).str.strip().str.replace(" ", "", regex=False)
+        indonesia = teks.str.contains(",", regex=False) | teks.str.fullmatch(r"-?\d{1,3}(\.\d{3})+")
+        teks = teks.where(~indonesia, teks.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+        nilai = teks
+    return pd.to_numeric(nilai, errors="coerce")
+
+
+def _tanggal(teks):
+    # ISO (termasuk sel tanggal Excel "YYYY-MM-DD 00:00:00") dulu, sisanya format bebas hari-dulu
+    tanggal = pd.to_datetime(teks.str[:10], errors="coerce", format="%Y-%m-%d")
+    sisa = tanggal.isna() & (teks != "")
+    if sisa.any():
+        tanggal = tanggal.fillna(pd.to_datetime(teks.where(sisa), errors="coerce", dayfirst=True, format="mixed"))
+    return tanggal
+
+
+def _jam(teks):
+    # "8:05", "08:05", "08:05:00" -> "08:05"; kosong tetap kosong
+    bagian = teks.str.extract(r"^(\d{1,2})[:.](\d{2})")
+    jam = bagian[0].str.zfill(2) + ":" + bagian[1]
+    valid = bagian[0].notna() & (bagian[0].astype(float) < 24) & (bagian[1].astype(float) < 60)
+    return jam.where(valid, "")
+
+
+def validasi_chunk(df):
+    """Validasi vektor dengan aturan yang sama seperti form input.
+
+    Mengembalikan (DataFrame siap insert dengan kolom KOLOM_INSERT,
+    DataFrame baris ditolak beserta kolom 'baris' dan 'alasan').
+    """
+    hasil = pd.DataFrame(index=df.index)
+    for kolom in ("nomor_do", "nomor_polisi", "nama_sopir", "nama_barang", "po_do", "transport",
+                  "nama_ditimbang", "nama_diterima", "nama_diketahui"):
+        hasil[kolom] = _teks(df, kolom)
+
+    tanggal_masuk = _tanggal(_teks(df, "tanggal_masuk"))
+    tanggal_keluar = _tanggal(_teks(df, "tanggal_keluar")).fillna(tanggal_masuk)
+    hasil["tanggal_masuk"] = tanggal_masuk.dt.strftime("%Y-%m-%d")
+    hasil["tanggal_keluar"] = tanggal_keluar.dt.strftime("%Y-%m-%d")
+    hasil["jam_masuk"] = _jam(_teks(df, "jam_masuk")).replace("", "00:00")
+    hasil["jam_keluar"] = _jam(_teks(df, "jam_keluar"))
+    hasil["jam_keluar"] = hasil["jam_keluar"].where(hasil["jam_keluar"] != "", hasil["jam_masuk"])
+
+    hasil["bruto"] = _angka(df, "bruto")
+    hasil["tara"] = _angka(df, "tara")
+    hasil["netto"] = hasil["bruto"] - hasil["tara"]
+    netto_berkas = _angka(df, "netto")
+
+    # Nomor DO kosong diisi seperti form: ddmmyyyy-HHMM dari tanggal/jam masuk
+    do_otomatis = tanggal_masuk.dt.strftime("%d%m%Y") + "-" + hasil["jam_masuk"].str.replace(":", "", regex=False)
+    hasil["nomor_do"] = hasil["nomor_do"].where(hasil["nomor_do"] != "", do_otomatis)
+
+    # tanggal_input dari berkas jika ada (mis. hasil ekspor), selain itu dari tanggal/jam masuk
+    teks_input = _teks(df, "tanggal_input")
+    tanggal_input = _tanggal(teks_input)
+    waktu_input = teks_input.str[11:].str.extract(r"^(\d{1,2}[:.]\d{2})(?::(\d{2}))?")
+    jam_input = _jam(waktu_input[0].fillna(""))
+    hasil["tanggal_input"] = np.where(
+        tanggal_input.notna() & (jam_input != ""),
+        tanggal_input.dt.strftime("%Y-%m-%d") + " " + jam_input + ":" + waktu_input[1].fillna("00"),
+        hasil["tanggal_masuk"] + " " + hasil["jam_masuk"] + ":00",
+    )
+
+    aturan = [
+        (hasil["nomor_polisi"] == "", "Nomor Polisi wajib diisi"),
+        (hasil["nama_sopir"] == "", "Nama Sopir wajib diisi"),
+        (hasil["nama_barang"] == "", "Nama Barang wajib diisi"),
+        (tanggal_masuk.isna(), "Tanggal Masuk tidak valid"),
+        (hasil["bruto"].isna() | hasil["tara"].isna(), "Bruto/Tara bukan angka"),
+        ((hasil["bruto"] < 0) | (hasil["tara"] < 0), "Bruto/Tara negatif"),
+        (hasil["bruto"] <= hasil["tara"], "Bruto harus lebih besar dari Tara"),
+        (netto_berkas.notna() & ((netto_berkas - hasil["netto"]).abs() > TOLERANSI_NETTO),
+         "Netto tidak sama dengan Bruto - Tara"),
+    ]
+    alasan = pd.Series("", index=df.index)
+    for mask, pesan in aturan:
+        alasan = alasan + np.where(mask.fillna(True), pesan + "; ", "")
+    ditolak_mask = alasan != ""
+
+    ditolak = df.loc[ditolak_mask].copy()
+    ditolak["alasan"] = alasan[ditolak_mask].str.rstrip("; ")
+    return hasil.loc[~ditolak_mask, KOLOM_INSERT], ditolak
+
+
+def _tandai_duplikat(conn, valid):
+    """Mask baris yang sudah ada di database (nomor_do + nomor_polisi + tanggal_input sama)"""
+    if valid.empty:
+        return pd.Series(False, index=valid.index)
+    kunci_db = set()
+    daftar_do = valid["nomor_do"].unique().tolist()
+    # Dipecah agar jumlah parameter tetap di bawah batas SQLite
+    for i in range(0, len(daftar_do), 500):
+        bagian = daftar_do[i:i + 500]
+        kunci_db.update(conn.execute(
+            f"SELECT nomor_do, nomor_polisi, tanggal_input FROM surat_jalan "
+            f"WHERE nomor_do IN ({', '.join('?' for _ in bagian)})", bagian
+        ).fetchall())
+    kunci = list(zip(valid["nomor_do"], valid["nomor_polisi"], valid["tanggal_input"]))
+    sudah_ada = pd.Series([k in kunci_db for k in kunci], index=valid.index)
+    # Duplikat di dalam berkas yang sama juga hanya dimasukkan sekali
+    return sudah_ada | valid.duplicated(subset=["nomor_do", "nomor_polisi", "tanggal_input"])
+
+
+def impor_berkas(pool, sumber, nama_file, path_ditolak, chunk_size=DEFAULT_CHUNK_SIZE,
+                 lewati_duplikat=True, progress_callback=None):
+    """Impor massal CSV/Excel ke surat_jalan.
+
+    Setiap potongan divalidasi secara vektor lalu dimasukkan dengan executemany
+    dalam satu transaksi. Baris yang ditolak ditulis ke CSV `path_ditolak`
+    beserta nomor baris asal dan alasannya. `progress_callback(dibaca, diterima, ditolak)`
+    dipanggil setiap potongan. Mengembalikan dict ringkasan.
+    """
+    ringkasan = {"dibaca": 0, "diterima": 0, "ditolak": 0, "duplikat": 0,
+                 "total_netto": 0.0, "path_ditolak": None}
+    ada_ditolak = False
+    baris_awal = 2  # baris 1 adalah header
+
+    for chunk in baca_berkas(sumber, nama_file, chunk_size):
+        chunk.index = pd.RangeIndex(baris_awal, baris_awal + len(chunk))
+        baris_awal += len(chunk)
+
+        hilang = [k for k in KOLOM_WAJIB if k not in chunk.columns]
+        if hilang:
+            raise ValueError(f"Kolom wajib tidak ditemukan: {', '.join(hilang)}")
+
+        valid, ditolak = validasi_chunk(chunk)
+        with pool.write() as conn:
+            # Ejaan nopol/sopir/barang/transport diseragamkan dengan master data sebelum cek duplikat
+            valid = kanonikkan_df(conn, valid)
+            if lewati_duplikat:
+                duplikat = _tandai_duplikat(conn, valid)
+                if duplikat.any():
+                    ringkasan["duplikat"] += int(duplikat.sum())
+                    valid = valid.loc[~duplikat]
+            conn.executemany(_INSERT_SQL, valid.itertuples(index=False, name=None))
+            catat_master_df(conn, valid)
+
+        if not ditolak.empty:
+            ditolak.insert(0, "baris", ditolak.index)
+            with span("file", "impor_ditolak"):
+                ditolak.to_csv(path_ditolak, mode="a" if ada_ditolak else "w",
+                               header=not ada_ditolak, index=False,
+                               encoding="utf-8-sig" if not ada_ditolak else "utf-8")
+            ada_ditolak = True
+
+        ringkasan["dibaca"] += len(chunk)
+        ringkasan["diterima"] += len(valid)
+        ringkasan["ditolak"] += len(ditolak)
+        ringkasan["total_netto"] += float(valid["netto"].sum())
+        if progress_callback:
+            progress_callback(ringkasan["dibaca"], ringkasan["diterima"], ringkasan["ditolak"])
+
+    if ada_ditolak:
+        ringkasan["path_ditolak"] = path_ditolak
+    return ringkasan
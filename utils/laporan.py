@@ -0,0 +1,138 @@
+import html
+import re
+
+import pandas as pd
+
+# Batas Telegram: 4096 karakter per pesan, 1024 per caption dokumen (dihitung dalam unit UTF-16)
+TELEGRAM_MAX_CHARS = 4096
+TELEGRAM_MAX_CAPTION = 1024
+# Jika detail transaksi butuh lebih dari sekian pesan, detail dikirim sebagai lampiran CSV
+MAKS_PESAN_LAPORAN = 4
+
+KOLOM_CSV = [
+    "tanggal_input", "nomor_do", "nomor_polisi", "nama_sopir", "nama_barang",
+    "transport", "po_do", "bruto", "tara", "netto",
+]
+
+_RIBUAN = re.compile(r"\B(?=(\d{3})+(?!\d))")
+_ENTITAS_TERPOTONG = re.compile(r"&[^;\s]*$")
+
+
+def panjang_telegram(text):
+    """Panjang teks menurut Telegram (unit UTF-16, emoji dihitung 2)"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def escape_series(series):
+    """Escape HTML (&, <, >) untuk seluruh kolom sekaligus"""
+    return (
+        series.fillna("").astype(str)
+        .str.replace("&", "&amp;", regex=False)
+        .str.replace("<", "&lt;", regex=False)
+        .str.replace(">", "&gt;", regex=False)
+    )
+
+
+def format_angka_series(series):
+    """Versi vektor dari format_angka: titik sebagai pemisah ribuan, tanpa desimal"""
+    angka = pd.to_numeric(series, errors="coerce").fillna(0).astype("int64")
+    return angka.astype(str).str.replace(_RIBUAN, ".", regex=True)
+
+
+def baris_transaksi(df):
+    """Satu baris teks per transaksi: DO | nopol | sopir | netto"""
+    if df.empty:
+        return []
+    baris = (
+        "• " + escape_series(df["nomor_do"])
+        + " | " + escape_series(df["nomor_polisi"])
+        + " | " + escape_series(df["nama_sopir"])
+        + " | " + format_angka_series(df["netto"]) + " kg"
+    )
+    return baris.tolist()
+
+
+def baris_rekap(df, kolom):
+    """Baris rekap per kelompok (nama_barang / transport) dari tabel rekap"""
+    if df.empty:
+        return []
+    label = escape_series(df[kolom]).replace("", "-")
+    baris = (
+        "• " + label
+        + ": " + df["jumlah_transaksi"].astype(int).astype(str) + " trx | "
+        + format_angka_series(df["total_netto"]) + " kg"
+    )
+    return baris.tolist()
+
+
+def _potong_baris(baris, batas):
+    # Baris tunggal yang lebih panjang dari batas dipotong tanpa memutus entitas HTML
+    while panjang_telegram(baris) > batas - 1:
+        baris = baris[:-max(1, panjang_telegram(baris) - batas + 1)]
+    return _ENTITAS_TERPOTONG.sub("", baris) + "…"
+
+
+def pecah_pesan(baris, batas=TELEGRAM_MAX_CHARS):
+    """Menggabungkan baris menjadi pesan-pesan dengan panjang <= batas.
+
+    Pemotongan hanya dilakukan di antara baris; setiap tag HTML dibuka dan
+    ditutup di baris yang sama sehingga setiap potongan tetap HTML yang valid.
+    """
+    pesan = []
+    sekarang = []
+    panjang = 0
+    for teks in baris:
+        if panjang_telegram(teks) > batas:
+            teks = _potong_baris(teks, batas)
+        tambah = panjang_telegram(teks) + (1 if sekarang else 0)
+        if sekarang and panjang + tambah > batas:
+            pesan.append("\n".join(sekarang))
+            sekarang = []
+            tambah = panjang_telegram(teks)
+            panjang = 0
+        sekarang.append(teks)
+        panjang += tambah
+    if sekarang:
+        pesan.append("\n".join(sekarang))
+    return pesan
+
+
+def csv_transaksi(df):
+    """Isi CSV (UTF-8 dengan BOM agar terbaca Excel) untuk lampiran laporan"""
+    kolom = [k for k in KOLOM_CSV if k in df.columns]
+    return df[kolom].to_csv(index=False).encode("utf-8-sig")
+
+
+def susun_laporan_harian(tanggal, ringkasan, transaksi_df, barang_df, transport_df, keterangan,
+                         batas=TELEGRAM_MAX_CHARS, maks_pesan=MAKS_PESAN_LAPORAN):
+    """Menyusun laporan harian untuk Telegram.
+
+    Mengembalikan dict {"pesan": [teks HTML], "dokumen": (nama_file, bytes) atau None}.
+    Jika detail transaksi terlalu panjang (lebih dari `maks_pesan` pesan), pesan hanya
+    berisi ringkasan dan rekap, sedangkan detail dilampirkan sebagai CSV.
+    """
+    kepala = [
+        f"📊 <b>LAPORAN HARIAN {tanggal.strftime('%d/%m/%Y')}</b>",
+        "",
+        f"<b>Jumlah Transaksi:</b> {ringkasan['jumlah_transaksi']}",
+        f"<b>Total Kendaraan:</b> {ringkasan['jumlah_kendaraan']}",
+        f"<b>Total Netto:</b> {format_angka_series(pd.Series([ringkasan['total_netto']])).iloc[0]} kg",
+    ]
+    rekap = []
+    if not barang_df.empty:
+        rekap += ["", "<b>Per Barang:</b>"] + baris_rekap(barang_df, "nama_barang")
+    if not transport_df.empty:
+        rekap += ["", "<b>Per Transport:</b>"] + baris_rekap(transport_df, "transport")
+    penutup = ["", f"<i>{html.escape(keterangan, quote=False)}</i>"]
+
+    detail = ["", "<b>Detail Transaksi:</b>"] + baris_transaksi(transaksi_df)
+    pesan = pecah_pesan(kepala + rekap + detail + penutup, batas)
+    if len(pesan) <= maks_pesan:
+        return {"pesan": pesan, "dokumen": None}
+
+    catatan = ["", f"<i>Detail {len(transaksi_df)} transaksi terlampir sebagai CSV.</i>"]
+    nama_file = f"laporan_harian_{tanggal.strftime('%Y%m%d')}.csv"
+    return {
+        "pesan": pecah_pesan(kepala + rekap + catatan + penutup, batas),
+        "dokumen": (nama_file, csv_transaksi(transaksi_df)),
+    }
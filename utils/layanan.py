@@ -0,0 +1,156 @@
+"""Lapisan layanan tanpa Streamlit: simpan/ubah/hapus slip, laporan harian, ekspor PDF dan notifikasi.
+
+Dipakai oleh ONE_SISTEM.py maupun command line (utils.cli), sehingga job
+terjadwal tidak perlu menjalankan skrip UI. Fungsi yang menerima `conn`
+berjalan di dalam transaksi pemanggil (pool.write() / pool.read()).
+"""
+import html
+from datetime import datetime
+
+from utils.batch_export import DEFAULT_PAGES_PER_PART, export_history_batch
+from utils.format_slip import format_angka
+from utils.impor import KOLOM_INSERT
+from utils.laporan import susun_laporan_harian
+from utils.master_data import catat_master, kanonikkan
+from utils.rekap import fetch_transaksi_harian, get_rekap_barang, get_rekap_transport, get_ringkasan_harian
+from utils.telegram_outbox import enqueue_document, enqueue_message
+
+_INSERT_SQL = (
+    f"INSERT INTO surat_jalan ({', '.join(KOLOM_INSERT)}) "
+    f"VALUES ({', '.join('?' for _ in KOLOM_INSERT)})"
+)
+# Kolom yang bisa diubah lewat form edit (tanggal_input tetap)
+KOLOM_UBAH = [k for k in KOLOM_INSERT if k != "tanggal_input"]
+
+
+class SlipError(Exception):
+    """Data slip tidak valid (kolom wajib kosong, bruto <= tara)"""
+
+
+def validasi_slip(data):
+    if not data.get("nomor_polisi") or not data.get("nama_sopir") or not data.get("nama_barang"):
+        raise SlipError("Nomor Polisi, Nama Sopir, dan Nama Barang wajib diisi!")
+    if float(data.get("bruto") or 0) <= float(data.get("tara") or 0):
+        raise SlipError("Bruto harus lebih besar dari Tara!")
+
+
+def _siapkan_slip(conn, data):
+    validasi_slip(data)
+    # Ejaan baku dari master data ("B1234ABC" dan "B 1234 ABC" menjadi satu kendaraan)
+    slip = kanonikkan(conn, {k: data.get(k, "") for k in KOLOM_INSERT})
+    slip["bruto"], slip["tara"] = float(slip["bruto"]), float(slip["tara"])
+    slip["netto"] = slip["bruto"] - slip["tara"]
+    for kolom in ("tanggal_masuk", "tanggal_keluar"):
+        slip[kolom] = str(slip[kolom])
+    return slip
+
+
+def simpan_slip(conn, data, waktu=None):
+    """Menyimpan slip baru; netto dihitung dari bruto - tara. Mengembalikan dict slip beserta `id`."""
+    slip = _siapkan_slip(conn, data)
+    slip["tanggal_input"] = data.get("tanggal_input") or (waktu or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+    cursor = conn.execute(_INSERT_SQL, [slip[k] for k in KOLOM_INSERT])
+    catat_master(conn, slip, slip["tanggal_input"])
+    slip["id"] = cursor.lastrowid
+    return slip
+
+
+def perbarui_slip(conn, slip_id, data):
+    """Mengubah slip `slip_id`. Mengembalikan dict slip hasil perubahan."""
+    slip = _siapkan_slip(conn, data)
+    cursor = conn.execute(
+        f"UPDATE surat_jalan SET {', '.join(f'{k} = ?' for k in KOLOM_UBAH)} WHERE id = ?",
+        [slip[k] for k in KOLOM_UBAH] + [slip_id]
+    )
+    if cursor.rowcount == 0:
+        raise SlipError(f"Slip dengan ID {slip_id} tidak ditemukan.")
+    catat_master(conn, slip)
+    slip["id"] = slip_id
+    return slip
+
+
+def hapus_slip_per_do(conn, nomor_do):
+    """Menghapus semua slip dengan nomor DO tersebut. Mengembalikan jumlah baris terhapus."""
+    return conn.execute("DELETE FROM surat_jalan WHERE nomor_do = ?", (nomor_do,)).rowcount
+
+
+def _e(nilai):
+    return html.escape(str(nilai), quote=False)
+
+
+def pesan_input_baru(slip):
+    """Teks notifikasi Telegram untuk slip baru (form input, tiket dua tahap maupun CLI)"""
+    return (
+        f"📝 <b>INPUT DATA BARU</b>\n\n"
+        f"<b>Nomor DO:</b> {_e(slip['nomor_do'])}\n"
+        f"<b>Tanggal Masuk:</b> {_e(slip['tanggal_masuk'])} {_e(slip['jam_masuk'])}\n"
+        f"<b>Nomor Polisi:</b> {_e(slip['nomor_polisi'])}\n"
+        f"<b>Sopir:</b> {_e(slip['nama_sopir'])}\n"
+        f"<b>Barang:</b> {_e(slip['nama_barang'])}\n"
+        f"<b>Netto:</b> {format_angka(slip['netto'])} kg\n\n"
+        f"<i>Dikirim pada: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</i>"
+    )
+
+
+def pesan_impor(nama_file, hasil):
+    """Satu notifikasi ringkasan untuk impor massal, bukan satu pesan per baris"""
+    return (
+        f"📥 <b>IMPOR DATA MASSAL</b>\n\n"
+        f"<b>Berkas:</b> {_e(nama_file)}\n"
+        f"<b>Diterima:</b> {hasil['diterima']} baris\n"
+        f"<b>Ditolak:</b> {hasil['ditolak']} baris\n"
+        f"<b>Duplikat dilewati:</b> {hasil['duplikat']} baris\n"
+        f"<b>Total Netto:</b> {format_angka(hasil['total_netto'])} kg\n\n"
+        f"<i>Dikirim pada: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</i>"
+    )
+
+
+def baca_laporan_harian(conn, tanggal, arsip=()):
+    """(ringkasan, transaksi_df, rekap_barang_df, rekap_transport_df) untuk satu tanggal.
+
+    Rekap tetap tersimpan di database utama; hanya daftar transaksi tanggal yang
+    sudah diarsipkan yang membutuhkan skema `arsip` terpasang.
+    """
+    return (
+        get_ringkasan_harian(conn, tanggal),
+        fetch_transaksi_harian(conn, tanggal, arsip=arsip),
+        get_rekap_barang(conn, tanggal),
+        get_rekap_transport(conn, tanggal),
+    )
+
+
+def susun_laporan(conn, tanggal, keterangan, arsip=()):
+    """Laporan harian siap kirim (lihat susun_laporan_harian), atau None jika tidak ada transaksi"""
+    ringkasan = get_ringkasan_harian(conn, tanggal)
+    if ringkasan["jumlah_transaksi"] == 0:
+        return None
+    return susun_laporan_harian(tanggal, *baca_laporan_harian(conn, tanggal, arsip), keterangan)
+
+
+def antrekan_laporan(conn, chat_id, laporan):
+    """Memasukkan semua potongan laporan (dan lampiran CSV jika ada) ke outbox dalam transaksi `conn`"""
+    for teks in laporan["pesan"]:
+        enqueue_message(conn, chat_id, teks)
+    if laporan["dokumen"]:
+        nama_file, isi = laporan["dokumen"]
+        enqueue_document(conn, chat_id, nama_file, isi, caption=f"📎 {nama_file}")
+
+
+def ekspor_pdf(pool, output_dir, tanggal_awal=None, tanggal_akhir=None, search_nopol="", search_do="",
+               use_fts=True, pages_per_part=DEFAULT_PAGES_PER_PART, progress_callback=None, arsip=None,
+               gabung_zip=True):
+    """PDF continuous (atau ZIP per part) untuk rentang tanggal dan/atau filter riwayat.
+
+    Arsip tahunan yang beririsan dengan rentang tanggal ikut dibaca (atau tahun
+    `arsip` bila diberikan). Mengembalikan (path, jumlah_halaman); (None, 0) jika
+    tidak ada slip. Dengan `gabung_zip=False` path diganti daftar file part.
+    """
+    nama = "batch_surat_jalan"
+    if tanggal_awal or tanggal_akhir:
+        nama += f"_{tanggal_awal or 'awal'}_{tanggal_akhir or 'akhir'}"
+    return export_history_batch(
+        pool, output_dir, search_nopol, search_do, use_fts=use_fts,
+        tanggal_awal=tanggal_awal, tanggal_akhir=tanggal_akhir, base_name=nama,
+        pages_per_part=pages_per_part, progress_callback=progress_callback, arsip=arsip,
+        gabung_zip=gabung_zip
+    )
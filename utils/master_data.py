@@ -0,0 +1,306 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from heapq import nlargest
+
+import pandas as pd
+
+# Jenis master data -> kolom surat_jalan
+JENIS_MASTER = {
+    "nopol": "nomor_polisi",
+    "sopir": "nama_sopir",
+    "barang": "nama_barang",
+    "po_do": "po_do",
+    "transport": "transport",
+}
+
+# Bentuk umum plat Indonesia: kode wilayah, nomor, huruf seri ('B1234ABC' -> 'B 1234 ABC')
+NOPOL_RE = r"^([A-Z]{1,2})(\d{1,4})([A-Z]{0,3})$"
+
+# Batas kandidat yang diperingkat per permintaan saran (awalan sangat pendek)
+BATAS_PINDAI = 5000
+# Jumlah kunci paling sering dipakai per jenis yang disimpan terurut (saran untuk isian kosong / awalan pendek)
+JUMLAH_TERATAS = 100
+
+_UPSERT_SQL = '''
+    INSERT INTO master_data (jenis, kunci, nilai, jumlah, terakhir_pada, versi)
+    VALUES (?, ?, ?, ?, ?, (SELECT COALESCE(MAX(versi), 0) + 1 FROM master_data))
+    ON CONFLICT (jenis, kunci) DO UPDATE SET
+        jumlah = jumlah + excluded.jumlah,
+        terakhir_pada = MAX(COALESCE(terakhir_pada, ''), excluded.terakhir_pada),
+        versi = excluded.versi
+'''
+
+
+def normalisasi_nopol(nopol):
+    """Bentuk baku nomor polisi untuk pencarian: huruf besar tanpa spasi/tanda baca ('B 1234-ABC' -> 'B1234ABC')"""
+    return re.sub(r"[^0-9A-Z]", "", str(nopol or "").upper())
+
+
+def normalisasi(jenis, nilai):
+    """Kunci pencocokan: nopol tanpa spasi/tanda baca, lainnya spasi dirapatkan dan huruf kecil"""
+    if jenis == "nopol":
+        return normalisasi_nopol(nilai)
+    return re.sub(r"\s+", " ", str(nilai or "")).strip().casefold()
+
+
+def normalisasi_series(jenis, series):
+    """Versi vektor dari normalisasi()"""
+    teks = series.fillna("").astype(str)
+    if jenis == "nopol":
+        return teks.str.upper().str.replace(r"[^0-9A-Z]", "", regex=True)
+    return teks.str.replace(r"\s+", " ", regex=True).str.strip().str.casefold()
+
+
+def rapikan(jenis, nilai):
+    """Bentuk tampilan untuk nilai yang belum ada di master"""
+    if jenis == "nopol":
+        m = re.match(NOPOL_RE, normalisasi_nopol(nilai))
+        if m:
+            return " ".join(g for g in m.groups() if g)
+        return re.sub(r"\s+", " ", str(nilai or "")).strip().upper()
+    return re.sub(r"\s+", " ", str(nilai or "")).strip()
+
+
+def rapikan_series(jenis, series):
+    """Versi vektor dari rapikan()"""
+    teks = series.fillna("").astype(str)
+    if jenis == "nopol":
+        kunci = normalisasi_series(jenis, teks)
+        cocok = kunci.str.match(NOPOL_RE)
+        plat = kunci.str.replace(NOPOL_RE, r"\1 \2 \3", regex=True).str.strip()
+        return plat.where(cocok, teks.str.replace(r"\s+", " ", regex=True).str.strip().str.upper())
+    return teks.str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def ensure_master_data(conn):
+    """Tabel master data beserta isi awal dari riwayat.
+
+    Varian ejaan yang paling sering dipakai menjadi nilai baku. Riwayat sendiri
+    tidak diubah (slip yang sudah dicetak tetap seperti aslinya); pengelompokan
+    membaca lewat kunci master, lihat kelompok_sql() dan baku_series().
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS master_data (
+            jenis TEXT NOT NULL,
+            kunci TEXT NOT NULL,
+            nilai TEXT NOT NULL,
+            jumlah INTEGER NOT NULL DEFAULT 0,
+            terakhir_pada TEXT,
+            versi INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (jenis, kunci)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_master_data_versi ON master_data (versi)")
+
+    versi = conn.execute("SELECT COALESCE(MAX(versi), 0) FROM master_data").fetchone()[0]
+    for jenis, kolom in JENIS_MASTER.items():
+        df = pd.read_sql_query(
+            f"SELECT {kolom} AS nilai, COUNT(*) AS jumlah, MAX(tanggal_input) AS terakhir_pada "
+            f"FROM surat_jalan WHERE TRIM(COALESCE({kolom}, '')) != '' GROUP BY {kolom}", conn
+        )
+        if df.empty:
+            continue
+        df["kunci"] = normalisasi_series(jenis, df["nilai"])
+        df["rapi"] = df["nilai"].str.replace(r"\s+", " ", regex=True).str.strip()
+        if jenis == "nopol":
+            df["rapi"] = df["rapi"].str.upper()
+        df = df[df["kunci"] != ""].sort_values(["jumlah", "terakhir_pada"], ascending=False)
+
+        # Varian terbanyak menjadi nilai baku
+        master = df.groupby("kunci").agg(jumlah=("jumlah", "sum"), terakhir_pada=("terakhir_pada", "max"))
+        master["nilai"] = df.drop_duplicates("kunci").set_index("kunci")["rapi"]
+        master["versi"] = range(versi + 1, versi + 1 + len(master))
+        versi += len(master)
+        conn.executemany(
+            "INSERT OR IGNORE INTO master_data (jenis, kunci, nilai, jumlah, terakhir_pada, versi) VALUES (?, ?, ?, ?, ?, ?)",
+            ((jenis, kunci, r.nilai, int(r.jumlah), r.terakhir_pada, int(r.versi)) for kunci, r in master.iterrows())
+        )
+
+
+def daftarkan_fungsi(conn):
+    """Mendaftarkan fungsi SQL kunci_master(jenis, nilai) pada koneksi (dipakai kelompok_sql)"""
+    conn.create_function("kunci_master", 2, normalisasi, deterministic=True)
+
+
+def kelompok_sql(jenis, kolom):
+    """Pasangan (ekspresi kunci, ekspresi label) untuk GROUP BY `kolom` lewat kunci master.
+
+    Varian ejaan lama di riwayat / tabel rekap jatuh ke satu grup; labelnya
+    ejaan baku dari master_data, atau ejaan di riwayat bila belum tercatat.
+    Koneksi harus sudah melewati daftarkan_fungsi().
+    """
+    kunci = f"kunci_master('{jenis}', {kolom})"
+    label = (
+        f"COALESCE((SELECT m.nilai FROM master_data m WHERE m.jenis = '{jenis}' AND m.kunci = {kunci}), "
+        f"MIN({kolom}))"
+    )
+    return kunci, label
+
+
+def _nilai_baku(conn, jenis, kunci_list):
+    peta = {}
+    for i in range(0, len(kunci_list), 500):
+        bagian = kunci_list[i:i + 500]
+        peta.update(conn.execute(
+            f"SELECT kunci, nilai FROM master_data WHERE jenis = ? AND kunci IN ({', '.join('?' for _ in bagian)})",
+            [jenis] + bagian
+        ).fetchall())
+    return peta
+
+
+def kanonikkan(conn, baris):
+    """Mengganti nilai kolom master di dict `baris` dengan ejaan baku dari master_data"""
+    baris = dict(baris)
+    for jenis, kolom in JENIS_MASTER.items():
+        if not baris.get(kolom):
+            continue
+        kunci = normalisasi(jenis, baris[kolom])
+        baris[kolom] = _nilai_baku(conn, jenis, [kunci]).get(kunci) or rapikan(jenis, baris[kolom])
+    return baris
+
+
+def baku_series(conn, jenis, series):
+    """Ejaan baku untuk setiap nilai di `series`: dari master_data, atau dirapikan bila belum tercatat.
+
+    Varian yang belum tercatat memakai ejaan pertama di `series` untuk kunci yang sama.
+    """
+    kunci = normalisasi_series(jenis, series)
+    peta = _nilai_baku(conn, jenis, [k for k in kunci.unique().tolist() if k])
+    baku = kunci.map(peta)
+    rapi = rapikan_series(jenis, series).groupby(kunci).transform("first")
+    return baku.where(baku.notna(), rapi)
+
+
+def kanonikkan_df(conn, df):
+    """Versi vektor dari kanonikkan() untuk impor massal"""
+    df = df.copy()
+    for jenis, kolom in JENIS_MASTER.items():
+        if kolom in df.columns:
+            df[kolom] = baku_series(conn, jenis, df[kolom])
+    return df
+
+
+def catat_master(conn, baris, waktu=None):
+    """Mencatat nilai slip yang baru disimpan ke master_data (di dalam transaksi tulis yang sama)"""
+    waktu = waktu or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    data = []
+    for jenis, kolom in JENIS_MASTER.items():
+        kunci = normalisasi(jenis, baris.get(kolom))
+        if kunci:
+            data.append((jenis, kunci, rapikan(jenis, baris[kolom]), 1, waktu))
+    conn.executemany(_UPSERT_SQL, data)
+
+
+def catat_master_df(conn, df, waktu=None):
+    waktu = waktu or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for jenis, kolom in JENIS_MASTER.items():
+        if kolom not in df.columns or df.empty:
+            continue
+        data = pd.DataFrame({"kunci": normalisasi_series(jenis, df[kolom]), "nilai": rapikan_series(jenis, df[kolom])})
+        data = data[data["kunci"] != ""]
+        if data.empty:
+            continue
+        master = data.groupby("kunci").agg(nilai=("nilai", "first"), jumlah=("nilai", "size"))
+        conn.executemany(
+            _UPSERT_SQL,
+            ((jenis, kunci, r.nilai, int(r.jumlah), waktu) for kunci, r in master.iterrows())
+        )
+
+
+class IndeksPrefiks:
+    """Indeks awalan di memori untuk autocomplete master data.
+
+    Per jenis disimpan daftar kunci terurut (dicari dengan bisect), peta
+    kunci -> (nilai, jumlah) dan daftar JUMLAH_TERATAS kunci paling sering
+    dipakai. Perubahan di master_data dimuat secara bertahap berdasarkan kolom
+    `versi`, hanya jika PRAGMA data_version berubah.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._kunci = {jenis: [] for jenis in JENIS_MASTER}
+        self._entri = {jenis: {} for jenis in JENIS_MASTER}
+        self._teratas = {jenis: [] for jenis in JENIS_MASTER}
+        self._versi_master = 0
+        self._versi_data = None
+
+    def segarkan(self):
+        """Memuat baris master_data yang berubah sejak pemuatan terakhir; mengembalikan jumlahnya"""
+        versi_data = self.pool.data_version()
+        if versi_data == self._versi_data:
+            return 0
+        with self.pool.read() as conn:
+            rows = conn.execute(
+                "SELECT jenis, kunci, nilai, jumlah, versi FROM master_data WHERE versi > ? ORDER BY versi",
+                (self._versi_master,)
+            ).fetchall()
+        with self._lock:
+            baru = {jenis: [] for jenis in JENIS_MASTER}
+            berubah = {jenis: set() for jenis in JENIS_MASTER}
+            for jenis, kunci, nilai, jumlah, versi in rows:
+                entri = self._entri.get(jenis)
+                if entri is None:
+                    continue
+                if kunci not in entri:
+                    baru[jenis].append(kunci)
+                entri[kunci] = (nilai, jumlah)
+                berubah[jenis].add(kunci)
+                self._versi_master = max(self._versi_master, versi)
+            for jenis, kunci_baru in baru.items():
+                if len(kunci_baru) > 64:
+                    # Pemuatan awal / impor besar: urutkan ulang sekali
+                    self._kunci[jenis] = sorted(self._entri[jenis])
+                else:
+                    for kunci in kunci_baru:
+                        insort(self._kunci[jenis], kunci)
+            for jenis, kunci_berubah in berubah.items():
+                if kunci_berubah:
+                    # Jumlah hanya bertambah, jadi cukup bandingkan daftar lama dengan kunci yang berubah
+                    entri = self._entri[jenis]
+                    self._teratas[jenis] = nlargest(
+                        JUMLAH_TERATAS, kunci_berubah.union(self._teratas[jenis]), key=lambda k: entri[k][1]
+                    )
+            self._versi_data = versi_data
+        return len(rows)
+
+    def saran(self, jenis, awalan="", batas=10):
+        """Nilai baku yang kuncinya diawali `awalan`, paling sering dipakai dulu"""
+        self.segarkan()
+        awalan = normalisasi(jenis, awalan)
+        with self._lock:
+            entri = self._entri[jenis]
+            # Bila daftar teratas sudah memuat cukup kunci berawalan ini, itulah peringkat sebenarnya
+            teratas = [k for k in self._teratas[jenis] if k.startswith(awalan)]
+            if len(teratas) >= batas or not awalan:
+                return [entri[k][0] for k in teratas[:batas]]
+            kunci = self._kunci[jenis]
+            awal = bisect_left(kunci, awalan)
+            akhir = bisect_left(kunci, awalan + "\U0010ffff", awal)
+            # Rentang sangat panjang dipotong; kunci teratas berawalan ini tetap ikut diperingkat
+            kandidat = set(kunci[awal:min(akhir, awal + BATAS_PINDAI)]).union(teratas)
+            terpilih = nlargest(batas, kandidat, key=lambda k: entri[k][1])
+            return [entri[k][0] for k in terpilih]
+
+    def nilai_baku(self, jenis, nilai):
+        """Ejaan baku untuk `nilai`, atau None jika belum ada di master"""
+        self.segarkan()
+        with self._lock:
+            entri = self._entri[jenis].get(normalisasi(jenis, nilai))
+        return entri[0] if entri else None
+
+
+_indeks = {}
+_indeks_lock = threading.Lock()
+
+
+def get_indeks(pool):
+    """Indeks awalan bersama (satu per database per proses)"""
+    with _indeks_lock:
+        indeks = _indeks.get(pool.path)
+        if indeks is None:
+            indeks = IndeksPrefiks(pool)
+            _indeks[pool.path] = indeks
+        return indeks
@@ -0,0 +1,294 @@
+"""Instrumentasi ringan: span waktu untuk query SQL, render PDF, tulis file dan HTTP keluar.
+
+Nonaktif secara default. Saat nonaktif, span() hanya mengembalikan context
+manager kosong dan koneksi database memakai sqlite3.Connection biasa, sehingga
+biaya tambahannya praktis nol. Aktifkan dengan environment
+SURAT_JALAN_METRIK=1 atau secrets METRIK_AKTIF = true.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import lru_cache, wraps
+
+# Jumlah sampel terakhir per span untuk menghitung p50/p95
+JENDELA_SAMPEL = 1024
+PREFIX_PROMETHEUS = "surat_jalan"
+
+_aktif = os.environ.get("SURAT_JALAN_METRIK", "").lower() not in ("", "0", "false", "no")
+_kosong = nullcontext()
+
+_PRAGMA_RE = re.compile(r"[=(\s]")
+_TABEL_RE = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN|TABLE|INDEX|TRIGGER)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?([\w.]+)", re.IGNORECASE)
+
+
+def aktif():
+    return _aktif
+
+
+def aktifkan(nilai=True):
+    """Menyalakan / mematikan instrumentasi. Panggil sebelum pool database dibuat agar query SQL ikut terukur."""
+    global _aktif
+    _aktif = bool(nilai)
+
+
+def persentil(urut, p):
+    if not urut:
+        return 0.0
+    return urut[min(len(urut) - 1, int(len(urut) * p))]
+
+
+class _Statistik:
+    __slots__ = ("sampel", "jumlah", "total", "maks")
+
+    def __init__(self):
+        self.sampel = deque(maxlen=JENDELA_SAMPEL)
+        self.jumlah = 0
+        self.total = 0.0
+        self.maks = 0.0
+
+
+class Registri:
+    """Kumpulan durasi per (kategori, nama), aman dipakai lintas thread.
+
+    Selain statistik kumulatif, setiap thread bisa mengumpulkan total per
+    kategori untuk satu rerun Streamlit (mulai_rerun / selesai_rerun).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self._lokal = threading.local()
+
+    def catat(self, kategori, nama, detik):
+        with self._lock:
+            stat = self._data.get((kategori, nama))
+            if stat is None:
+                stat = self._data[(kategori, nama)] = _Statistik()
+            stat.sampel.append(detik)
+            stat.jumlah += 1
+            stat.total += detik
+            if detik > stat.maks:
+                stat.maks = detik
+        rerun = getattr(self._lokal, "rerun", None)
+        if rerun is not None:
+            jumlah, total = rerun.get(kategori, (0, 0.0))
+            rerun[kategori] = (jumlah + 1, total + detik)
+
+    def mulai_rerun(self):
+        self._lokal.rerun = {}
+
+    def selesai_rerun(self):
+        """Total {kategori: (jumlah, detik)} selama rerun di thread ini"""
+        rerun = getattr(self._lokal, "rerun", None) or {}
+        self._lokal.rerun = None
+        return rerun
+
+    def _snapshot(self):
+        """(kategori, nama, p50, p95, jumlah, total, maks) dalam detik"""
+        with self._lock:
+            salinan = [(k, n, sorted(s.sampel), s.jumlah, s.total, s.maks) for (k, n), s in self._data.items()]
+        return [(k, n, persentil(urut, 0.5), persentil(urut, 0.95), jumlah, total, maks)
+                for k, n, urut, jumlah, total, maks in salinan]
+
+    def ringkasan(self):
+        """Daftar dict per span (p50/p95 dari sampel terakhir), total terbesar dulu"""
+        hasil = [{
+            "kategori": kategori,
+            "nama": nama,
+            "jumlah": jumlah,
+            "total_ms": round(total * 1000, 3),
+            "p50_ms": round(p50 * 1000, 3),
+            "p95_ms": round(p95 * 1000, 3),
+            "maks_ms": round(maks * 1000, 3),
+        } for kategori, nama, p50, p95, jumlah, total, maks in self._snapshot()]
+        return sorted(hasil, key=lambda r: r["total_ms"], reverse=True)
+
+    def prometheus(self):
+        """Format teks eksposisi Prometheus (summary per span)"""
+        nama_metrik = f"{PREFIX_PROMETHEUS}_span_seconds"
+        baris = [
+            f"# HELP {nama_metrik} Durasi span instrumentasi (SQL, PDF, file, HTTP, rerun).",
+            f"# TYPE {nama_metrik} summary",
+        ]
+        for kategori, nama, p50, p95, jumlah, total, _ in sorted(self._snapshot()):
+            label = f'kategori="{kategori}",nama="{_escape_label(nama)}"'
+            baris.append(f'{nama_metrik}{{{label},quantile="0.5"}} {p50:.9f}')
+            baris.append(f'{nama_metrik}{{{label},quantile="0.95"}} {p95:.9f}')
+            baris.append(f"{nama_metrik}_sum{{{label}}} {total:.9f}")
+            baris.append(f"{nama_metrik}_count{{{label}}} {jumlah}")
+        return "\n".join(baris) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+
+def _escape_label(nilai):
+    return str(nilai).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+registri = Registri()
+
+
+class _Span:
+    __slots__ = ("kategori", "nama", "mulai")
+
+    def __init__(self, kategori, nama):
+        self.kategori = kategori
+        self.nama = nama
+
+    def __enter__(self):
+        self.mulai = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registri.catat(self.kategori, self.nama, time.perf_counter() - self.mulai)
+        return False
+
+
+def span(kategori, nama):
+    """Context manager pengukur waktu; tidak melakukan apa pun saat instrumentasi nonaktif"""
+    if not _aktif:
+        return _kosong
+    return _Span(kategori, nama)
+
+
+def terukur(kategori, nama=None):
+    """Decorator: setiap pemanggilan fungsi dicatat sebagai satu span"""
+    def decorator(fungsi):
+        label = nama or fungsi.__qualname__
+
+        @wraps(fungsi)
+        def wrapper(*args, **kwargs):
+            if not _aktif:
+                return fungsi(*args, **kwargs)
+            with _Span(kategori, label):
+                return fungsi(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def mulai_rerun():
+    registri.mulai_rerun()
+
+
+def selesai_rerun():
+    return registri.selesai_rerun()
+
+
+def ringkasan():
+    return registri.ringkasan()
+
+
+@lru_cache(maxsize=2048)
+def label_sql(sql):
+    """Label span SQL berkardinalitas rendah: kata kerja + tabel pertama, mis. 'SELECT surat_jalan'"""
+    kata = sql.split(None, 2)
+    if not kata:
+        return "?"
+    verb = kata[0].upper()
+    if verb == "PRAGMA" and len(kata) > 1:
+        return "PRAGMA " + _PRAGMA_RE.split(kata[1], 1)[0]
+    m = _TABEL_RE.search(sql)
+    return f"{verb} {m.group(1)}" if m else verb
+
+
+class CursorTerukur(sqlite3.Cursor):
+    """Cursor yang mencatat durasi execute (kategori 'sql') dan fetch (kategori 'sql_fetch')"""
+
+    _label = "?"
+
+    def execute(self, sql, parameters=()):
+        self._label = label_sql(sql)
+        mulai = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            registri.catat("sql", self._label, time.perf_counter() - mulai)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._label = label_sql(sql)
+        mulai = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            registri.catat("sql", self._label, time.perf_counter() - mulai)
+
+    def executescript(self, sql_script):
+        mulai = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            registri.catat("sql", "SCRIPT", time.perf_counter() - mulai)
+
+    def _fetch(self, fungsi, *args):
+        mulai = time.perf_counter()
+        try:
+            return fungsi(*args)
+        finally:
+            registri.catat("sql_fetch", self._label, time.perf_counter() - mulai)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+
+class KoneksiTerukur(sqlite3.Connection):
+    """Koneksi yang semua query-nya lewat CursorTerukur (dipakai hanya saat instrumentasi aktif)"""
+
+    def cursor(self, factory=CursorTerukur):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def tulis_file(path):
+    """Menulis snapshot metrik ke `path` secara atomik; .json -> JSON, selain itu teks Prometheus"""
+    if path.endswith(".json"):
+        isi = json.dumps({"waktu": time.time(), "span": registri.ringkasan()}, indent=2)
+    else:
+        isi = registri.prometheus()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(isi)
+    os.replace(tmp_path, path)
+
+
+class PenulisMetrik(threading.Thread):
+    """Thread daemon yang menulis file metrik setiap `interval` detik untuk di-scrape monitoring"""
+
+    def __init__(self, path, interval=15.0):
+        super().__init__(name="penulis-metrik", daemon=True)
+        self.path = path
+        self.interval = interval
+        self._berhenti = threading.Event()
+        self.error_terakhir = None
+
+    def run(self):
+        while not self._berhenti.wait(self.interval):
+            try:
+                tulis_file(self.path)
+                self.error_terakhir = None
+            except OSError as e:
+                self.error_terakhir = str(e)
+
+    def stop(self):
+        self._berhenti.set()
@@ -0,0 +1,114 @@
+from datetime import datetime
+
+from utils.arsip import ensure_arsip
+from utils.master_data import ensure_master_data
+from utils.rekap import ensure_rekap, upgrade_rekap_durasi
+from utils.search_index import FTS_TABLE, ensure_search_index
+from utils.sinkron import ensure_jurnal
+from utils.telegram_outbox import ensure_outbox, ensure_outbox_dokumen
+from utils.tiket import ensure_tiket
+from utils.timbangan import ensure_timbangan
+
+
+def buat_tabel_surat_jalan(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS surat_jalan (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tanggal_masuk TEXT,
+            jam_masuk TEXT,
+            tanggal_keluar TEXT,
+            jam_keluar TEXT,
+            nomor_do TEXT,
+            nomor_polisi TEXT,
+            nama_sopir TEXT,
+            nama_barang TEXT,
+            po_do TEXT,
+            transport TEXT,
+            bruto REAL,
+            tara REAL,
+            netto REAL,
+            tanggal_input TEXT,
+            nama_ditimbang TEXT,
+            nama_diterima TEXT,
+            nama_diketahui TEXT
+        )
+    ''')
+
+
+def add_missing_columns(conn):
+    """Menambahkan kolom tanda tangan untuk database versi lama"""
+    existing_columns = [col[1] for col in conn.execute("PRAGMA table_info(surat_jalan)").fetchall()]
+
+    new_columns = {
+        "nama_ditimbang": "TEXT",
+        "nama_diterima": "TEXT",
+        "nama_diketahui": "TEXT"
+    }
+
+    for col_name, col_type in new_columns.items():
+        if col_name not in existing_columns:
+            conn.execute(f"ALTER TABLE surat_jalan ADD COLUMN {col_name} {col_type} DEFAULT ''")
+
+
+# Daftar migrasi berurutan: (versi, nama, fungsi). Tambahkan migrasi baru di akhir,
+# jangan mengubah nomor versi yang sudah ada. Setiap fungsi harus aman untuk
+# database lama yang dibuat sebelum tabel schema_migrations ada.
+MIGRATIONS = [
+    (1, "buat_tabel_surat_jalan", buat_tabel_surat_jalan),
+    (2, "kolom_tanda_tangan", add_missing_columns),
+    (3, "indeks_pencarian", ensure_search_index),
+    (4, "tabel_rekap", ensure_rekap),
+    (5, "telegram_outbox", ensure_outbox),
+    (6, "telegram_outbox_dokumen", ensure_outbox_dokumen),
+    (7, "rekap_turnaround", upgrade_rekap_durasi),
+    (8, "pembacaan_timbangan", ensure_timbangan),
+    (9, "tiket_dua_tahap", ensure_tiket),
+    (10, "master_data", ensure_master_data),
+    (11, "jurnal_perubahan", ensure_jurnal),
+    (12, "arsip_tahunan", ensure_arsip),
+]
+
+
+def versi_terpasang(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            versi INTEGER PRIMARY KEY,
+            nama TEXT NOT NULL,
+            diterapkan_pada TEXT NOT NULL
+        )
+    ''')
+    return {row[0] for row in conn.execute("SELECT versi FROM schema_migrations")}
+
+
+def jalankan_migrasi(pool, sampai_versi=None):
+    """Menerapkan migrasi yang belum tercatat, masing-masing dalam satu transaksi.
+
+    `sampai_versi` membatasi migrasi yang diterapkan (mis. untuk mengisi data
+    mentah sebelum indeks dan rekap dibangun). Mengembalikan daftar nama
+    migrasi yang baru diterapkan.
+    """
+    with pool.write() as conn:
+        terpasang = versi_terpasang(conn)
+
+    diterapkan = []
+    for versi, nama, fungsi in MIGRATIONS:
+        if versi in terpasang or (sampai_versi is not None and versi > sampai_versi):
+            continue
+        with pool.write() as conn:
+            # Cek ulang di dalam transaksi: proses lain mungkin sudah menerapkannya
+            if conn.execute("SELECT 1 FROM schema_migrations WHERE versi = ?", (versi,)).fetchone():
+                continue
+            fungsi(conn)
+            conn.execute(
+                "INSERT INTO schema_migrations (versi, nama, diterapkan_pada) VALUES (?, ?, ?)",
+                (versi, nama, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+        diterapkan.append(nama)
+    return diterapkan
+
+
+def fts_index_aktif(conn):
+    """Apakah indeks FTS trigram tersedia di database ini"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).fetchone() is not None
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrik import span
+from utils.format_slip import TEMPLATE_VERSION, prepare_pdf_data
+
+# Kolom yang tampil di slip; hanya kolom ini yang menentukan isi PDF
+PDF_FIELDS = [
+    "tanggal_masuk", "jam_masuk", "tanggal_keluar", "jam_keluar", "nomor_do",
+    "nomor_polisi", "nama_sopir", "nama_barang", "po_do", "transport",
+    "bruto", "tara", "netto", "nama_ditimbang", "nama_diterima", "nama_diketahui",
+]
+
+
+def _normalisasi(value):
+    # Samakan nilai dari sqlite3 (int/float/str) dan pandas (numpy, NaN)
+    if hasattr(value, "item"):
+        value = value.item()
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def slip_cache_key(row):
+    """Hash isi slip + versi template; berubah otomatis saat baris diedit"""
+    content = {field: _normalisasi(row.get(field)) for field in PDF_FIELDS}
+    payload = json.dumps([TEMPLATE_VERSION, content], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_slip_pdf(row):
+    """Merender satu slip ke bytes PDF"""
+    # fpdf baru dimuat saat render pertama, bukan saat aplikasi start
+    from utils.pdf_generator import PDF
+
+    pdf = PDF()
+    pdf.add_page()
+    pdf.add_data(prepare_pdf_data(row))
+    return bytes(pdf.output())
+
+
+def atomic_write(path, data):
+    """Menulis file lewat file sementara + os.replace agar pembaca tidak melihat file setengah jadi"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with span("file", "pdf_cache"), os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class PdfCache:
+    """Cache render PDF slip berbasis isi (content-addressed).
+
+    File disimpan sebagai `<hash>.pdf` di `cache_dir`, dibatasi total ukuran
+    (LRU berdasarkan waktu akses) dan umur maksimum. Render terbaru juga
+    disimpan di memori agar unduhan berulang tidak membaca disk.
+    """
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, max_age_s=7 * 24 * 3600, memory_items=32):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def _remember(self, key, data):
+        if self.memory_items <= 0:
+            return
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get_path(self, row):
+        """Path file PDF untuk slip ini, dirender hanya jika belum ada untuk versi isinya"""
+        key = slip_cache_key(row)
+        path = self._path(key)
+        if os.path.exists(path):
+            # Perbarui waktu akses untuk urutan LRU
+            os.utime(path, None)
+            return path
+        data = render_slip_pdf(row)
+        atomic_write(path, data)
+        self._remember(key, data)
+        self.evict()
+        return path
+
+    def get_bytes(self, row):
+        """Isi PDF untuk slip ini (dari memori, disk, atau render baru)"""
+        key = slip_cache_key(row)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+        path = self.get_path(row)
+        with open(path, "rb") as f:
+            data = f.read()
+        self._remember(key, data)
+        return data
+
+    def evict(self):
+        """Hapus file yang terlalu tua, lalu yang paling lama tidak diakses sampai di bawah batas ukuran"""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pdf"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age_s:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        key = os.path.splitext(os.path.basename(path))[0]
+        with self._lock:
+            self._memory.pop(key, None)
+
+
+def bersihkan_file_ekspor(directory, max_age_s=24 * 3600):
+    """Menghapus file ekspor (batch/split/sementara) di `directory` yang lebih tua dari max_age_s"""
+    now = time.time()
+    dihapus = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            continue
+        try:
+            if now - os.path.getmtime(path) > max_age_s:
+                os.remove(path)
+                dihapus += 1
+        except OSError:
+            pass
+    return dihapus
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_pdf_cache(cache_dir, **kwargs):
+    """Cache PDF bersama (satu per direktori per proses)"""
+    with _caches_lock:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = PdfCache(cache_dir, **kwargs)
+            _caches[cache_dir] = cache
+        return cache
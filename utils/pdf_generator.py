@@ -1,12 +1,38 @@
 from fpdf import FPDF
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+import logging
 import os
+import threading
 
-def format_angka(value):
-    """Format angka dengan titik sebagai pemisah ribuan"""
-    return f"{int(value):,}".replace(",", ".")
+# TEMPLATE_VERSION tetap diekspor dari sini untuk pemakai lama
+from utils.format_slip import TEMPLATE_VERSION, format_angka, prepare_pdf_data
+from utils.metrik import span, terukur
+
+logger = logging.getLogger(__name__)
+
+# Cache font untuk seluruh proses: file TTF diparse sekali (metrik, cmap, lebar glyph),
+# lalu dipakai ulang oleh semua instance PDF. Per dokumen hanya dibuat objek TTFont
+# lazy dari bytes di memori, karena subsetting saat output mengubah objek tersebut.
+_FONT_CACHE = {}
+_FONT_CACHE_LOCK = threading.Lock()
+
+def _font_slots(cls):
+    slots = []
+    for klass in cls.__mro__:
+        names = getattr(klass, "__slots__", ())
+        slots.extend([names] if isinstance(names, str) else names)
+    return slots
+
+def clear_font_cache():
+    """Mengosongkan cache font (dipakai oleh benchmark)"""
+    with _FONT_CACHE_LOCK:
+        _FONT_CACHE.clear()
 
 class PDF(FPDF):
+    # Set False untuk selalu memparse ulang file font (mis. untuk pembanding benchmark)
+    font_cache_enabled = True
+
     def __init__(self):
         super().__init__(orientation="L", unit="mm", format=(279.4, 241.3))  # Kertas 11 x 9.5 inci
         self.set_margins(left=12.7, top=10, right=12.7)
@@ -16,13 +42,69 @@ class PDF(FPDF):
             os.makedirs(font_dir)
 
         try:
-            self.add_font("Calibri", "", os.path.join(font_dir, "calibri.ttf"))
-            self.add_font("Calibri", "B", os.path.join(font_dir, "calibrib.ttf"))
+            self.add_cached_font("Calibri", "", os.path.join(font_dir, "calibri.ttf"))
+            self.add_cached_font("Calibri", "B", os.path.join(font_dir, "calibrib.ttf"))
         except Exception as e:
             print(f"Gagal memuat font Calibri: {e}. Pastikan file .ttf ada di folder 'fonts'.")
             self.add_font("Courier", "", "font/courier.ttf")
             self.add_font("Courier", "B", "font/courierbd.ttf")
 
+    def add_cached_font(self, family, style, fname):
+        """Seperti add_font, tetapi memakai hasil parse font dari cache proses"""
+        if not PDF.font_cache_enabled:
+            self.add_font(family, style, fname)
+            return
+
+        fontkey = f"{family.lower()}{style}"
+        cache_key = (os.path.abspath(fname), style)
+        with _FONT_CACHE_LOCK:
+            cached = _FONT_CACHE.get(cache_key)
+
+        if cached is not None:
+            try:
+                self.fonts[fontkey] = self._clone_font(*cached)
+                return
+            except Exception:
+                # Versi fpdf2 berbeda struktur internalnya: kembali ke cara biasa
+                self.fonts.pop(fontkey, None)
+
+        self.add_font(family, style, fname)
+        template = self.fonts[fontkey]
+        with open(fname, "rb") as f:
+            font_bytes = f.read()
+        # Urutan glyph disimpan agar TTFont baru tidak perlu membangunnya ulang dari cmap
+        glyph_order = tuple(template.ttfont.getGlyphOrder())
+        with _FONT_CACHE_LOCK:
+            _FONT_CACHE.setdefault(cache_key, (template, font_bytes, glyph_order))
+
+    def _clone_font(self, template, font_bytes, glyph_order):
+        from fontTools import ttLib
+        from fpdf.fonts import SubsetMap
+
+        font = object.__new__(type(template))
+        for slot in _font_slots(type(template)):
+            if hasattr(template, slot):
+                setattr(font, slot, getattr(template, slot))
+
+        # Atribut berikut khusus per dokumen dan tidak boleh dibagi antar PDF
+        font.i = len(self.fonts) + 1
+        font.ttfont = ttLib.TTFont(BytesIO(font_bytes), recalcTimestamp=False, lazy=True)
+        font.ttfont.setGlyphOrder(list(glyph_order))
+        font.missing_glyphs = []
+        font.biggest_size_pt = 0
+        if hasattr(template, "_hbfont"):
+            font._hbfont = None
+        font.subset = SubsetMap(font)
+        if getattr(template, "color_font", None) is not None:
+            # Hanya font berwarna (COLR/CPAL/SVG) yang butuh objek per dokumen
+            from fpdf.font_type_3 import get_color_font_object
+            font.color_font = get_color_font_object(self, font, font.palette_index)
+        return font
+
+    def output(self, *args, **kwargs):
+        with span("pdf", "output"):
+            return super().output(*args, **kwargs)
+
     def header(self):
         self.set_font("Calibri", "B", 12)
         self.cell(0, 7, "SURAT JALAN", ln=True, align="C")
@@ -32,6 +114,7 @@ class PDF(FPDF):
         self.line(self.l_margin, self.get_y(), self.w - self.r_margin, self.get_y())
         self.ln(2)
 
+    @terukur("pdf", "add_data")
     def add_data(self, row):
         self.set_font("Calibri", "", 12)
         self.ln(4)
@@ -106,28 +189,72 @@ class PDF(FPDF):
                 self.add_data(data_for_pdf)
             self.output(output_path)
             return True
-        except Exception as e:
-            print(f"Error generating batch PDF: {str(e)}")
+        except Exception:
+            logger.exception("Gagal membuat PDF batch %s", output_path)
             return False
 
-    def generate_split_pdfs(self, dataframe, by="nomor_polisi"):
-        file_paths = []
+    def generate_split_pdfs(self, dataframe, by="nomor_polisi", workers=1, progress_callback=None):
+        """Membuat satu PDF per grup (default per nomor polisi).
+
+        Dengan `workers` > 1, tiap grup dirender di process pool terpisah. Hasil
+        dikembalikan sesuai urutan grup; grup yang gagal dicatat di
+        `self.split_errors` tanpa menghentikan grup lain. `progress_callback`
+        dipanggil sebagai (jumlah_selesai, total, nama_grup) setiap satu file selesai.
+        """
+        jobs = []
         for group_name, group_df in dataframe.groupby(by):
-            temp_pdf = PDF()
-            output_path = os.path.join("temp_pdf", f"surat_jalan_{group_name.replace(' ', '_')}.pdf")
-            try:
-                for _, row in group_df.iterrows():
-                    data_for_pdf = {
-                        **row.to_dict(),
-                        'nama_sopir_ttd': row['nama_sopir'],
-                        'nama_ditimbang_ttd': row.get('nama_ditimbang', ''),
-                        'nama_diterima_ttd': row.get('nama_diterima', ''),
-                        'nama_diketahui_ttd': row.get('nama_diketahui', '')
-                    }
-                    temp_pdf.add_page()
-                    temp_pdf.add_data(data_for_pdf)
-                temp_pdf.output(output_path)
+            output_path = os.path.join("temp_pdf", f"surat_jalan_{str(group_name).replace(' ', '_')}.pdf")
+            jobs.append((group_name, group_df.to_dict("records"), output_path))
+
+        results = [None] * len(jobs)
+        total = len(jobs)
+        done = 0
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers <= 1 or total <= 1:
+            for index, job in enumerate(jobs):
+                results[index] = render_group_pdf(*job)
+                done += 1
+                if progress_callback:
+                    progress_callback(done, total, job[0])
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, total)) as executor:
+                futures = {executor.submit(render_group_pdf, *job): index for index, job in enumerate(jobs)}
+                for future in as_completed(futures):
+                    index = futures[future]
+                    group_name, _, output_path = jobs[index]
+                    try:
+                        results[index] = future.result()
+                    except Exception as e:
+                        results[index] = (group_name, output_path, str(e))
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done, total, group_name)
+
+        file_paths = []
+        self.split_errors = []
+        for group_name, output_path, error in results:
+            if error is None:
                 file_paths.append(output_path)
-            except Exception as e:
-                print(f"Error generating split PDF for {group_name}: {str(e)}")
-        return file_paths
\ No newline at end of file
+            else:
+                logger.error("Gagal membuat PDF split %s: %s", group_name, error)
+                self.split_errors.append((group_name, error))
+        return file_paths
+
+
+def render_group_pdf(group_name, records, output_path):
+    """Merender satu grup baris ke satu file PDF. Dipakai juga oleh worker process pool.
+
+    Mengembalikan (nama_grup, path, pesan_error atau None).
+    """
+    try:
+        temp_pdf = PDF()
+        for row in records:
+            temp_pdf.add_page()
+            temp_pdf.add_data(prepare_pdf_data(row))
+        temp_pdf.output(output_path)
+        return group_name, output_path, None
+    except Exception as e:
+        return group_name, output_path, str(e)
@@ -0,0 +1,152 @@
+"""Pratinjau slip sebagai HTML/CSS (tanpa fpdf) dengan tata letak yang sama seperti PDF.add_data.
+
+Posisi setiap sel disalin dari utils.pdf_generator dalam milimeter lalu
+diubah ke satuan `cqw` (persen lebar wadah), sehingga halaman 11 x 9.5 inci
+selalu tampil dengan proporsi aslinya berapa pun lebar kolom Streamlit.
+PDF sungguhan hanya dirender saat slip diunduh atau dicetak.
+"""
+import html
+import threading
+from collections import OrderedDict
+
+from utils.format_slip import format_angka, prepare_pdf_data
+from utils.metrik import terukur
+from utils.pdf_cache import slip_cache_key
+
+# Ukuran kertas dan margin sama dengan PDF() (mm)
+LEBAR_MM = 279.4
+TINGGI_MM = 241.3
+MARGIN_KIRI = 12.7
+MARGIN_KANAN = 12.7
+MARGIN_ATAS = 10
+# Padding teks di dalam sel fpdf (c_margin bawaan)
+PADDING_SEL = 1
+UKURAN_FONT_PT = 12
+TINGGI_BARIS = 6
+# Lebar maksimum pratinjau: 11 inci pada 96 dpi
+LEBAR_MAKS_PX = int(11 * 96)
+
+X_KIRI_LABEL = 15
+X_KIRI_COLON = 60
+X_KIRI_VAL = 65
+X_KANAN_LABEL = 150
+
+_CACHE_MAKS = 256
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cqw(mm):
+    return f"{mm * 100 / LEBAR_MM:.4f}cqw"
+
+
+_CSS = f"""
+<style>
+.sj-wadah {{ container-type: inline-size; width: 100%; max-width: {LEBAR_MAKS_PX}px; margin: 0 auto 1rem; }}
+.sj-halaman {{
+    position: relative; width: 100cqw; height: {_cqw(TINGGI_MM)}; overflow: hidden;
+    background: #fff; color: #000; box-shadow: 0 0 0.4rem rgba(0, 0, 0, 0.25);
+    font-family: Calibri, Carlito, "Segoe UI", Arial, sans-serif; font-size: {_cqw(UKURAN_FONT_PT * 25.4 / 72)};
+}}
+.sj-sel {{
+    position: absolute; box-sizing: border-box; padding: 0 {_cqw(PADDING_SEL)}; white-space: pre; overflow: hidden;
+}}
+.sj-tebal {{ font-weight: bold; }}
+.sj-garis {{ position: absolute; left: {_cqw(MARGIN_KIRI)}; width: {_cqw(LEBAR_MM - MARGIN_KIRI - MARGIN_KANAN)}; border-top: 1px solid #000; }}
+</style>
+"""
+
+
+def _sel(x, y, lebar, teks, rata="left", tinggi=TINGGI_BARIS, tebal=False):
+    kelas = "sj-sel sj-tebal" if tebal else "sj-sel"
+    return (
+        f'<div class="{kelas}" style="left:{_cqw(x)};top:{_cqw(y)};width:{_cqw(lebar)};'
+        f'height:{_cqw(tinggi)};line-height:{_cqw(tinggi)};text-align:{rata}">{html.escape(str(teks))}</div>'
+    )
+
+
+def _garis(y):
+    return f'<div class="sj-garis" style="top:{_cqw(y)}"></div>'
+
+
+def _angka(value):
+    return format_angka(value) if value not in ("", None) else ""
+
+
+def _nilai(row, field):
+    value = row.get(field, "")
+    return "" if value is None or (isinstance(value, float) and value != value) else value
+
+
+@terukur("pratinjau", "render_slip_html")
+def _render(row):
+    """Menyusun elemen halaman mengikuti urutan kursor (set_x/cell/ln) di PDF.header dan PDF.add_data"""
+    lebar_isi = LEBAR_MM - MARGIN_KIRI - MARGIN_KANAN
+    y = MARGIN_ATAS
+    bagian = []
+
+    # header()
+    for judul in ("SURAT JALAN", "BUKTI SLIP PENIMBANGAN"):
+        bagian.append(_sel(MARGIN_KIRI, y, lebar_isi, judul, rata="center", tinggi=7, tebal=True))
+        y += 7
+    y += 2
+    bagian.append(_garis(y))
+    y += 2
+
+    # add_data()
+    y += 4
+    baris = [
+        ("TANGGAL MASUK / JAM", f"{_nilai(row, 'tanggal_masuk')}   {_nilai(row, 'jam_masuk')}", None, None),
+        ("TANGGAL KELUAR / JAM", f"{_nilai(row, 'tanggal_keluar')}   {_nilai(row, 'jam_keluar')}",
+         "Timbangan I / Bruto", _nilai(row, 'bruto')),
+        ("NOMOR DO / SLIP", _nilai(row, 'nomor_do'), "Timbangan II / Tara", _nilai(row, 'tara')),
+        ("NOMOR POLISI", _nilai(row, 'nomor_polisi'), "Netto", _nilai(row, 'netto')),
+        ("NAMA SOPIR", _nilai(row, 'nama_sopir'), None, None),
+        ("NAMA BARANG", _nilai(row, 'nama_barang'), None, None),
+        ("PO / DO", _nilai(row, 'po_do'), None, None),
+        ("TRANSPORT", _nilai(row, 'transport'), None, None),
+    ]
+    for label_kiri, val_kiri, label_kanan, val_kanan in baris:
+        bagian.append(_sel(X_KIRI_LABEL, y, X_KIRI_COLON - X_KIRI_LABEL, label_kiri))
+        bagian.append(_sel(X_KIRI_COLON, y, X_KIRI_VAL - X_KIRI_COLON, ":"))
+        bagian.append(_sel(X_KIRI_VAL, y, 60, val_kiri))
+        if label_kanan:
+            bagian.append(_sel(X_KANAN_LABEL, y, 30, label_kanan, rata="right"))
+            bagian.append(_sel(X_KANAN_LABEL + 30, y, 3, ": "))
+            bagian.append(_sel(X_KANAN_LABEL + 33, y, 35, _angka(val_kanan), rata="right"))
+        y += TINGGI_BARIS
+
+    y += 4
+    bagian.append(_garis(y))
+    y += 10
+
+    # Tanda tangan
+    lebar_ttd = lebar_isi / 4
+    for i, label in enumerate(["Ditimbang,", "Sopir,", "Diterima,", "Diketahui,"]):
+        bagian.append(_sel(MARGIN_KIRI + i * lebar_ttd, y, lebar_ttd, label, rata="center"))
+    y += 20
+    for i, field in enumerate(["nama_ditimbang_ttd", "nama_sopir_ttd", "nama_diterima_ttd", "nama_diketahui_ttd"]):
+        bagian.append(_sel(MARGIN_KIRI + i * lebar_ttd, y, lebar_ttd, f"({_nilai(row, field):^15})", rata="center"))
+
+    return f'<div class="sj-wadah"><div class="sj-halaman">{"".join(bagian)}</div></div>'
+
+
+def render_slip_html(row):
+    """Fragmen HTML satu slip (tanpa <style>), di-cache per isi slip + versi template"""
+    key = slip_cache_key(row)
+    with _cache_lock:
+        fragmen = _cache.get(key)
+        if fragmen is not None:
+            _cache.move_to_end(key)
+            return fragmen
+    fragmen = _render(prepare_pdf_data(dict(row)))
+    with _cache_lock:
+        _cache[key] = fragmen
+        while len(_cache) > _CACHE_MAKS:
+            _cache.popitem(last=False)
+    return fragmen
+
+
+def pratinjau_html(rows):
+    """Dokumen HTML siap tampil (CSS + satu atau beberapa slip berurutan)"""
+    return _CSS + "".join(render_slip_html(row) for row in rows)
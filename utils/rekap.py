@@ -0,0 +1,270 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from utils.arsip import gabung_arsip
+from utils.master_data import daftarkan_fungsi, kelompok_sql
+
+# Definisi tabel rekap: nama tabel -> daftar (kolom kunci, ekspresi dari baris surat_jalan)
+# Ekspresi memakai placeholder {row} yang diganti NEW / OLD di dalam trigger.
+REKAP_TABLES = {
+    "rekap_harian": [("tanggal", "substr({row}.tanggal_input, 1, 10)")],
+    "rekap_bulanan": [("bulan", "substr({row}.tanggal_input, 1, 7)")],
+    "rekap_barang_harian": [
+        ("tanggal", "substr({row}.tanggal_input, 1, 10)"),
+        ("nama_barang", "COALESCE({row}.nama_barang, '')"),
+    ],
+    "rekap_transport_harian": [
+        ("tanggal", "substr({row}.tanggal_input, 1, 10)"),
+        ("transport", "COALESCE({row}.transport, '')"),
+    ],
+    "rekap_kendaraan_harian": [
+        ("tanggal", "substr({row}.tanggal_input, 1, 10)"),
+        ("nomor_polisi", "COALESCE({row}.nomor_polisi, '')"),
+    ],
+    "rekap_kendaraan_bulanan": [
+        ("bulan", "substr({row}.tanggal_input, 1, 7)"),
+        ("nomor_polisi", "COALESCE({row}.nomor_polisi, '')"),
+    ],
+}
+
+# Tabel ringkasan yang menyimpan jumlah kendaraan unik, dihitung dari tabel kendaraan.
+# Kolom ini menghitung ejaan nomor polisi apa adanya; pembaca (get_ringkasan_*) menghitung
+# ulang lewat kunci master agar varian ejaan lama tidak terhitung dua kali.
+KENDARAAN_UNIK = {
+    "rekap_harian": ("rekap_kendaraan_harian", "tanggal"),
+    "rekap_bulanan": ("rekap_kendaraan_bulanan", "bulan"),
+}
+
+# Kolom surat_jalan yang memengaruhi rekap (trigger UPDATE hanya untuk kolom ini)
+KOLOM_SUMBER = [
+    "tanggal_input", "nomor_polisi", "nama_barang", "transport", "bruto", "tara", "netto",
+    "tanggal_masuk", "jam_masuk", "tanggal_keluar", "jam_keluar",
+]
+
+# Kolom turnaround (lama di lokasi, menit) yang disimpan di setiap tabel rekap
+KOLOM_DURASI = {"jumlah_durasi": "INTEGER NOT NULL DEFAULT 0", "total_durasi": "REAL NOT NULL DEFAULT 0"}
+
+
+def _durasi_sql(row):
+    """Menit dari masuk sampai keluar untuk satu baris; NULL jika jam tidak valid atau negatif.
+
+    MAX(x, -1) bernilai NULL bila x NULL, dan -1 bila x negatif; NULLIF lalu membuang -1.
+    """
+    menit = (
+        f"(julianday({row}.tanggal_keluar || ' ' || substr({row}.jam_keluar, 1, 5)) "
+        f"- julianday({row}.tanggal_masuk || ' ' || substr({row}.jam_masuk, 1, 5))) * 1440"
+    )
+    return f"NULLIF(MAX({menit}, -1), -1)"
+
+
+def _create_tables(conn):
+    for table, keys in REKAP_TABLES.items():
+        key_cols = ", ".join(f"{col} TEXT NOT NULL" for col, _ in keys)
+        pk = ", ".join(col for col, _ in keys)
+        extra = ", jumlah_kendaraan INTEGER NOT NULL DEFAULT 0" if table in KENDARAAN_UNIK else ""
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key_cols},
+                jumlah_transaksi INTEGER NOT NULL DEFAULT 0,
+                total_bruto REAL NOT NULL DEFAULT 0,
+                total_tara REAL NOT NULL DEFAULT 0,
+                total_netto REAL NOT NULL DEFAULT 0,
+                jumlah_durasi INTEGER NOT NULL DEFAULT 0,
+                total_durasi REAL NOT NULL DEFAULT 0{extra},
+                PRIMARY KEY ({pk})
+            )
+        ''')
+
+
+def _tambah_sql(row):
+    """SQL untuk menambahkan satu baris (NEW / OLD) ke semua tabel rekap"""
+    statements = []
+    for table, keys in REKAP_TABLES.items():
+        cols = ", ".join(col for col, _ in keys)
+        exprs = ", ".join(expr.format(row=row) for _, expr in keys)
+        durasi = _durasi_sql(row)
+        statements.append(f'''
+            INSERT INTO {table} ({cols}, jumlah_transaksi, total_bruto, total_tara, total_netto,
+                                 jumlah_durasi, total_durasi)
+            VALUES ({exprs}, 1, COALESCE({row}.bruto, 0), COALESCE({row}.tara, 0), COALESCE({row}.netto, 0),
+                    {durasi} IS NOT NULL, COALESCE({durasi}, 0))
+            ON CONFLICT ({cols}) DO UPDATE SET
+                jumlah_transaksi = jumlah_transaksi + 1,
+                total_bruto = total_bruto + excluded.total_bruto,
+                total_tara = total_tara + excluded.total_tara,
+                total_netto = total_netto + excluded.total_netto,
+                jumlah_durasi = jumlah_durasi + excluded.jumlah_durasi,
+                total_durasi = total_durasi + excluded.total_durasi;''')
+    statements.extend(_kendaraan_unik_sql(row))
+    return "\n".join(statements)
+
+
+def _kurang_sql(row):
+    """SQL untuk mengurangi satu baris (OLD) dari semua tabel rekap"""
+    statements = []
+    for table, keys in REKAP_TABLES.items():
+        cond = " AND ".join(f"{col} = {expr.format(row=row)}" for col, expr in keys)
+        durasi = _durasi_sql(row)
+        statements.append(f'''
+            UPDATE {table} SET
+                jumlah_transaksi = jumlah_transaksi - 1,
+                total_bruto = total_bruto - COALESCE({row}.bruto, 0),
+                total_tara = total_tara - COALESCE({row}.tara, 0),
+                total_netto = total_netto - COALESCE({row}.netto, 0),
+                jumlah_durasi = jumlah_durasi - ({durasi} IS NOT NULL),
+                total_durasi = total_durasi - COALESCE({durasi}, 0)
+            WHERE {cond};
+            DELETE FROM {table} WHERE {cond} AND jumlah_transaksi <= 0;''')
+    statements.extend(_kendaraan_unik_sql(row))
+    return "\n".join(statements)
+
+
+def _kendaraan_unik_sql(row):
+    statements = []
+    for table, (kendaraan_table, key_col) in KENDARAAN_UNIK.items():
+        key_expr = dict(REKAP_TABLES[table])[key_col].format(row=row)
+        statements.append(f'''
+            UPDATE {table} SET jumlah_kendaraan = (
+                SELECT COUNT(*) FROM {kendaraan_table} WHERE {key_col} = {key_expr}
+            ) WHERE {key_col} = {key_expr};''')
+    return statements
+
+
+def _create_triggers(conn):
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS surat_jalan_rekap_ai AFTER INSERT ON surat_jalan BEGIN
+            {_tambah_sql("NEW")}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS surat_jalan_rekap_ad AFTER DELETE ON surat_jalan BEGIN
+            {_kurang_sql("OLD")}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS surat_jalan_rekap_au AFTER UPDATE OF {", ".join(KOLOM_SUMBER)} ON surat_jalan BEGIN
+            {_kurang_sql("OLD")}
+            {_tambah_sql("NEW")}
+        END
+    ''')
+
+
+def rebuild_rekap(conn):
+    """Menghitung ulang seluruh tabel rekap dari isi surat_jalan"""
+    durasi = _durasi_sql("surat_jalan")
+    for table, keys in REKAP_TABLES.items():
+        cols = ", ".join(col for col, _ in keys)
+        exprs = ", ".join(expr.format(row="surat_jalan") for _, expr in keys)
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f'''
+            INSERT INTO {table} ({cols}, jumlah_transaksi, total_bruto, total_tara, total_netto,
+                                 jumlah_durasi, total_durasi)
+            SELECT {exprs}, COUNT(*), COALESCE(SUM(bruto), 0), COALESCE(SUM(tara), 0), COALESCE(SUM(netto), 0),
+                   COUNT({durasi}), COALESCE(SUM({durasi}), 0)
+            FROM surat_jalan
+            WHERE tanggal_input IS NOT NULL
+            GROUP BY {exprs}
+        ''')
+    for table, (kendaraan_table, key_col) in KENDARAAN_UNIK.items():
+        conn.execute(f'''
+            UPDATE {table} SET jumlah_kendaraan = (
+                SELECT COUNT(*) FROM {kendaraan_table} k WHERE k.{key_col} = {table}.{key_col}
+            )
+        ''')
+
+
+def ensure_rekap(conn):
+    """Membuat tabel rekap beserta triggernya; data lama dihitung saat tabel pertama kali dibuat"""
+    sudah_ada = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rekap_harian'"
+    ).fetchone()
+    _create_tables(conn)
+    _create_triggers(conn)
+    if not sudah_ada:
+        rebuild_rekap(conn)
+
+
+def upgrade_rekap_durasi(conn):
+    """Migrasi: menambahkan kolom turnaround ke tabel rekap lama, memperbarui trigger, lalu menghitung ulang"""
+    for table in REKAP_TABLES:
+        existing_columns = [col[1] for col in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+        for col_name, col_type in KOLOM_DURASI.items():
+            if col_name not in existing_columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_type}")
+    for trigger in ("surat_jalan_rekap_ai", "surat_jalan_rekap_ad", "surat_jalan_rekap_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    _create_triggers(conn)
+    rebuild_rekap(conn)
+
+
+def _ringkasan(conn, tabel, tabel_kendaraan, kolom, nilai):
+    daftarkan_fungsi(conn)
+    kunci, _ = kelompok_sql("nopol", "nomor_polisi")
+    row = conn.execute(f'''
+        SELECT jumlah_transaksi,
+               (SELECT COUNT(DISTINCT {kunci}) FROM {tabel_kendaraan} k WHERE k.{kolom} = r.{kolom}),
+               total_netto
+        FROM {tabel} r WHERE {kolom} = ?
+    ''', (nilai,)).fetchone()
+    if row is None:
+        return {"jumlah_transaksi": 0, "jumlah_kendaraan": 0, "total_netto": 0}
+    return {"jumlah_transaksi": row[0], "jumlah_kendaraan": row[1], "total_netto": row[2]}
+
+
+def get_ringkasan_harian(conn, tanggal):
+    """Ringkasan satu hari: jumlah transaksi, kendaraan unik dan total netto"""
+    return _ringkasan(conn, "rekap_harian", "rekap_kendaraan_harian", "tanggal", str(tanggal))
+
+
+def get_ringkasan_bulanan(conn, bulan):
+    """Ringkasan satu bulan (format 'YYYY-MM')"""
+    return _ringkasan(conn, "rekap_bulanan", "rekap_kendaraan_bulanan", "bulan", bulan)
+
+
+def _rekap_per(conn, tabel, jenis, kolom, tanggal):
+    daftarkan_fungsi(conn)
+    kunci, label = kelompok_sql(jenis, kolom)
+    return pd.read_sql_query(
+        f"SELECT {label} AS {kolom}, SUM(jumlah_transaksi) AS jumlah_transaksi, SUM(total_netto) AS total_netto "
+        f"FROM {tabel} WHERE tanggal = ? GROUP BY {kunci} ORDER BY total_netto DESC",
+        conn, params=[str(tanggal)]
+    )
+
+
+def get_rekap_barang(conn, tanggal):
+    """Rekap per nama barang untuk satu hari"""
+    return _rekap_per(conn, "rekap_barang_harian", "barang", "nama_barang", tanggal)
+
+
+def get_rekap_transport(conn, tanggal):
+    """Rekap per transport untuk satu hari"""
+    return _rekap_per(conn, "rekap_transport_harian", "transport", "transport", tanggal)
+
+
+def rentang_hari(tanggal):
+    """Batas [awal, akhir) tanggal_input untuk satu hari, agar bisa memakai indeks"""
+    if isinstance(tanggal, str):
+        tanggal = datetime.strptime(tanggal, "%Y-%m-%d").date()
+    elif isinstance(tanggal, datetime):
+        tanggal = tanggal.date()
+    besok = tanggal + timedelta(days=1)
+    return str(tanggal), str(besok)
+
+
+def fetch_transaksi_harian(conn, tanggal, limit=None, arsip=()):
+    """Mengambil baris transaksi satu hari (terbaru dulu) lewat indeks tanggal_input.
+
+    `arsip` adalah skema arsip tahunan yang sudah di-ATTACH (utils.arsip.baca_arsip).
+    """
+    awal, akhir = rentang_hari(tanggal)
+    query, params = gabung_arsip(
+        arsip, "SELECT {kolom} FROM {tabel} WHERE {where} ORDER BY tanggal_input DESC, id DESC",
+        "tanggal_input >= ? AND tanggal_input < ?", [awal, akhir]
+    )
+    if arsip:
+        query += " ORDER BY tanggal_input DESC, id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(int(limit))
+    return pd.read_sql_query(query, conn, params=params)
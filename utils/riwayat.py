@@ -0,0 +1,95 @@
+import pandas as pd
+
+from utils.arsip import gabung_arsip
+from utils.search_index import build_search_filter
+
+DEFAULT_PAGE_SIZE = 50
+PAGE_SIZE_OPTIONS = [25, 50, 100, 250]
+
+
+def _filter(search_nopol, search_do, use_fts):
+    """Filter untuk tabel utama (FTS bila aktif) dan untuk tabel arsip (LIKE, arsip tidak punya FTS)"""
+    where_clause, params = build_search_filter(search_nopol, search_do, use_fts=use_fts)
+    where_arsip, params_arsip = build_search_filter(search_nopol, search_do, use_fts=False)
+    return where_clause, params, where_arsip, params_arsip
+
+
+def fetch_history_page(conn, search_nopol="", search_do="", page_size=DEFAULT_PAGE_SIZE, cursor=None, use_fts=True,
+                       arsip=()):
+    """Mengambil satu halaman riwayat dengan keyset pagination pada (tanggal_input, id).
+
+    `cursor` adalah pasangan (tanggal_input, id) dari baris terakhir halaman
+    sebelumnya. `arsip` adalah skema arsip yang sudah di-ATTACH (lihat
+    utils.arsip.baca_arsip) untuk ikut dicari. Mengembalikan (DataFrame halaman,
+    cursor halaman berikutnya atau None).
+    """
+    where_clause, params, where_arsip, params_arsip = _filter(search_nopol, search_do, use_fts)
+    if cursor is not None:
+        where_clause += " AND (tanggal_input, id) < (?, ?)"
+        where_arsip += " AND (tanggal_input, id) < (?, ?)"
+        params.extend(cursor)
+        params_arsip.extend(cursor)
+
+    # Ambil satu baris lebih untuk mengetahui apakah masih ada halaman berikutnya
+    params.append(page_size + 1)
+    params_arsip.append(page_size + 1)
+    query, params = gabung_arsip(
+        arsip, "SELECT {kolom} FROM {tabel} WHERE {where} ORDER BY tanggal_input DESC, id DESC LIMIT ?",
+        where_clause, params, where_arsip, params_arsip
+    )
+    if arsip:
+        query += " ORDER BY tanggal_input DESC, id DESC LIMIT ?"
+        params.append(page_size + 1)
+    page_df = pd.read_sql_query(query, conn, params=params)
+
+    next_cursor = None
+    if len(page_df) > page_size:
+        page_df = page_df.iloc[:page_size]
+        last_row = page_df.iloc[-1]
+        next_cursor = (last_row['tanggal_input'], int(last_row['id']))
+
+    return page_df.set_index('id'), next_cursor
+
+
+def fetch_history_all(conn, search_nopol="", search_do="", use_fts=True, arsip=()):
+    """Mengambil seluruh hasil pencarian (hanya untuk ekspor, dipanggil saat tombol ditekan)"""
+    query, params = gabung_arsip(
+        arsip, "SELECT {kolom} FROM {tabel} WHERE {where}", *_filter(search_nopol, search_do, use_fts)
+    )
+    query += " ORDER BY tanggal_input DESC, id DESC"
+    return pd.read_sql_query(query, conn, params=params).set_index('id')
+
+
+def count_history(conn, search_nopol="", search_do="", use_fts=True, arsip=()):
+    """Jumlah baris yang cocok dengan filter riwayat"""
+    query, params = gabung_arsip(
+        arsip, "SELECT COUNT(*) AS n FROM {tabel} WHERE {where}", *_filter(search_nopol, search_do, use_fts)
+    )
+    if arsip:
+        query = f"SELECT SUM(n) FROM ({query})"
+    return conn.execute(query, params).fetchone()[0]
+
+
+def fetch_slip_by_id(conn, slip_id, arsip=()):
+    """Mengambil satu baris surat jalan berdasarkan id, atau None jika tidak ada"""
+    query, params = gabung_arsip(arsip, "SELECT {kolom} FROM {tabel} WHERE {where}", "id = ?", [int(slip_id)])
+    row_df = pd.read_sql_query(query, conn, params=params)
+    if row_df.empty:
+        return None
+    return row_df.set_index('id').iloc[0]
+
+
+def filter_slip_aktif(conn, df):
+    """Baris `df` (hasil riwayat ber-index id) yang masih ada di tabel utama.
+
+    Baris dari arsip tahunan dibuang: edit dan hapus hanya berlaku untuk tabel
+    utama. id dan tanggal_input dicocokkan bersama agar id arsip yang kebetulan
+    sama dengan slip aktif tidak ikut lolos.
+    """
+    if df.empty:
+        return df
+    ids = [int(i) for i in df.index]
+    aktif = dict(conn.execute(
+        f"SELECT id, tanggal_input FROM surat_jalan WHERE id IN ({', '.join('?' for _ in ids)})", ids
+    ).fetchall())
+    return df[[aktif.get(int(i)) == t for i, t in zip(df.index, df['tanggal_input'])]]
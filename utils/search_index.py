@@ -0,0 +1,96 @@
+import sqlite3
+
+# Indeks B-tree untuk kolom yang sering dicari / diurutkan
+BTREE_INDEXES = {
+    "idx_surat_jalan_nomor_polisi": "nomor_polisi",
+    "idx_surat_jalan_nomor_do": "nomor_do",
+    "idx_surat_jalan_tanggal_input": "tanggal_input",
+}
+
+FTS_TABLE = "surat_jalan_fts"
+
+
+def fts_tersedia(conn):
+    """Cek apakah SQLite mendukung FTS5 dengan tokenizer trigram (SQLite >= 3.34)"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.cek_trigram USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp.cek_trigram")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def ensure_search_index(conn):
+    """Membuat indeks pencarian (B-tree + FTS5 trigram) beserta trigger sinkronisasinya.
+
+    Aman dipanggil berulang kali. Untuk database lama, indeks FTS dibangun ulang
+    dari isi tabel surat_jalan saat pertama kali dibuat. Jalankan di dalam satu
+    transaksi tulis agar pembuatan dan pengisian indeks bersifat atomik.
+    """
+    for index_name, column in BTREE_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON surat_jalan({column})")
+
+    if not fts_tersedia(conn):
+        return False
+
+    sudah_ada = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).fetchone()
+
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            nomor_polisi, nomor_do,
+            content='surat_jalan', content_rowid='id',
+            tokenize='trigram'
+        )
+    ''')
+
+    # Trigger agar indeks FTS selalu sama dengan isi surat_jalan
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS surat_jalan_fts_ai AFTER INSERT ON surat_jalan BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, nomor_polisi, nomor_do)
+            VALUES (NEW.id, NEW.nomor_polisi, NEW.nomor_do);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS surat_jalan_fts_ad AFTER DELETE ON surat_jalan BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, nomor_polisi, nomor_do)
+            VALUES ('delete', OLD.id, OLD.nomor_polisi, OLD.nomor_do);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS surat_jalan_fts_au AFTER UPDATE ON surat_jalan BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, nomor_polisi, nomor_do)
+            VALUES ('delete', OLD.id, OLD.nomor_polisi, OLD.nomor_do);
+            INSERT INTO {FTS_TABLE}(rowid, nomor_polisi, nomor_do)
+            VALUES (NEW.id, NEW.nomor_polisi, NEW.nomor_do);
+        END
+    ''')
+
+    # Migrasi: bangun indeks untuk data yang sudah ada sebelum FTS dibuat
+    if not sudah_ada:
+        conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+    return True
+
+
+def build_search_filter(search_nopol="", search_do="", use_fts=True):
+    """Menyusun klausa WHERE dan parameter untuk pencarian riwayat.
+
+    Dengan FTS5 trigram, pencarian LIKE '%x%' dijalankan terhadap indeks FTS
+    sehingga tidak perlu memindai seluruh tabel surat_jalan.
+    """
+    clauses = []
+    params = []
+    for column, value in (("nomor_polisi", search_nopol), ("nomor_do", search_do)):
+        if not value:
+            continue
+        pattern = f"%{value}%"
+        if use_fts:
+            clauses.append(f"id IN (SELECT rowid FROM {FTS_TABLE} WHERE {column} LIKE ?)")
+        else:
+            clauses.append(f"{column} LIKE ?")
+        params.append(pattern)
+
+    where = " AND ".join(clauses) if clauses else "1=1"
+    return where, params
@@ -0,0 +1,182 @@
+"""Simulator indikator timbangan: mengirim frame ASCII realistis lewat TCP.
+
+Menjalankan simulator (daemon lalu dihubungkan dengan --tcp 127.0.0.1:4001):
+
+    python -m utils.simulator_timbangan --port 4001
+
+Mengukur latensi frame -> SQLite tanpa hardware (simulator + daemon dalam satu proses):
+
+    python -m utils.simulator_timbangan --ukur 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from utils.database import get_pool
+from utils.timbangan import Debouncer, PenerbitSqlite, baca_baris_tcp, baca_timbangan, jalankan_daemon
+
+DEFAULT_HZ = 10
+
+
+def format_frame(berat, stabil, overload=False):
+    """Frame gaya A&D: 'ST,GS,+0012340kg\\r\\n'"""
+    status = "OL" if overload else ("ST" if stabil else "US")
+    return f"{status},GS,{'+' if berat >= 0 else '-'}{abs(int(berat)):07d}kg\r\n".encode("ascii")
+
+
+def siklus_kendaraan(berat_target, hz=DEFAULT_HZ, rng=random):
+    """Urutan (berat, stabil, berat_target_atau_None) untuk satu kendaraan: naik, bergoyang, stabil, turun.
+
+    Elemen ketiga berisi berat target pada frame stabil pertama, untuk pengukuran latensi.
+    """
+    frame = []
+    # Timbangan kosong
+    for _ in range(int(1.0 * hz)):
+        frame.append((rng.choice((0, 0, 10, -10)), True, None))
+    # Kendaraan naik ke timbangan (2 detik)
+    naik = int(2.0 * hz)
+    for i in range(naik):
+        frame.append((berat_target * (i + 1) / naik + rng.uniform(-300, 300), False, None))
+    # Bergoyang lalu mereda (1 detik)
+    for i in range(int(1.0 * hz)):
+        frame.append((berat_target + rng.uniform(-150, 150) * (1 - i / hz), False, None))
+    # Stabil (3 detik), resolusi indikator 10 kg
+    target = round(berat_target / 10) * 10
+    for i in range(int(3.0 * hz)):
+        frame.append((target + rng.choice((0, 0, 0, 10, -10)), True, target if i == 0 else None))
+    # Kendaraan turun (1 detik)
+    turun = int(1.0 * hz)
+    for i in range(turun):
+        frame.append((berat_target * (1 - (i + 1) / turun), False, None))
+    return frame
+
+
+async def kirim_frame(writer, jumlah_kendaraan=None, hz=DEFAULT_HZ, saat_stabil=None, rng=random):
+    """Mengirim frame ke satu klien pada `hz` frame per detik"""
+    kendaraan = 0
+    while jumlah_kendaraan is None or kendaraan < jumlah_kendaraan:
+        berat_target = rng.randrange(12000, 42000)
+        for berat, stabil, target in siklus_kendaraan(berat_target, hz, rng):
+            writer.write(format_frame(berat, stabil))
+            await writer.drain()
+            if target is not None and saat_stabil:
+                saat_stabil(target, time.time())
+            await asyncio.sleep(1 / hz)
+        kendaraan += 1
+    # Beri waktu daemon memproses frame terakhir
+    await asyncio.sleep(0.5)
+    writer.close()
+
+
+async def jalankan_server(host, port, hz=DEFAULT_HZ):
+    async def tangani(reader, writer):
+        try:
+            await kirim_frame(writer, hz=hz)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    server = await asyncio.start_server(tangani, host, port)
+    print(f"Simulator indikator di {host}:{port} ({hz} frame/detik)", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+async def ukur_latensi(jumlah_kendaraan, hz=DEFAULT_HZ, durasi_stabil=1.0):
+    """Simulator + daemon + pembaca UI dalam satu event loop, hasil latensi dalam milidetik.
+
+    - frame_ke_publish: frame diterima daemon -> baris SQLite ter-commit
+    - stabil_ke_ui: frame stabil pertama dikirim simulator -> terlihat oleh pembaca
+      (termasuk jeda debounce `durasi_stabil`)
+    """
+    db_path = os.path.join(tempfile.mkdtemp(prefix="timbangan_"), "ukur.db")
+    pool = get_pool(db_path)
+    penerbit = PenerbitSqlite(pool)
+    debouncer = Debouncer(durasi_stabil=durasi_stabil)
+
+    dikirim = {}
+    frame_ke_publish = []
+    stabil_ke_ui = []
+    selesai = asyncio.Event()
+
+    async def tangani(reader, writer):
+        if selesai.is_set():
+            # Daemon menyambung ulang setelah pengukuran selesai
+            writer.close()
+            return
+        await kirim_frame(writer, jumlah_kendaraan, hz, lambda target, t: dikirim.__setitem__(target, t),
+                          rng=random.Random(42))
+        selesai.set()
+
+    server = await asyncio.start_server(tangani, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    def saat_stabil(berat, pembacaan, waktu_publish):
+        frame_ke_publish.append((waktu_publish - pembacaan.waktu) * 1000)
+
+    async def pembaca_ui():
+        # Meniru tombol "Ambil Berat": membaca baris terbaru dari koneksi terpisah
+        terakhir = None
+        while not selesai.is_set():
+            with pool.read() as conn:
+                data = baca_timbangan(conn)
+            if data and data["berat_stabil"] is not None and data["waktu_stabil"] != terakhir:
+                terakhir = data["waktu_stabil"]
+                # Berat stabil bisa berbeda satu resolusi (10 kg) dari target karena median
+                target = min(dikirim, key=lambda t: abs(t - data["berat_stabil"]), default=None)
+                if target is not None and abs(target - data["berat_stabil"]) <= debouncer.toleransi_kg:
+                    stabil_ke_ui.append((time.time() - dikirim.pop(target)) * 1000)
+            await asyncio.sleep(0.005)
+
+    daemon = asyncio.create_task(jalankan_daemon(baca_baris_tcp("127.0.0.1", port), penerbit, debouncer, saat_stabil))
+    async with server:
+        await pembaca_ui()
+    daemon.cancel()
+    pool.close_all()
+
+    def ringkas(nilai):
+        if not nilai:
+            return {"n": 0}
+        urut = sorted(nilai)
+        return {
+            "n": len(urut),
+            "p50_ms": round(statistics.median(urut), 2),
+            "p95_ms": round(urut[min(len(urut) - 1, int(len(urut) * 0.95))], 2),
+            "maks_ms": round(urut[-1], 2),
+        }
+
+    return {
+        "kendaraan": jumlah_kendaraan,
+        "hz": hz,
+        "durasi_stabil_s": durasi_stabil,
+        "frame_ke_publish": ringkas(frame_ke_publish),
+        "stabil_ke_ui": ringkas(stabil_ke_ui),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4001)
+    parser.add_argument("--hz", type=int, default=DEFAULT_HZ, help="frame per detik")
+    parser.add_argument("--ukur", type=int, metavar="N", help="ukur latensi untuk N kendaraan lalu keluar")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.ukur:
+            hasil = asyncio.run(ukur_latensi(args.ukur, args.hz))
+            json.dump(hasil, sys.stdout, indent=2)
+            print()
+        else:
+            asyncio.run(jalankan_server(args.host, args.port, args.hz))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""Jurnal perubahan dan sinkronisasi delta ke server pusat (beberapa jembatan timbang).
+
+Setiap site menyimpan surat_jalan.db sendiri. Trigger mencatat setiap insert,
+update dan delete pada surat_jalan ke jurnal_perubahan (append-only, bernomor
+urut `seq`). Sinkronisasi hanya mengirim slip yang berubah sejak seq terakhir
+yang sudah dikonfirmasi (ack) pusat, dalam batch JSON terkompresi gzip, sehingga
+lalu lintas dan waktu merge sebanding dengan perubahan, bukan total riwayat.
+
+ID slip global adalah "<site_id>-<id lokal>": id lokal AUTOINCREMENT tidak
+pernah dipakai ulang dan site_id dibuat acak sekali per database, sehingga
+slip dari site berbeda tidak pernah bertabrakan di pusat (nomor_do boleh sama).
+
+    python -m utils.cli sync --url http://pusat:8765
+"""
+import gzip
+import json
+import re
+import uuid
+
+from utils import metrik
+from utils.arsip import slip_di_arsip
+from utils.impor import KOLOM_INSERT
+
+VERSI_PROTOKOL = 1
+# Kolom yang dikirim per slip; id lokal selalu di depan
+KOLOM_SINKRON = ["id"] + KOLOM_INSERT
+# Jumlah entri jurnal per batch (satu request HTTP, satu transaksi merge di pusat)
+DEFAULT_MAKS_PERUBAHAN = 5000
+DEFAULT_TIMEOUT = 30
+SITE_ID_RE = re.compile(r"^[A-Za-z0-9_.-]{1,40}$")
+
+
+class SinkronError(Exception):
+    """Batch ditolak pusat, konfigurasi tidak valid, atau jurnal lokal tidak cocok dengan pusat"""
+
+
+def uid_slip(site_id, slip_id):
+    return f"{site_id}-{slip_id}"
+
+
+def ensure_jurnal(conn):
+    """Tabel jurnal perubahan, status sinkronisasi, dan trigger pencatatnya.
+
+    Slip yang sudah ada dicatat sebagai insert, sehingga sinkronisasi pertama
+    mengirim seluruh riwayat site.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jurnal_perubahan (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            slip_id INTEGER NOT NULL,
+            operasi TEXT NOT NULL CHECK (operasi IN ('I', 'U', 'D')),
+            waktu TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sinkron_info (
+            kunci TEXT PRIMARY KEY,
+            nilai TEXT NOT NULL
+        )
+    ''')
+    conn.execute(
+        "INSERT OR IGNORE INTO sinkron_info (kunci, nilai) VALUES ('site_id', ?), ('ack_seq', '0')",
+        (uuid.uuid4().hex[:12],)
+    )
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS surat_jalan_jurnal_ai AFTER INSERT ON surat_jalan BEGIN
+            INSERT INTO jurnal_perubahan (slip_id, operasi) VALUES (NEW.id, 'I');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS surat_jalan_jurnal_au AFTER UPDATE ON surat_jalan BEGIN
+            INSERT INTO jurnal_perubahan (slip_id, operasi) SELECT OLD.id, 'D' WHERE OLD.id <> NEW.id;
+            INSERT INTO jurnal_perubahan (slip_id, operasi) VALUES (NEW.id, 'U');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS surat_jalan_jurnal_ad AFTER DELETE ON surat_jalan BEGIN
+            INSERT INTO jurnal_perubahan (slip_id, operasi) VALUES (OLD.id, 'D');
+        END
+    ''')
+
+    if conn.execute("SELECT 1 FROM jurnal_perubahan LIMIT 1").fetchone() is None:
+        conn.execute("INSERT INTO jurnal_perubahan (slip_id, operasi) SELECT id, 'I' FROM surat_jalan ORDER BY id")
+
+
+def _info(conn, kunci):
+    row = conn.execute("SELECT nilai FROM sinkron_info WHERE kunci = ?", (kunci,)).fetchone()
+    return row[0] if row else None
+
+
+def site_id(conn):
+    return _info(conn, "site_id")
+
+
+def ack_seq(conn):
+    return int(_info(conn, "ack_seq") or 0)
+
+
+def simpan_ack(conn, seq):
+    conn.execute("UPDATE sinkron_info SET nilai = ? WHERE kunci = 'ack_seq'", (str(int(seq)),))
+
+
+def atur_site_id(conn, nilai):
+    """Mengganti site_id acak dengan nama yang mudah dibaca; hanya sebelum sinkronisasi pertama"""
+    if not SITE_ID_RE.match(nilai or ""):
+        raise SinkronError("Site ID hanya boleh berisi huruf, angka, '.', '_' dan '-' (maks. 40 karakter).")
+    if ack_seq(conn) > 0 and nilai != site_id(conn):
+        raise SinkronError("Site ID tidak bisa diganti setelah data dikirim ke pusat.")
+    conn.execute("UPDATE sinkron_info SET nilai = ? WHERE kunci = 'site_id'", (nilai,))
+
+
+def seq_terakhir(conn):
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM jurnal_perubahan").fetchone()[0]
+
+
+def jumlah_tertunda(conn):
+    """Jumlah entri jurnal yang belum dikonfirmasi pusat"""
+    return conn.execute("SELECT COUNT(*) FROM jurnal_perubahan WHERE seq > ?", (ack_seq(conn),)).fetchone()[0]
+
+
+def susun_batch(conn, sejak, maks_perubahan=DEFAULT_MAKS_PERUBAHAN):
+    """Batch delta untuk entri jurnal (sejak, sampai], paling banyak `maks_perubahan` entri.
+
+    Perubahan dipadatkan per slip: slip yang masih ada dikirim dengan isi
+    terkininya (upsert), slip yang operasi terakhirnya delete dikirim sebagai
+    hapus. Slip yang hilang tanpa entri delete sudah dipindah ke arsip (trigger
+    jurnal dilewati saat pengarsipan), sehingga isinya diambil dari arsip dan
+    tetap dikirim sebagai upsert. Mengembalikan None jika tidak ada perubahan.
+    """
+    row = conn.execute(
+        "SELECT seq FROM jurnal_perubahan WHERE seq > ? ORDER BY seq LIMIT 1 OFFSET ?",
+        (sejak, maks_perubahan - 1)
+    ).fetchone()
+    sampai = row[0] if row else conn.execute(
+        "SELECT MAX(seq) FROM jurnal_perubahan WHERE seq > ?", (sejak,)
+    ).fetchone()[0]
+    if sampai is None:
+        return None
+
+    upsert, hapus, terarsip = [], [], []
+    # Dengan MAX(seq), SQLite mengambil `operasi` dari baris entri terakhir setiap slip
+    for baris in conn.execute(f'''
+        SELECT j.slip_id, s.id IS NOT NULL, j.operasi, {", ".join(f"s.{k}" for k in KOLOM_INSERT)}
+        FROM (
+            SELECT slip_id, operasi, MAX(seq) FROM jurnal_perubahan WHERE seq > ? AND seq <= ? GROUP BY slip_id
+        ) j
+        LEFT JOIN surat_jalan s ON s.id = j.slip_id
+        ORDER BY j.slip_id
+    ''', (sejak, sampai)):
+        if baris[1]:
+            upsert.append([baris[0], *baris[3:]])
+        elif baris[2] == "D":
+            hapus.append(baris[0])
+        else:
+            terarsip.append(baris[0])
+    if terarsip:
+        dari_arsip = slip_di_arsip(conn, terarsip)
+        hilang = [slip_id for slip_id in terarsip if slip_id not in dari_arsip]
+        if hilang:
+            raise SinkronError(
+                f"Slip {', '.join(map(str, hilang[:10]))} tidak ada di database utama maupun arsip; "
+                "batch tidak dikirim agar pusat tidak menghapusnya."
+            )
+        upsert.extend([slip_id, *dari_arsip[slip_id]] for slip_id in terarsip)
+        upsert.sort(key=lambda slip: slip[0])
+    return {
+        "versi": VERSI_PROTOKOL,
+        "site": site_id(conn),
+        "dari_seq": sejak,
+        "sampai_seq": sampai,
+        "kolom": KOLOM_SINKRON,
+        "upsert": upsert,
+        "hapus": hapus,
+    }
+
+
+def kodekan_batch(batch):
+    return gzip.compress(json.dumps(batch, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), compresslevel=6)
+
+
+def dekodekan_batch(isi):
+    """Kebalikan kodekan_batch, dengan validasi struktur dasar"""
+    try:
+        batch = json.loads(gzip.decompress(isi))
+    except (OSError, EOFError, ValueError) as e:
+        raise SinkronError(f"Batch tidak bisa dibaca: {e}")
+    if not isinstance(batch, dict) or batch.get("versi") != VERSI_PROTOKOL:
+        raise SinkronError("Versi protokol sinkronisasi tidak didukung.")
+    if batch.get("kolom") != KOLOM_SINKRON:
+        raise SinkronError("Susunan kolom batch tidak sesuai dengan pusat.")
+    if not SITE_ID_RE.match(str(batch.get("site") or "")):
+        raise SinkronError("Site ID batch tidak valid.")
+    for kunci in ("dari_seq", "sampai_seq"):
+        if not isinstance(batch.get(kunci), int):
+            raise SinkronError(f"'{kunci}' batch tidak valid.")
+    upsert, hapus = batch.get("upsert"), batch.get("hapus")
+    if not isinstance(upsert, list) or not isinstance(hapus, list) \
+            or any(not isinstance(b, list) or len(b) != len(KOLOM_SINKRON) or not isinstance(b[0], int) for b in upsert) \
+            or any(not isinstance(slip_id, int) for slip_id in hapus):
+        raise SinkronError("Isi upsert / hapus batch tidak valid.")
+    return batch
+
+
+class KlienPusat:
+    """Klien HTTP ke server pusat (lihat utils.sinkron_pusat), satu requests.Session per klien"""
+
+    def __init__(self, url, token="", timeout=DEFAULT_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self._session = None
+
+    @property
+    def session(self):
+        # requests baru dimuat saat sinkronisasi pertama, bukan saat aplikasi start
+        if self._session is None:
+            import requests
+
+            self._session = requests.Session()
+            if self.token:
+                self._session.headers["Authorization"] = f"Bearer {self.token}"
+        return self._session
+
+    def _request(self, metode, path, nama_span, **kwargs):
+        import requests
+
+        try:
+            with metrik.span("http", nama_span):
+                return self.session.request(metode, f"{self.url}{path}", timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise SinkronError(f"Server pusat tidak bisa dihubungi: {e}")
+
+    def _json(self, response):
+        try:
+            isi = response.json()
+        except ValueError:
+            isi = {}
+        if response.status_code not in (200, 409):
+            raise SinkronError(f"Pusat menolak permintaan (HTTP {response.status_code}): {isi.get('error', response.text[:200])}")
+        return response.status_code, isi
+
+    def status(self, site):
+        """Seq terakhir dari `site` yang sudah tergabung di pusat"""
+        _, isi = self._json(self._request("GET", "/sinkron/status", "sinkron_status", params={"site": site}))
+        return int(isi["ack_seq"])
+
+    def kirim(self, isi_batch):
+        """Mengirim batch terkompresi; mengembalikan (diterima, ack_seq pusat, info)"""
+        kode, isi = self._json(self._request(
+            "POST", "/sinkron/batch", "sinkron_batch", data=isi_batch,
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        ))
+        return kode == 200, int(isi["ack_seq"]), isi
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+def sinkronkan(pool, klien, maks_perubahan=DEFAULT_MAKS_PERUBAHAN, progress_callback=None):
+    """Mengirim semua perubahan yang belum dikonfirmasi pusat, batch demi batch.
+
+    Titik awal diambil dari pusat (bukan hanya ack lokal), sehingga batch yang
+    hilang karena koneksi putus atau pusat dipulihkan dari backup dikirim ulang.
+    Mengembalikan ringkasan {'batch', 'slip', 'hapus', 'byte', 'ack_seq'}.
+    """
+    with pool.read() as conn:
+        site, terakhir = site_id(conn), seq_terakhir(conn)
+    ack = klien.status(site)
+    if ack > terakhir:
+        raise SinkronError(
+            f"Pusat sudah menerima seq {ack} dari site '{site}', padahal jurnal lokal baru sampai {terakhir} "
+            "(database dipulihkan dari backup?). Ganti site ID sebelum sinkronisasi."
+        )
+
+    hasil = {"batch": 0, "slip": 0, "hapus": 0, "byte": 0, "ack_seq": ack}
+    while True:
+        with pool.read() as conn:
+            batch = susun_batch(conn, ack, maks_perubahan)
+        if batch is None:
+            break
+        isi = kodekan_batch(batch)
+        diterima, ack_pusat, info = klien.kirim(isi)
+        if not diterima:
+            if ack_pusat >= ack:
+                raise SinkronError(info.get("error") or "Batch ditolak pusat.")
+            # Pusat tertinggal dari titik awal batch (mis. dipulihkan di tengah sinkronisasi): ulangi dari ack pusat
+            ack = ack_pusat
+            continue
+        ack = ack_pusat
+        with pool.write() as conn:
+            simpan_ack(conn, ack)
+        hasil["batch"] += 1
+        hasil["slip"] += len(batch["upsert"])
+        hasil["hapus"] += len(batch["hapus"])
+        hasil["byte"] += len(isi)
+        if progress_callback:
+            progress_callback(hasil)
+    hasil["ack_seq"] = ack
+    # ack lokal disamakan dengan pusat juga saat tidak ada yang dikirim (mis. pusat tertinggal lalu menyusul)
+    with pool.write() as conn:
+        if ack_seq(conn) != ack:
+            simpan_ack(conn, ack)
+    return hasil
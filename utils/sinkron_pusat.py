@@ -0,0 +1,178 @@
+"""Server pusat sederhana untuk sinkronisasi delta antar site (pengganti server pusat saat uji / instalasi kecil).
+
+Menerima batch dari utils.sinkron dan menggabungkannya ke satu database
+konsolidasi. Setiap batch diterapkan dalam satu transaksi bersama ack per site,
+sehingga batch yang terkirim ulang tidak menggandakan data.
+
+    python -m utils.sinkron_pusat --db pusat.db --port 8765 --token RAHASIA
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from utils.database import get_pool
+from utils.impor import KOLOM_INSERT
+from utils.sinkron import SITE_ID_RE, SinkronError, dekodekan_batch, uid_slip
+
+DEFAULT_PORT = 8765
+# Batas ukuran batch terkompresi yang diterima
+MAKS_BYTE_BATCH = 64 * 1024 * 1024
+
+_UPSERT_SQL = (
+    f"INSERT INTO slip_pusat (uid, site, slip_id, {', '.join(KOLOM_INSERT)}, diterima_pada) "
+    f"VALUES (?, ?, ?, {', '.join('?' for _ in KOLOM_INSERT)}, ?) "
+    f"ON CONFLICT (uid) DO UPDATE SET "
+    f"{', '.join(f'{k} = excluded.{k}' for k in KOLOM_INSERT)}, diterima_pada = excluded.diterima_pada"
+)
+
+
+def ensure_pusat(conn):
+    """Tabel konsolidasi (satu baris per slip global) dan posisi ack per site"""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS slip_pusat (
+            uid TEXT PRIMARY KEY,
+            site TEXT NOT NULL,
+            slip_id INTEGER NOT NULL,
+            {", ".join(f"{k} {'REAL' if k in ('bruto', 'tara', 'netto') else 'TEXT'}" for k in KOLOM_INSERT)},
+            diterima_pada TEXT NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_slip_pusat_tanggal ON slip_pusat (tanggal_input)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_slip_pusat_site ON slip_pusat (site, slip_id)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS site_sinkron (
+            site TEXT PRIMARY KEY,
+            ack_seq INTEGER NOT NULL DEFAULT 0,
+            jumlah_batch INTEGER NOT NULL DEFAULT 0,
+            terakhir_pada TEXT
+        )
+    ''')
+
+
+def ack_site(conn, site):
+    row = conn.execute("SELECT ack_seq FROM site_sinkron WHERE site = ?", (site,)).fetchone()
+    return row[0] if row else 0
+
+
+def terapkan_batch(conn, batch):
+    """Menggabungkan satu batch ke slip_pusat di dalam transaksi `conn`. Mengembalikan ack_seq baru.
+
+    Batch yang seluruhnya sudah diterapkan diabaikan. Batch yang dimulai setelah
+    ack site (ada celah) ditolak dengan SinkronError; site lalu mengirim ulang
+    dari ack pusat.
+    """
+    site = batch["site"]
+    ack = ack_site(conn, site)
+    if batch["sampai_seq"] <= ack:
+        return ack
+    if batch["dari_seq"] > ack:
+        raise SinkronError(f"Ada celah jurnal: pusat baru menerima seq {ack}, batch dimulai dari {batch['dari_seq']}.")
+
+    # Upsert berbasis isi terkini slip bersifat idempoten, jadi tumpang tindih dengan batch sebelumnya aman
+    waktu = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn.executemany(_UPSERT_SQL, (
+        (uid_slip(site, baris[0]), site, *baris, waktu) for baris in batch["upsert"]
+    ))
+    conn.executemany("DELETE FROM slip_pusat WHERE uid = ?", ((uid_slip(site, slip_id),) for slip_id in batch["hapus"]))
+    conn.execute('''
+        INSERT INTO site_sinkron (site, ack_seq, jumlah_batch, terakhir_pada) VALUES (?, ?, 1, ?)
+        ON CONFLICT (site) DO UPDATE SET
+            ack_seq = excluded.ack_seq, jumlah_batch = jumlah_batch + 1, terakhir_pada = excluded.terakhir_pada
+    ''', (site, batch["sampai_seq"], waktu))
+    return batch["sampai_seq"]
+
+
+def buat_handler(pool, token=""):
+    class Handler(BaseHTTPRequestHandler):
+        def _balas(self, kode, isi):
+            body = json.dumps(isi).encode("utf-8")
+            self.send_response(kode)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _izin(self):
+            if token and self.headers.get("Authorization") != f"Bearer {token}":
+                self._balas(401, {"error": "Token tidak valid."})
+                return False
+            return True
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/sinkron/status":
+                return self._balas(404, {"error": "Tidak ditemukan."})
+            if not self._izin():
+                return
+            site = parse_qs(url.query).get("site", [""])[0]
+            if not SITE_ID_RE.match(site):
+                return self._balas(400, {"error": "Site ID tidak valid."})
+            with pool.read() as conn:
+                self._balas(200, {"site": site, "ack_seq": ack_site(conn, site)})
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/sinkron/batch":
+                return self._balas(404, {"error": "Tidak ditemukan."})
+            if not self._izin():
+                return
+            panjang = int(self.headers.get("Content-Length") or 0)
+            if panjang <= 0 or panjang > MAKS_BYTE_BATCH:
+                return self._balas(413 if panjang else 400, {"error": "Ukuran batch tidak valid."})
+            try:
+                batch = dekodekan_batch(self.rfile.read(panjang))
+            except SinkronError as e:
+                return self._balas(400, {"error": str(e)})
+
+            mulai = time.perf_counter()
+            try:
+                with pool.write() as conn:
+                    ack = terapkan_batch(conn, batch)
+            except SinkronError as e:
+                with pool.read() as conn:
+                    return self._balas(409, {"error": str(e), "ack_seq": ack_site(conn, batch["site"])})
+            self._balas(200, {
+                "ack_seq": ack,
+                "upsert": len(batch["upsert"]),
+                "hapus": len(batch["hapus"]),
+                "merge_ms": round((time.perf_counter() - mulai) * 1000, 3),
+            })
+
+        def log_message(self, format, *args):
+            sys.stderr.write(f"[{self.log_date_time_string()}] {format % args}\n")
+
+    return Handler
+
+
+def buat_server(db_path, host="127.0.0.1", port=DEFAULT_PORT, token=""):
+    """ThreadingHTTPServer siap pakai (port=0 memilih port bebas, berguna untuk uji)"""
+    pool = get_pool(db_path)
+    with pool.write() as conn:
+        ensure_pusat(conn)
+    return ThreadingHTTPServer((host, port), buat_handler(pool, token))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default="pusat.db", help="database konsolidasi")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--token", default="", help="jika diisi, site wajib mengirim header Authorization: Bearer <token>")
+    args = parser.parse_args(argv)
+
+    server = buat_server(args.db, args.host, args.port, args.token)
+    print(f"Server pusat mendengarkan di http://{args.host}:{server.server_address[1]} (database {args.db})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        get_pool(args.db).close_all()
+
+
+if __name__ == "__main__":
+    main()
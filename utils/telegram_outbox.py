@@ -0,0 +1,252 @@
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from utils.metrik import span
+
+DEFAULT_API_URL = "https://api.telegram.org"
+
+STATUS_PENDING = "pending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+
+def ensure_outbox(conn):
+    """Membuat tabel antrean pesan Telegram (outbox)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS telegram_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id TEXT NOT NULL,
+            text TEXT NOT NULL,
+            parse_mode TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TEXT NOT NULL,
+            sent_at TEXT
+        )
+    ''')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_telegram_outbox_status ON telegram_outbox(status, next_attempt_at)"
+    )
+
+
+def ensure_outbox_dokumen(conn):
+    """Menambahkan kolom lampiran dokumen (sendDocument) pada outbox versi lama"""
+    existing_columns = [col[1] for col in conn.execute("PRAGMA table_info(telegram_outbox)").fetchall()]
+    for col_name, col_type in (("document", "BLOB"), ("document_name", "TEXT")):
+        if col_name not in existing_columns:
+            conn.execute(f"ALTER TABLE telegram_outbox ADD COLUMN {col_name} {col_type}")
+
+
+def enqueue_message(conn, chat_id, text, parse_mode="HTML"):
+    """Memasukkan pesan ke outbox. Panggil di dalam transaksi yang sama dengan data yang dilaporkan."""
+    cur = conn.execute(
+        "INSERT INTO telegram_outbox (chat_id, text, parse_mode, created_at) VALUES (?, ?, ?, ?)",
+        (str(chat_id), text, parse_mode, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    )
+    return cur.lastrowid
+
+
+def enqueue_document(conn, chat_id, filename, data, caption="", parse_mode="HTML"):
+    """Memasukkan dokumen (mis. CSV laporan) ke outbox; `caption` maksimal 1024 karakter"""
+    cur = conn.execute(
+        "INSERT INTO telegram_outbox (chat_id, text, parse_mode, document, document_name, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (str(chat_id), caption, parse_mode, sqlite3.Binary(data), filename,
+         datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    )
+    return cur.lastrowid
+
+
+def outbox_stats(conn):
+    """Jumlah pesan per status"""
+    rows = conn.execute("SELECT status, COUNT(*) FROM telegram_outbox GROUP BY status").fetchall()
+    stats = {STATUS_PENDING: 0, STATUS_SENT: 0, STATUS_FAILED: 0}
+    stats.update(dict(rows))
+    return stats
+
+
+class OutboxWorker(threading.Thread):
+    """Thread background yang mengirim isi outbox ke Telegram.
+
+    Memakai satu requests.Session (koneksi HTTP di-pool), timeout per request,
+    exponential backoff dengan jitter untuk error jaringan / 5xx, dan
+    menghormati `retry_after` dari respons 429 Telegram.
+    """
+
+    def __init__(self, pool, token, api_url=DEFAULT_API_URL, timeout=10, max_attempts=8,
+                 base_delay=2.0, max_delay=600.0, min_interval=1.0, poll_interval=30.0,
+                 batch_size=20, simpan_terkirim_hari=7):
+        super().__init__(name="telegram-outbox", daemon=True)
+        self.pool = pool
+        self.token = token
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_interval = min_interval
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.simpan_terkirim_hari = simpan_terkirim_hari
+
+        self._session = None
+
+        self._wake = threading.Event()
+        self._berhenti = threading.Event()
+        self._paused_until = 0.0
+        self._last_sent_at = 0.0
+        self._last_cleanup = 0.0
+
+    @property
+    def session(self):
+        # requests dimuat saat pengiriman pertama (di thread worker), bukan saat aplikasi start
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+            self._session = session
+        return self._session
+
+    def wake(self):
+        """Bangunkan worker segera (mis. setelah pesan baru dimasukkan)"""
+        self._wake.set()
+
+    def stop(self):
+        self._berhenti.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._berhenti.is_set():
+            try:
+                delay = self.drain()
+                self._cleanup()
+            except Exception as e:
+                print(f"Error outbox Telegram: {e}")
+                delay = self.poll_interval
+            self._wake.wait(timeout=delay)
+            self._wake.clear()
+
+    def drain(self):
+        """Mengirim semua pesan yang sudah jatuh tempo. Mengembalikan detik tunggu berikutnya."""
+        while not self._berhenti.is_set():
+            now = time.time()
+            if now < self._paused_until:
+                return self._paused_until - now
+
+            with self.pool.read() as conn:
+                batch = conn.execute(
+                    "SELECT id, chat_id, text, parse_mode, attempts, document, document_name FROM telegram_outbox "
+                    "WHERE status = ? AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                    (STATUS_PENDING, now, self.batch_size)
+                ).fetchall()
+                next_due = conn.execute(
+                    "SELECT MIN(next_attempt_at) FROM telegram_outbox WHERE status = ?",
+                    (STATUS_PENDING,)
+                ).fetchone()[0]
+
+            if not batch:
+                if next_due is None:
+                    return self.poll_interval
+                return min(self.poll_interval, max(0.0, next_due - now))
+
+            for message in batch:
+                if self._berhenti.is_set() or time.time() < self._paused_until:
+                    break
+                self._send(*message)
+        return 0.0
+
+    def _send(self, message_id, chat_id, text, parse_mode, attempts, document=None, document_name=None):
+        # Batasi laju agar tidak terkena limit Telegram (±1 pesan/detik per chat)
+        jeda = self._last_sent_at + self.min_interval - time.time()
+        if jeda > 0:
+            time.sleep(jeda)
+
+        if document is not None:
+            payload = {"chat_id": chat_id}
+            if text:
+                payload["caption"] = text
+        else:
+            payload = {"chat_id": chat_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+
+        import requests
+
+        error = None
+        retry_after = None
+        permanent = False
+        try:
+            if document is not None:
+                with span("http", "telegram_sendDocument"):
+                    response = self.session.post(
+                        f"{self.api_url}/bot{self.token}/sendDocument", data=payload,
+                        files={"document": (document_name or "dokumen", bytes(document))}, timeout=self.timeout
+                    )
+            else:
+                with span("http", "telegram_sendMessage"):
+                    response = self.session.post(
+                        f"{self.api_url}/bot{self.token}/sendMessage", json=payload, timeout=self.timeout
+                    )
+            self._last_sent_at = time.time()
+            if response.status_code == 200:
+                self._mark_sent(message_id)
+                return True
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            if response.status_code == 429:
+                try:
+                    retry_after = float(response.json().get("parameters", {}).get("retry_after", 0))
+                except ValueError:
+                    retry_after = None
+                retry_after = retry_after or self.base_delay
+                self._paused_until = time.time() + retry_after
+            elif 400 <= response.status_code < 500:
+                # Pesan ditolak (mis. HTML tidak valid, chat tidak ditemukan): tidak dicoba ulang
+                permanent = True
+        except requests.RequestException as e:
+            error = str(e)
+
+        attempts += 1
+        if permanent or attempts >= self.max_attempts:
+            self._mark_retry(message_id, attempts, error, STATUS_FAILED, 0)
+        else:
+            if retry_after is not None:
+                delay = retry_after
+            else:
+                delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+                delay *= random.uniform(0.8, 1.2)
+            self._mark_retry(message_id, attempts, error, STATUS_PENDING, time.time() + delay)
+        return False
+
+    def _mark_sent(self, message_id):
+        with self.pool.write() as conn:
+            conn.execute(
+                "UPDATE telegram_outbox SET status = ?, attempts = attempts + 1, sent_at = ?, last_error = NULL, "
+                "document = NULL WHERE id = ?",
+                (STATUS_SENT, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), message_id)
+            )
+
+    def _mark_retry(self, message_id, attempts, error, status, next_attempt_at):
+        with self.pool.write() as conn:
+            conn.execute(
+                "UPDATE telegram_outbox SET status = ?, attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                (status, attempts, error, next_attempt_at, message_id)
+            )
+
+    def _cleanup(self):
+        # Hapus pesan terkirim yang sudah lama, paling sering sekali per jam
+        if time.time() - self._last_cleanup < 3600:
+            return
+        self._last_cleanup = time.time()
+        with self.pool.write() as conn:
+            conn.execute(
+                "DELETE FROM telegram_outbox WHERE status = ? AND sent_at < datetime('now', 'localtime', ?)",
+                (STATUS_SENT, f"-{int(self.simpan_terkirim_hari)} days")
+            )
@@ -0,0 +1,212 @@
+from datetime import datetime
+
+import pandas as pd
+
+from utils.master_data import catat_master, kanonikkan, normalisasi_nopol
+
+
+class TiketError(Exception):
+    pass
+
+
+def normalisasi_nopol_sql(kolom):
+    """Padanan SQL dari normalisasi_nopol untuk dipakai di trigger / backfill"""
+    ekspresi = f"upper(COALESCE({kolom}, ''))"
+    for ch in (" ", "-", ".", "/", "_", ","):
+        ekspresi = f"replace({ekspresi}, '{ch}', '')"
+    return ekspresi
+
+
+def ensure_tiket(conn):
+    """Tabel tiket terbuka (timbang masuk) dan registri tara kendaraan beserta triggernya.
+
+    Keduanya dikunci pada nomor polisi baku (PRIMARY KEY), sehingga pencarian
+    tiket terbuka dan tara tersimpan tidak pernah memindai surat_jalan.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tiket_terbuka (
+            nopol_baku TEXT PRIMARY KEY,
+            nomor_polisi TEXT NOT NULL,
+            nomor_do TEXT,
+            nama_sopir TEXT,
+            nama_barang TEXT,
+            po_do TEXT,
+            transport TEXT,
+            tanggal_masuk TEXT NOT NULL,
+            jam_masuk TEXT NOT NULL,
+            berat_masuk REAL NOT NULL,
+            nama_ditimbang TEXT,
+            dibuat_pada TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tara_kendaraan (
+            nopol_baku TEXT PRIMARY KEY,
+            nomor_polisi TEXT NOT NULL,
+            tara REAL NOT NULL,
+            jumlah_timbang INTEGER NOT NULL DEFAULT 1,
+            terakhir_pada TEXT
+        )
+    ''')
+
+    nopol_baru = normalisasi_nopol_sql("NEW.nomor_polisi")
+
+    def upsert_tara(tambah):
+        return f'''
+        INSERT INTO tara_kendaraan (nopol_baku, nomor_polisi, tara, jumlah_timbang, terakhir_pada)
+        VALUES ({nopol_baru}, NEW.nomor_polisi, NEW.tara, 1, NEW.tanggal_input)
+        ON CONFLICT (nopol_baku) DO UPDATE SET
+            nomor_polisi = excluded.nomor_polisi,
+            tara = excluded.tara,
+            jumlah_timbang = jumlah_timbang + {tambah},
+            terakhir_pada = excluded.terakhir_pada
+        WHERE excluded.terakhir_pada >= COALESCE(terakhir_pada, '');
+    '''
+
+    # Tara tersimpan mengikuti slip selesai terbaru per kendaraan; edit slip tidak menambah hitungan
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS surat_jalan_tara_ai AFTER INSERT ON surat_jalan
+        WHEN NEW.tara > 0 AND {nopol_baru} != '' BEGIN
+            {upsert_tara(1)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS surat_jalan_tara_au AFTER UPDATE OF tara, nomor_polisi ON surat_jalan
+        WHEN NEW.tara > 0 AND {nopol_baru} != '' BEGIN
+            {upsert_tara(0)}
+        END
+    ''')
+
+    # Isi awal dari riwayat: tara slip terbaru untuk setiap kendaraan
+    nopol = normalisasi_nopol_sql("nomor_polisi")
+    conn.execute(f'''
+        INSERT OR IGNORE INTO tara_kendaraan (nopol_baku, nomor_polisi, tara, jumlah_timbang, terakhir_pada)
+        SELECT {nopol}, nomor_polisi, tara, jumlah, terakhir FROM (
+            SELECT nomor_polisi, tara, COUNT(*) OVER (PARTITION BY {nopol}) AS jumlah,
+                   tanggal_input AS terakhir,
+                   ROW_NUMBER() OVER (PARTITION BY {nopol} ORDER BY tanggal_input DESC, id DESC) AS urutan
+            FROM surat_jalan WHERE tara > 0
+        ) WHERE urutan = 1 AND {nopol} != ''
+    ''')
+
+
+def get_tara_tersimpan(conn, nopol):
+    """Tara terakhir kendaraan dari registri, atau None"""
+    row = conn.execute(
+        "SELECT nomor_polisi, tara, jumlah_timbang, terakhir_pada FROM tara_kendaraan WHERE nopol_baku = ?",
+        (normalisasi_nopol(nopol),)
+    ).fetchone()
+    if row is None:
+        return None
+    return {"nomor_polisi": row[0], "tara": row[1], "jumlah_timbang": row[2], "terakhir_pada": row[3]}
+
+
+def cari_tiket_terbuka(conn, nopol):
+    """Tiket timbang-masuk yang belum ditutup untuk kendaraan ini, atau None"""
+    cursor = conn.execute("SELECT * FROM tiket_terbuka WHERE nopol_baku = ?", (normalisasi_nopol(nopol),))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip([col[0] for col in cursor.description], row))
+
+
+def daftar_tiket_terbuka(conn):
+    """Semua tiket terbuka (kendaraan yang sedang di dalam lokasi), terlama dulu"""
+    return pd.read_sql_query(
+        "SELECT nomor_polisi, nama_sopir, nama_barang, transport, tanggal_masuk, jam_masuk, berat_masuk "
+        "FROM tiket_terbuka ORDER BY dibuat_pada", conn
+    )
+
+
+def buka_tiket(conn, nomor_polisi, berat_masuk, nama_sopir="", nama_barang="", po_do="", transport="",
+               nama_ditimbang="", nomor_do=None, waktu=None):
+    """Timbang pertama: membuat tiket terbuka. Gagal jika kendaraan masih punya tiket terbuka."""
+    nopol_baku = normalisasi_nopol(nomor_polisi)
+    if not nopol_baku:
+        raise TiketError("Nomor Polisi wajib diisi")
+    if berat_masuk <= 0:
+        raise TiketError("Berat timbang masuk harus lebih dari 0")
+    if cari_tiket_terbuka(conn, nopol_baku):
+        raise TiketError(f"Kendaraan {nomor_polisi} masih memiliki tiket terbuka")
+
+    waktu = waktu or datetime.now()
+    # Ejaan baku dari master data agar slip akhirnya tidak menambah varian baru
+    baku = kanonikkan(conn, {
+        "nomor_polisi": nomor_polisi, "nama_sopir": nama_sopir, "nama_barang": nama_barang,
+        "po_do": po_do, "transport": transport,
+    })
+    conn.execute('''
+        INSERT INTO tiket_terbuka (
+            nopol_baku, nomor_polisi, nomor_do, nama_sopir, nama_barang, po_do, transport,
+            tanggal_masuk, jam_masuk, berat_masuk, nama_ditimbang, dibuat_pada
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        nopol_baku, baku["nomor_polisi"], nomor_do or f"{waktu.strftime('%d%m%Y')}-{waktu.strftime('%H%M')}",
+        baku["nama_sopir"], baku["nama_barang"], baku["po_do"], baku["transport"],
+        waktu.strftime("%Y-%m-%d"), waktu.strftime("%H:%M"), float(berat_masuk), nama_ditimbang,
+        waktu.strftime("%Y-%m-%d %H:%M:%S")
+    ))
+    return nopol_baku
+
+
+def tutup_tiket(conn, nomor_polisi, berat_keluar, nama_diterima="", waktu=None):
+    """Timbang kedua: menutup tiket terbuka menjadi slip surat_jalan.
+
+    Bruto adalah timbangan yang lebih berat dan tara yang lebih ringan, sehingga
+    kendaraan bongkar (masuk penuh) maupun muat (masuk kosong) sama-sama benar.
+    Jalankan di dalam satu transaksi tulis. Mengembalikan dict slip yang disimpan.
+    """
+    tiket = cari_tiket_terbuka(conn, nomor_polisi)
+    if tiket is None:
+        raise TiketError(f"Tidak ada tiket terbuka untuk {nomor_polisi}")
+    if berat_keluar <= 0:
+        raise TiketError("Berat timbang keluar harus lebih dari 0")
+
+    bruto = max(tiket["berat_masuk"], float(berat_keluar))
+    tara = min(tiket["berat_masuk"], float(berat_keluar))
+    if bruto <= tara:
+        raise TiketError("Bruto harus lebih besar dari Tara")
+
+    waktu = waktu or datetime.now()
+    slip = {
+        "tanggal_masuk": tiket["tanggal_masuk"],
+        "jam_masuk": tiket["jam_masuk"],
+        "tanggal_keluar": waktu.strftime("%Y-%m-%d"),
+        "jam_keluar": waktu.strftime("%H:%M"),
+        "nomor_do": tiket["nomor_do"],
+        "nomor_polisi": tiket["nomor_polisi"],
+        "nama_sopir": tiket["nama_sopir"],
+        "nama_barang": tiket["nama_barang"],
+        "po_do": tiket["po_do"],
+        "transport": tiket["transport"],
+        "bruto": bruto,
+        "tara": tara,
+        "netto": bruto - tara,
+        "tanggal_input": waktu.strftime("%Y-%m-%d %H:%M:%S"),
+        "nama_ditimbang": tiket["nama_ditimbang"],
+        "nama_diterima": nama_diterima,
+        "nama_diketahui": "",
+    }
+    cursor = conn.execute(
+        f"INSERT INTO surat_jalan ({', '.join(slip)}) VALUES ({', '.join('?' for _ in slip)})",
+        list(slip.values())
+    )
+    conn.execute("DELETE FROM tiket_terbuka WHERE nopol_baku = ?", (tiket["nopol_baku"],))
+    catat_master(conn, slip, slip["tanggal_input"])
+    slip["id"] = cursor.lastrowid
+    return slip
+
+
+def tutup_dengan_tara_tersimpan(conn, nomor_polisi, nama_diterima="", waktu=None):
+    """Menutup tiket terbuka memakai tara dari registri (kendaraan langganan tidak perlu timbang ulang)"""
+    tara = get_tara_tersimpan(conn, nomor_polisi)
+    if tara is None:
+        raise TiketError(f"Belum ada tara tersimpan untuk {nomor_polisi}")
+    return tutup_tiket(conn, nomor_polisi, tara["tara"], nama_diterima=nama_diterima, waktu=waktu)
+
+
+def batalkan_tiket(conn, nomor_polisi):
+    """Menghapus tiket terbuka (mis. kendaraan batal masuk)"""
+    return conn.execute(
+        "DELETE FROM tiket_terbuka WHERE nopol_baku = ?", (normalisasi_nopol(nomor_polisi),)
+    ).rowcount
@@ -0,0 +1,276 @@
+"""Daemon pembaca indikator timbangan (serial / TCP) yang menerbitkan berat terbaru ke SQLite.
+
+Contoh pemakaian:
+
+    python -m utils.timbangan --tcp 192.168.1.50:4001
+    python -m utils.timbangan --serial COM3 --baud 9600
+
+Berat stabil ditulis ke tabel pembacaan_timbangan di file SQLite tersendiri
+(TIMBANGAN_DB_PATH), bukan di database surat jalan, agar publish beberapa kali
+per detik tidak menaikkan PRAGMA data_version database utama (yang dipakai
+sebagai kunci cache di UI). Form input membacanya dengan satu klik
+("Ambil sebagai Bruto / Tara").
+"""
+import argparse
+import asyncio
+import re
+import statistics
+import sys
+import time
+from collections import deque
+from typing import NamedTuple
+
+from utils.database import get_pool
+
+DEFAULT_INDIKATOR = "utama"
+# Database khusus pembacaan live; terpisah dari DB_PATH
+TIMBANGAN_DB_PATH = "timbangan_live.db"
+
+# Format umum indikator (A&D, Avery, Cheetah, dsb.): "ST,GS,+  12340kg"
+# ST = stabil, US = belum stabil, OL = overload; GS = gross, NT = net
+FRAME_RE = re.compile(
+    rb"(?P<status>ST|US|OL)\s*,\s*(?P<mode>GS|NT|TR)\s*,\s*(?P<berat>[+-]?\s*\d+(?:\.\d+)?)\s*(?P<satuan>kg|t)?",
+    re.IGNORECASE,
+)
+# Indikator sederhana yang hanya mengirim angka, mis. "+0012340" atau "=0012340"
+ANGKA_RE = re.compile(rb"^[=+\-\s]*(?P<berat>\d+(?:\.\d+)?)\s*(?P<satuan>kg|t)?\s*$", re.IGNORECASE)
+
+
+class Pembacaan(NamedTuple):
+    berat: float
+    stabil: bool  # status dari indikator; None jika indikator tidak mengirim status
+    overload: bool
+    waktu: float
+
+
+def parse_frame(line, waktu=None):
+    """Mengubah satu baris ASCII dari indikator menjadi Pembacaan, atau None jika tidak dikenali"""
+    waktu = time.time() if waktu is None else waktu
+    line = line.strip()
+    m = FRAME_RE.search(line)
+    if m:
+        berat = float(m.group("berat").replace(b" ", b""))
+        if (m.group("satuan") or b"").lower() == b"t":
+            berat *= 1000
+        status = m.group("status").upper()
+        return Pembacaan(berat, status == b"ST", status == b"OL", waktu)
+    m = ANGKA_RE.match(line)
+    if m:
+        berat = float(m.group("berat"))
+        if line.startswith(b"-"):
+            berat = -berat
+        if (m.group("satuan") or b"").lower() == b"t":
+            berat *= 1000
+        return Pembacaan(berat, None, False, waktu)
+    return None
+
+
+class Debouncer:
+    """Menentukan kapan berat dianggap stabil.
+
+    Berat stabil jika indikator melaporkan ST (atau tidak mengirim status), dan
+    semua pembacaan selama `durasi_stabil` detik terakhir berada dalam
+    `toleransi_kg`. Mengembalikan berat stabil baru hanya sekali per kendaraan
+    (atau jika berat berubah melebihi toleransi), bukan untuk setiap frame.
+    """
+
+    def __init__(self, toleransi_kg=20.0, durasi_stabil=1.0, min_sampel=3, berat_minimum=100.0):
+        self.toleransi_kg = toleransi_kg
+        self.durasi_stabil = durasi_stabil
+        self.min_sampel = min_sampel
+        self.berat_minimum = berat_minimum
+        self._jendela = deque()
+        self._terakhir_stabil = None
+
+    def tambah(self, pembacaan):
+        # Berat bergeser dari nilai stabil terakhir (kendaraan turun/naik): boleh terbit lagi
+        if self._terakhir_stabil is not None and abs(pembacaan.berat - self._terakhir_stabil) > self.toleransi_kg:
+            self._terakhir_stabil = None
+        if pembacaan.overload or pembacaan.stabil is False:
+            self._jendela.clear()
+            return None
+        self._jendela.append((pembacaan.waktu, pembacaan.berat))
+        while self._jendela and pembacaan.waktu - self._jendela[0][0] > self.durasi_stabil:
+            self._jendela.popleft()
+
+        berat = [b for _, b in self._jendela]
+        if len(berat) < self.min_sampel or max(berat) - min(berat) > self.toleransi_kg:
+            return None
+        if pembacaan.waktu - self._jendela[0][0] < self.durasi_stabil * 0.9:
+            return None
+
+        nilai = round(statistics.median(berat))
+        if nilai < self.berat_minimum or self._terakhir_stabil is not None:
+            # Timbangan kosong, atau berat ini sudah diterbitkan
+            return None
+        self._terakhir_stabil = nilai
+        return nilai
+
+
+def ensure_timbangan(conn):
+    """Tabel berat terbaru per indikator (satu baris per indikator, di-upsert oleh daemon)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pembacaan_timbangan (
+            indikator TEXT PRIMARY KEY,
+            berat REAL,
+            stabil INTEGER,
+            waktu_frame REAL,
+            berat_stabil REAL,
+            waktu_stabil REAL,
+            waktu_publish REAL
+        )
+    ''')
+
+
+def baca_timbangan(conn, indikator=DEFAULT_INDIKATOR):
+    """Pembacaan terbaru dari daemon sebagai dict, atau None jika belum pernah ada"""
+    row = conn.execute(
+        "SELECT berat, stabil, waktu_frame, berat_stabil, waktu_stabil, waktu_publish "
+        "FROM pembacaan_timbangan WHERE indikator = ?", (indikator,)
+    ).fetchone()
+    if row is None:
+        return None
+    return {
+        "berat": row[0],
+        "stabil": bool(row[1]),
+        "waktu_frame": row[2],
+        "berat_stabil": row[3],
+        "waktu_stabil": row[4],
+        "waktu_publish": row[5],
+    }
+
+
+class PenerbitSqlite:
+    """Menulis pembacaan ke pembacaan_timbangan.
+
+    Berat stabil baru selalu ditulis segera; berat berjalan (live) dibatasi
+    `interval_live` detik agar database tidak ditulis untuk setiap frame, dan
+    dilewati selama (berat, stabil) tidak berubah. Nilai yang sama tetap ditulis
+    ulang setiap `interval_heartbeat` detik agar UI tahu daemon masih hidup.
+    """
+
+    def __init__(self, pool, indikator=DEFAULT_INDIKATOR, interval_live=0.25, interval_heartbeat=5.0):
+        self.pool = pool
+        self.indikator = indikator
+        self.interval_live = interval_live
+        self.interval_heartbeat = interval_heartbeat
+        self._terakhir_live = 0.0
+        self._terakhir_nilai = None
+        with pool.write() as conn:
+            ensure_timbangan(conn)
+
+    def terbitkan(self, pembacaan, berat_stabil=None):
+        sekarang = time.time()
+        nilai = (pembacaan.berat, bool(pembacaan.stabil))
+        if berat_stabil is None:
+            if sekarang - self._terakhir_live < self.interval_live:
+                return None
+            if nilai == self._terakhir_nilai and sekarang - self._terakhir_live < self.interval_heartbeat:
+                return None
+        self._terakhir_live = sekarang
+        self._terakhir_nilai = nilai
+        with self.pool.write() as conn:
+            if berat_stabil is None:
+                conn.execute('''
+                    INSERT INTO pembacaan_timbangan (indikator, berat, stabil, waktu_frame, waktu_publish)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (indikator) DO UPDATE SET
+                        berat = excluded.berat, stabil = excluded.stabil,
+                        waktu_frame = excluded.waktu_frame, waktu_publish = excluded.waktu_publish
+                ''', (self.indikator, pembacaan.berat, bool(pembacaan.stabil), pembacaan.waktu, sekarang))
+            else:
+                conn.execute('''
+                    INSERT INTO pembacaan_timbangan
+                        (indikator, berat, stabil, waktu_frame, berat_stabil, waktu_stabil, waktu_publish)
+                    VALUES (?, ?, 1, ?, ?, ?, ?)
+                    ON CONFLICT (indikator) DO UPDATE SET
+                        berat = excluded.berat, stabil = 1, waktu_frame = excluded.waktu_frame,
+                        berat_stabil = excluded.berat_stabil, waktu_stabil = excluded.waktu_stabil,
+                        waktu_publish = excluded.waktu_publish
+                ''', (self.indikator, pembacaan.berat, pembacaan.waktu, berat_stabil, pembacaan.waktu, sekarang))
+        # Waktu setelah commit: sejak saat ini pembacaan terlihat oleh koneksi lain
+        return time.time()
+
+
+async def baca_baris_tcp(host, port, jeda_maks=30.0):
+    """Baris dari indikator lewat TCP (mis. konverter serial-ke-ethernet), otomatis menyambung ulang"""
+    jeda = 1.0
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError as e:
+            print(f"Gagal terhubung ke indikator {host}:{port}: {e}", file=sys.stderr)
+            await asyncio.sleep(jeda)
+            jeda = min(jeda * 2, jeda_maks)
+            continue
+        jeda = 1.0
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                yield line
+        finally:
+            writer.close()
+        print(f"Koneksi indikator {host}:{port} terputus, menyambung ulang...", file=sys.stderr)
+
+
+async def baca_baris_serial(port, baudrate=9600):
+    """Baris dari indikator lewat port serial (membutuhkan pyserial-asyncio)"""
+    try:
+        import serial_asyncio
+    except ImportError:
+        raise ImportError("Mode serial membutuhkan modul 'pyserial-asyncio'. Instal dengan `pip install pyserial-asyncio`.")
+    reader, _ = await serial_asyncio.open_serial_connection(url=port, baudrate=baudrate)
+    while True:
+        line = await reader.readline()
+        if line:
+            yield line
+
+
+async def jalankan_daemon(sumber_baris, penerbit, debouncer=None, saat_stabil=None):
+    """Loop utama: parse setiap baris, debounce, lalu terbitkan ke SQLite di thread terpisah"""
+    debouncer = debouncer or Debouncer()
+    async for line in sumber_baris:
+        pembacaan = parse_frame(line)
+        if pembacaan is None:
+            continue
+        berat_stabil = debouncer.tambah(pembacaan)
+        waktu_publish = await asyncio.to_thread(penerbit.terbitkan, pembacaan, berat_stabil)
+        if berat_stabil is not None and saat_stabil:
+            saat_stabil(berat_stabil, pembacaan, waktu_publish)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sumber = parser.add_mutually_exclusive_group(required=True)
+    sumber.add_argument("--tcp", help="HOST:PORT indikator / konverter serial-ethernet")
+    sumber.add_argument("--serial", help="port serial, mis. COM3 atau /dev/ttyUSB0")
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--db", default=TIMBANGAN_DB_PATH, help="database pembacaan live (bukan database surat jalan)")
+    parser.add_argument("--indikator", default=DEFAULT_INDIKATOR, help="nama indikator (jika lebih dari satu timbangan)")
+    parser.add_argument("--toleransi", type=float, default=20.0, help="toleransi stabil (kg)")
+    parser.add_argument("--durasi-stabil", type=float, default=1.0, help="lama berat harus tetap (detik)")
+    args = parser.parse_args(argv)
+
+    if args.tcp:
+        host, _, port = args.tcp.rpartition(":")
+        sumber_baris = baca_baris_tcp(host, int(port))
+    else:
+        sumber_baris = baca_baris_serial(args.serial, args.baud)
+
+    penerbit = PenerbitSqlite(get_pool(args.db), args.indikator)
+    debouncer = Debouncer(toleransi_kg=args.toleransi, durasi_stabil=args.durasi_stabil)
+
+    def cetak_stabil(berat, pembacaan, waktu_publish):
+        print(f"{time.strftime('%H:%M:%S')} stabil {berat:.0f} kg "
+              f"(frame->publish {(waktu_publish - pembacaan.waktu) * 1000:.1f} ms)", file=sys.stderr)
+
+    try:
+        asyncio.run(jalankan_daemon(sumber_baris, penerbit, debouncer, cetak_stabil))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()